@@ -1,4 +1,4 @@
-import { database, ref, set, get, push } from "./firebase";
+import { database, ref, set, get, push, update } from "./firebase";
 import {
   defaultSystemSettings,
   defaultSensorData,
@@ -21,7 +21,7 @@ export async function initializeFirebaseData() {
     const settingsSnapshot = await get(settingsRef);
 
     if (!settingsSnapshot.exists()) {
-      await set(settingsRef, defaultSystemSettings);
+      await update(ref(database), { settings: defaultSystemSettings, settingsVersion: Date.now() });
       console.log("✓ Firebase: Default settings initialized");
     } else {
       // Prüfe ob alle erforderlichen Felder existieren
@@ -50,7 +50,7 @@ export async function initializeFirebaseData() {
       }
 
       if (needsUpdate) {
-        await set(settingsRef, updatedSettings);
+        await update(ref(database), { settings: updatedSettings, settingsVersion: Date.now() });
         console.log("✓ Firebase: Fehlende Felder wurden hinzugefügt (numberOfPlants beibehalten:", updatedSettings.numberOfPlants, ")");
       } else {
         console.log("✓ Firebase: Settings already exist");
@@ -247,7 +247,7 @@ export async function getSettings(): Promise<SystemSettings | null> {
  */
 export async function updateSettings(settings: SystemSettings): Promise<boolean> {
   try {
-    await set(ref(database, "settings"), settings);
+    await update(ref(database), { settings, settingsVersion: Date.now() });
     return true;
   } catch (error) {
     console.error("✗ Failed to update settings:", error);
@@ -12,7 +12,7 @@ import { HistoryDialog } from "@/components/HistoryDialog";
 import { DashboardSkeleton } from "@/components/LoadingSkeleton";
 import { DevPanel } from "@/components/DevPanel";
 import { useToast } from "@/hooks/use-toast";
-import { database, ref, onValue, set } from "@/lib/firebase";
+import { database, ref, onValue, set, update } from "@/lib/firebase";
 import { initializeFirebaseData } from "@/lib/firebaseInit";
 import type {
   SensorData,
@@ -92,7 +92,8 @@ export default function Dashboard() {
 
   const handleSaveSettings = async (newSettings: SystemSettings) => {
     try {
-      await set(ref(database, "settings"), newSettings);
+      // settingsVersion lets the ESP32 skip re-downloading unchanged settings
+      await update(ref(database), { settings: newSettings, settingsVersion: Date.now() });
       setSettings(newSettings);
       toast({
         title: "Einstellungen gespeichert",
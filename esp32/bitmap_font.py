@@ -0,0 +1,72 @@
+# Bitmap-Font Renderer mit Glyph-Cache für das E-Ink Display
+#
+# Glyphs come from a packed table module (font5x7, frozen into the
+# firmware). Each glyph is rendered once per (character, rotation, color)
+# into a small FrameBuffer and then copied into the frame with blit(),
+# which runs in C - drawing text costs one blit per character.
+try:
+    import framebuf
+except ImportError:
+    import framebuf_py as framebuf  # Host fallback (pure Python)
+import font5x7
+
+
+class BitmapFont:
+    def __init__(self, table=font5x7, scale=1, spacing=1, cache_size=48):
+        """Font from a glyph table, scaled by an integer factor"""
+        self.table = table
+        self.scale = scale
+        self.width = table.WIDTH * scale
+        self.height = table.HEIGHT * scale
+        self.advance = self.width + spacing * scale  # Horizontal step per character
+        self.cache_size = cache_size
+        self.cache = {}  # (char, rotate, color) -> FrameBuffer
+        self.misses = 0
+
+    def text_width(self, text):
+        return len(text) * self.advance - (self.advance - self.width) if text else 0
+
+    def _index(self, char):
+        index = self.table.CHARS.find(char.upper())
+        return index if index >= 0 else self.table.CHARS.find("?")
+
+    def glyph(self, char, rotate, color):
+        """
+        Glyph as FrameBuffer in panel orientation: set pixels have color,
+        the rest 1 - color (the blit key). rotate: 0-3 (EPD ROTATE_*).
+        """
+        key = (char, rotate, color)
+        fbuf = self.cache.get(key)
+        if fbuf is not None:
+            return fbuf
+
+        w = self.width
+        h = self.height
+        bw, bh = (h, w) if rotate & 1 else (w, h)
+        fbuf = framebuf.FrameBuffer(bytearray(((bw + 7) // 8) * bh), bw, bh, framebuf.MONO_HLSB)
+        fbuf.fill(1 - color)
+        table = self.table
+        s = self.scale
+        offset = self._index(char) * table.WIDTH
+        for col in range(table.WIDTH):
+            bits = table.GLYPHS[offset + col]
+            for row in range(table.HEIGHT):
+                if bits & (1 << row):
+                    # Same mapping as EPD._point, relative to the glyph box
+                    gx = col * s
+                    gy = row * s
+                    if rotate == 0:
+                        px, py = gx, gy
+                    elif rotate == 1:
+                        px, py = h - s - gy, gx
+                    elif rotate == 2:
+                        px, py = w - s - gx, h - s - gy
+                    else:
+                        px, py = gy, w - s - gx
+                    fbuf.fill_rect(px, py, s, s, color)
+
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()  # Simple bound - the working set is small
+        self.cache[key] = fbuf
+        self.misses += 1
+        return fbuf
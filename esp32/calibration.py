@@ -0,0 +1,129 @@
+# Kalibrierkurven der Feuchtesensoren (pro Kanal) mit Lookup-Tabelle
+#
+# A curve is a list of (mV, percent) points - two points for a simple
+# dry/wet calibration, more for a piecewise-linear fit. Each curve is
+# compiled once into a bytearray indexed by mV >> STEP_SHIFT, so a
+# reading is converted with one table lookup and no float math.
+import os
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+STEP_SHIFT = 4  # 16 mV per table entry (~0.7% on a 2.2 V sensor span)
+MAX_MV = 4095
+TABLE_SIZE = (MAX_MV >> STEP_SHIFT) + 1
+
+
+def compile_curve(points):
+    """
+    Piecewise-linear curve -> bytearray(TABLE_SIZE) of whole percent.
+    Points are (mV, percent); outside the outermost points the end
+    values are held.
+    """
+    points = sorted((int(mv), int(pct)) for mv, pct in points)
+    table = bytearray(TABLE_SIZE)
+    half = 1 << (STEP_SHIFT - 1)
+    seg = 0
+    for i in range(TABLE_SIZE):
+        mv = (i << STEP_SHIFT) + half  # Centre of the bucket
+        while seg < len(points) - 2 and mv > points[seg + 1][0]:
+            seg += 1
+        mv0, p0 = points[seg]
+        mv1, p1 = points[seg + 1]
+        if mv <= mv0:
+            pct = p0
+        elif mv >= mv1:
+            pct = p1
+        else:
+            # Integer interpolation, rounded to the nearest percent
+            num = (p1 - p0) * (mv - mv0)
+            den = mv1 - mv0
+            step = (2 * abs(num) + den) // (2 * den)
+            pct = p0 + step if num >= 0 else p0 - step
+        table[i] = max(0, min(100, pct))
+    return table
+
+
+def validate_curve(points):
+    """Raise ValueError unless points form a usable curve"""
+    if not points or len(points) < 2:
+        raise ValueError("calibration curve needs at least 2 points")
+    seen = set()
+    for mv, pct in points:
+        if not 0 <= mv <= MAX_MV or not 0 <= pct <= 100:
+            raise ValueError(f"calibration point out of range: ({mv}, {pct})")
+        if mv in seen:
+            raise ValueError(f"duplicate calibration voltage: {mv} mV")
+        seen.add(mv)
+
+
+class MoistureCalibration:
+    def __init__(self, channels, dry_mv=3100, wet_mv=910, path="/calibration.json"):
+        """One curve per channel; default: straight line dry -> 0%, wet -> 100%"""
+        self.path = path
+        self.default = [[dry_mv, 0], [wet_mv, 100]]
+        self.curves = [self.default] * channels
+        self.tables = [compile_curve(self.default)] * channels  # Shared until changed
+        self.spans = [abs(dry_mv - wet_mv) or 1] * channels
+
+    def set_curve(self, channel, points):
+        """Replace one channel's curve and compile its table"""
+        points = [[int(mv), int(pct)] for mv, pct in points]
+        validate_curve(points)
+        points.sort()
+        self.curves[channel] = points
+        self.tables[channel] = compile_curve(points)
+        self.spans[channel] = (points[-1][0] - points[0][0]) or 1
+
+    def apply(self, curves):
+        """Curves from settings or flash: list per channel (None = keep current)"""
+        for channel in range(min(len(curves), len(self.curves))):
+            if not curves[channel]:
+                continue
+            try:
+                self.set_curve(channel, curves[channel])
+            except (ValueError, TypeError) as e:
+                print(f"⚠ Calibration sensor {channel + 1} ignored: {e}")
+
+    def percent(self, channel, mv):
+        """Moisture % for a filtered reading in mV (table lookup)"""
+        return self.tables[channel][min(mv >> STEP_SHIFT, TABLE_SIZE - 1)]
+
+    def capture(self, channel, mv, percent):
+        """
+        Calibration routine: the probe currently reads mv at a known
+        moisture (0 = dry air, 100 = glass of water, or a reference
+        in between). Replaces the point with the same percent, keeps the
+        others - two captures give a two-point curve, more a piecewise one.
+        """
+        points = [p for p in self.curves[channel] if p[1] != percent and p[0] != mv]
+        points.append([mv, percent])
+        if len(points) < 2:
+            points.append(self.default[0] if percent != 0 else self.default[1])
+        self.set_curve(channel, points)
+        return self.curves[channel]
+
+    def load(self):
+        """Read curves from flash - returns True if a file was applied"""
+        try:
+            with open(self.path) as f:
+                curves = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(curves, list):
+            return False
+        self.apply(curves)
+        return True
+
+    def save(self):
+        """Store curves (tmp file + rename, never half-written)"""
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(self.curves, f)
+            os.rename(tmp, self.path)
+            return True
+        except OSError as e:
+            print(f"✗ Calibration write failed: {e}")
+            return False
@@ -0,0 +1,83 @@
+# E-Ink Dashboard: Status, Wassertank, Feuchtigkeit pro Pflanze, letzte Synchronisation
+#
+# Rendered into two frame buffers allocated once; EPD.update_frame()
+# compares with the frame on the panel, so an unchanged dashboard costs
+# no refresh and it can be redrawn every cycle.
+from bitmap_font import BitmapFont
+from epaper1in54b import RED_BLANK, WHITE
+
+# Driver convention (see epaper1in54b.RED_BLANK): blank planes are all 1
+# bits, colored=1 clears a bit = black resp. red pixel
+BLACK_INK = 1
+RED_INK = 1
+
+HEADERS = {"ok": "STATUS OK", "warning": "WARNUNG", "error": "FEHLER"}
+
+# Sync age in coarse steps: a clock time would change the picture (and
+# cost a full ~15 s refresh) with every upload
+SYNC_AGES = ((86400, "VOR 1 TAG"), (21600, "VOR 6 STD"), (3600, "VOR 1 STD"), (900, "VOR 15 MIN"))
+
+
+def sync_age_text(age):
+    """Seconds since the last upload (None: never) -> "OK" / "VOR 1 STD" / ..."""
+    if age is None:
+        return "--"
+    for limit, text in SYNC_AGES:
+        if age >= limit:
+            return text
+    return "OK"
+
+
+class Dashboard:
+    def __init__(self, eink):
+        self.eink = eink
+        self.small = BitmapFont(scale=1)
+        self.large = BitmapFont(scale=2)
+        self.frame_black = bytearray([WHITE]) * 5000
+        self.frame_red = bytearray([RED_BLANK]) * 5000
+
+    def _bar(self, x, y, width, height, percent, alert):
+        """Outline + filled part; filled part red when alert"""
+        e = self.eink
+        e.draw_rectangle(self.frame_black, x, y, x + width - 1, y + height - 1, BLACK_INK)
+        fill = int((width - 4) * max(0, min(100, percent)) / 100)
+        if fill > 0:
+            if alert:
+                e.draw_filled_rectangle(self.frame_red, x + 2, y + 2, x + 1 + fill, y + height - 3, RED_INK)
+            else:
+                e.draw_filled_rectangle(self.frame_black, x + 2, y + 2, x + 1 + fill, y + height - 3, BLACK_INK)
+
+    def _text(self, x, y, text, font, alert=False):
+        if alert:
+            self.eink.display_string_at(self.frame_red, x, y, text, font, RED_INK)
+        else:
+            self.eink.display_string_at(self.frame_black, x, y, text, font, BLACK_INK)
+
+    def render(self, status, tank, plants, sync_text):
+        """
+        status: "ok" / "warning" / "error", tank: water level in %,
+        plants: [(moisture %, needs water)], sync_text: see sync_age_text()
+        """
+        e = self.eink
+        e.clear_frame(self.frame_black)  # White
+        e.clear_frame(self.frame_red)  # No red
+
+        self._text(4, 4, HEADERS.get(status, status.upper()), self.large, status != "ok")
+
+        tank = int(round(tank))
+        self._text(4, 26, f"TANK {tank}%", self.large, tank < 20)
+        self._bar(4, 43, 192, 10, tank, tank < 20)
+
+        y = 62
+        for i, (moisture, needs_water) in enumerate(plants):
+            moisture = int(round(moisture))
+            self._text(4, y, f"P{i + 1} {moisture}%", self.large, needs_water)
+            self._bar(4, y + 17, 192, 8, moisture, needs_water)
+            y += 30
+
+        self._text(4, 190, f"SYNC {sync_text}", self.small)
+
+    def show(self, status, tank, plants, sync_text, wait=True):
+        """Render and refresh if anything changed -> 'none' / 'full'"""
+        self.render(status, tank, plants, sync_text)
+        return self.eink.update_frame(self.frame_black, self.frame_red, wait)
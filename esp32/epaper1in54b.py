@@ -27,9 +27,35 @@ SOFTWARE.
 
 # also works for black/white/yellow GDEW0154C39?
 
-from micropython import const
-from time import sleep_ms
-import ustruct
+try:
+    from micropython import const
+except ImportError:
+    const = lambda x: x
+try:
+    from time import sleep_ms, ticks_ms, ticks_diff
+except ImportError:
+    from time import sleep, monotonic
+    sleep_ms = lambda ms: sleep(ms / 1000)
+    ticks_ms = lambda: int(monotonic() * 1000)
+    ticks_diff = lambda a, b: a - b
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+try:
+    from micropython import schedule
+except ImportError:
+    schedule = lambda func, arg: func(arg)
+try:
+    import ustruct
+except ImportError:
+    import struct as ustruct
+import os
+try:
+    import framebuf
+except ImportError:
+    import framebuf_py as framebuf  # Host fallback (pure Python)
+import shapes
 
 # Display resolution
 EPD_WIDTH  = const(200)
@@ -83,6 +109,34 @@ ROTATE_270 = const(3)
 
 BUSY = const(0)  # 0=busy, 1=idle
 
+# Plane polarity (Waveshare reference code: Clear() sends 0xFF to both
+# planes): set bits are white / no red, colored pixels are cleared bits.
+# clear_frame() fills with these, colored=True draws black resp. red.
+WHITE = const(0xFF)
+RED_BLANK = const(0xFF)
+
+# Raw frame file: expanded black plane (2bpp) followed by the red plane,
+# exactly as sent to the panel
+FRAME_FILE_SIZE = const(15000)
+STREAM_CHUNK = const(512)
+
+# Black plane: 1bpp -> 2bpp expansion table. Entry 2*b is the expanded
+# high nibble of b, entry 2*b+1 the expanded low nibble (each set bit
+# becomes 0b11).
+def _build_expand_table():
+    table = bytearray(512)
+    for value in range(256):
+        for half in range(2):
+            nibble = (value >> (4 - 4 * half)) & 0x0F
+            out = 0
+            for bit in range(4):
+                if nibble & (0x08 >> bit):
+                    out |= 0xC0 >> (bit * 2)
+            table[2 * value + half] = out
+    return table
+
+EXPAND_2BPP = _build_expand_table()
+
 class EPD:
     def __init__(self, spi, cs, dc, rst, busy):
         self.spi = spi
@@ -97,6 +151,22 @@ class EPD:
         self.width = EPD_WIDTH
         self.height = EPD_HEIGHT
         self.rotate = ROTATE_0
+        self._black_2bpp = None  # Expanded black plane (10000 bytes, allocated once)
+        self._views = []  # [(frame_buffer, FrameBuffer)] - one view per plane
+        self._chunk = None  # Read buffer for display_frame_file (allocated once)
+        # Frame currently on the panel (None = unknown) for update_frame()
+        self._shown_black = None
+        self._shown_red = None
+        # Refresh runs in the background: BUSY IRQ (or poll()) finishes it,
+        # then the panel is put to sleep and woken by the next transfer
+        self.auto_sleep = True
+        self.asleep = False
+        self.refreshing = False
+        self.powering_down = False  # Power-down started, POWER_OFF still to send
+        try:
+            self.busy.irq(trigger=self.busy.IRQ_RISING, handler=self._busy_irq)  # BUSY 0 -> 1: idle
+        except (AttributeError, TypeError):
+            pass  # No IRQ support - poll() / wait_refresh() finish the refresh
 
     LUT_VCOM0 = bytearray(b'\x0E\x14\x01\x0A\x06\x04\x0A\x0A\x0F\x03\x03\x0C\x06\x0A\x00')
     LUT_W     = bytearray(b'\x0E\x14\x01\x0A\x46\x04\x8A\x4A\x0F\x83\x43\x0C\x86\x0A\x04')
@@ -134,16 +204,78 @@ class EPD:
         self._command(VCM_DC_SETTING_REGISTER, b'\x0E') # -1.4V
         self.set_lut_bw()
         self.set_lut_red()
+        self.asleep = False
+
+    def is_busy(self):
+        return self.busy.value() == BUSY
 
     def wait_until_idle(self, timeout_ms=10000):
         """Wait until display is idle with timeout"""
-        from time import ticks_ms, ticks_diff
         start = ticks_ms()
         while self.busy.value() == BUSY:
             if ticks_diff(ticks_ms(), start) > timeout_ms:
                 raise TimeoutError(f"E-Ink BUSY timeout after {timeout_ms}ms")
             sleep_ms(100)
 
+    def _busy_irq(self, pin):
+        # May run in hard IRQ context: hand over to the main thread
+        if self.refreshing:
+            try:
+                schedule(self._refresh_irq_done, 0)
+            except RuntimeError:
+                pass  # Schedule queue full - poll() picks it up
+
+    def _refresh_irq_done(self, _):
+        # Scheduled callback: must not busy-wait, the power-down is
+        # finished by poll() / wait_refresh() on the main thread
+        if self.refreshing and not self.is_busy():
+            self._refresh_done(wait=False)
+
+    def _refresh(self, wait):
+        # Start the refresh; wait=False returns immediately
+        self._command(DISPLAY_REFRESH)
+        self.refreshing = True
+        if wait:
+            self.wait_refresh()
+
+    def _refresh_done(self, wait=True):
+        if not self.refreshing:
+            return
+        self.refreshing = False
+        if self.auto_sleep:
+            self.sleep(wait)
+
+    def poll(self):
+        """Finish a background refresh / power-down if BUSY has gone idle - True until done"""
+        if self.refreshing and not self.is_busy():
+            self._refresh_done(wait=False)
+        if self.powering_down and not self.is_busy():
+            self._power_off()
+        return self.refreshing or self.powering_down
+
+    def wait_refresh(self, timeout_ms=10000):
+        """Block until a running refresh (and the power-down after it) has finished"""
+        if self.refreshing:
+            self.wait_until_idle(timeout_ms)
+            self._refresh_done()
+        if self.powering_down:
+            self.wait_until_idle(timeout_ms)
+            self._power_off()
+
+    async def wait_refresh_async(self, timeout_ms=20000, poll_ms=50):
+        """Await the end of a refresh without blocking other tasks"""
+        start = ticks_ms()
+        while self.poll():
+            if ticks_diff(ticks_ms(), start) > timeout_ms:
+                raise TimeoutError(f"E-Ink BUSY timeout after {timeout_ms}ms")
+            await asyncio.sleep(poll_ms / 1000)
+
+    def _wake(self):
+        # Before any transfer: previous refresh finished, panel powered
+        self.wait_refresh()
+        if self.asleep:
+            self.init()
+
     def reset(self):
         self.rst(0)
         sleep_ms(200)
@@ -162,31 +294,106 @@ class EPD:
         self._command(LUT_RED_1, self.LUT_RED0)
         self._command(LUT_RED_2, self.LUT_RED1)
 
-    def display_frame(self, frame_buffer_black, frame_buffer_red):
+    def expand_black(self, frame_buffer_black):
+        # 1bpp -> 2bpp via lookup table into a buffer allocated once
+        size = EPD_WIDTH * EPD_HEIGHT // 8
+        if self._black_2bpp is None:
+            self._black_2bpp = bytearray(size * 2)
+        out = self._black_2bpp
+        lut = EXPAND_2BPP
+        j = 0
+        for i in range(size):
+            k = frame_buffer_black[i] << 1
+            out[j] = lut[k]
+            out[j + 1] = lut[k + 1]
+            j += 2
+        return out
+
+    def display_frame(self, frame_buffer_black, frame_buffer_red, wait=True):
+        size = EPD_WIDTH * EPD_HEIGHT // 8
+        self._wake()
         if (frame_buffer_black != None):
             self._command(DATA_START_TRANSMISSION_1)
             sleep_ms(2)
-            for i in range(0, self.width * self.height // 8):
-                temp = 0x00
-                for bit in range(0, 4):
-                    if (frame_buffer_black[i] & (0x80 >> bit) != 0):
-                        temp |= 0xC0 >> (bit * 2)
-                self._data(bytearray([temp]))
-                temp = 0x00
-                for bit in range(4, 8):
-                    if (frame_buffer_black[i] & (0x80 >> bit) != 0):
-                        temp |= 0xC0 >> ((bit - 4) * 2)
-                self._data(bytearray([temp]))
+            self._data(self.expand_black(frame_buffer_black))  # One SPI transfer
             sleep_ms(2)
         if (frame_buffer_red != None):
             self._command(DATA_START_TRANSMISSION_2)
             sleep_ms(2)
-            for i in range(0, self.width * self.height // 8):
-                self._data(bytearray([frame_buffer_red[i]]))
+            self._data(memoryview(frame_buffer_red)[:size])  # No copy
             sleep_ms(2)
 
-        self._command(DISPLAY_REFRESH)
-        self.wait_until_idle()
+        if frame_buffer_black != None and frame_buffer_red != None:
+            self._remember(frame_buffer_black, frame_buffer_red)
+        else:
+            self._shown_black = None
+        self._refresh(wait)
+
+    def _remember(self, frame_buffer_black, frame_buffer_red):
+        # Copy of the displayed frame (allocated once, copied in C)
+        size = EPD_WIDTH * EPD_HEIGHT // 8
+        if self._shown_black is None or self._shown_red is None:
+            self._shown_black = bytearray(size)
+            self._shown_red = bytearray(size)
+        self._shown_black[:] = frame_buffer_black[:size]
+        self._shown_red[:] = frame_buffer_red[:size]
+
+    def unchanged(self, frame_buffer_black, frame_buffer_red):
+        """True if exactly this frame is on the panel (compared in C)"""
+        return (self._shown_black is not None and
+                frame_buffer_black == self._shown_black and frame_buffer_red == self._shown_red)
+
+    def update_frame(self, frame_buffer_black, frame_buffer_red, wait=True):
+        """
+        Refresh only if the frame differs from the one on the panel.
+        Returns 'none' (identical, no refresh) or 'full'. The GDEW0154Z04
+        controller has no partial window, so any change is a full refresh.
+        """
+        if self.unchanged(frame_buffer_black, frame_buffer_red):
+            return 'none'
+        self.display_frame(frame_buffer_black, frame_buffer_red, wait)
+        return 'full'
+
+    def write_frame_file(self, path, frame_buffer_black, frame_buffer_red):
+        # Store a frame in panel format for display_frame_file()
+        size = EPD_WIDTH * EPD_HEIGHT // 8
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(self.expand_black(frame_buffer_black))
+            f.write(memoryview(frame_buffer_red)[:size])
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        os.rename(tmp, path)
+
+    def _stream(self, f, length):
+        # File -> SPI in fixed chunks (no frame-sized allocation)
+        if self._chunk is None:
+            self._chunk = bytearray(STREAM_CHUNK)
+        chunk = memoryview(self._chunk)
+        while length > 0:
+            n = f.readinto(chunk[:min(length, STREAM_CHUNK)])
+            if not n:
+                raise OSError('frame file truncated')
+            self._data(chunk[:n])
+            length -= n
+
+    def display_frame_file(self, path, wait=True):
+        size = EPD_WIDTH * EPD_HEIGHT // 8
+        self._wake()
+        with open(path, 'rb') as f:
+            self._command(DATA_START_TRANSMISSION_1)
+            sleep_ms(2)
+            self._stream(f, size * 2)
+            sleep_ms(2)
+            self._command(DATA_START_TRANSMISSION_2)
+            sleep_ms(2)
+            self._stream(f, size)
+            sleep_ms(2)
+
+        self._shown_black = None  # Not kept in RAM - next update_frame() refreshes
+        self._refresh(wait)
 
     def set_rotate(self, rotate):
         if (rotate == ROTATE_0):
@@ -206,73 +413,89 @@ class EPD:
             self.width = EPD_HEIGHT
             self.height = EPD_WIDTH
 
+    def framebuffer(self, frame_buffer):
+        # FrameBuffer view of a plane (created once per bytearray)
+        for buf, view in self._views:
+            if buf is frame_buffer:
+                return view
+        view = framebuf.FrameBuffer(frame_buffer, EPD_WIDTH, EPD_HEIGHT, framebuf.MONO_HLSB)
+        self._views = self._views[-1:] + [(frame_buffer, view)]
+        return view
+
+    def _point(self, x, y):
+        # Logical (rotated) -> panel coordinates
+        rotate = self.rotate
+        if (rotate == ROTATE_0):
+            return x, y
+        elif (rotate == ROTATE_90):
+            return EPD_WIDTH - 1 - y, x
+        elif (rotate == ROTATE_180):
+            return EPD_WIDTH - 1 - x, EPD_HEIGHT - 1 - y
+        return y, EPD_HEIGHT - 1 - x
+
+    def _area(self, x, y, width, height):
+        # Logical rectangle -> panel rectangle (x, y, w, h), clipped to the
+        # logical size like set_pixel
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + width, self.width) - 1
+        y1 = min(y + height, self.height) - 1
+        if x1 < x0 or y1 < y0:
+            return None
+        ax0, ay0 = self._point(x0, y0)
+        ax1, ay1 = self._point(x1, y1)
+        if ax0 > ax1:
+            ax0, ax1 = ax1, ax0
+        if ay0 > ay1:
+            ay0, ay1 = ay1, ay0
+        return ax0, ay0, ax1 - ax0 + 1, ay1 - ay0 + 1
+
+    def clear_frame(self, frame_buffer, colored=False):
+        self.framebuffer(frame_buffer).fill(0 if colored else 1)
+
     def set_pixel(self, frame_buffer, x, y, colored):
         if (x < 0 or x >= self.width or y < 0 or y >= self.height):
             return
-        if (self.rotate == ROTATE_0):
-            self.set_absolute_pixel(frame_buffer, x, y, colored)
-        elif (self.rotate == ROTATE_90):
-            point_temp = x
-            x = EPD_WIDTH - y
-            y = point_temp
-            self.set_absolute_pixel(frame_buffer, x, y, colored)
-        elif (self.rotate == ROTATE_180):
-            x = EPD_WIDTH - x
-            y = EPD_HEIGHT- y
-            self.set_absolute_pixel(frame_buffer, x, y, colored)
-        elif (rotate == ROTATE_270):
-            point_temp = x
-            x = y
-            y = EPD_HEIGHT - point_temp
-            self.set_absolute_pixel(frame_buffer, x, y, colored)
+        x, y = self._point(x, y)
+        self.framebuffer(frame_buffer).pixel(x, y, 0 if colored else 1)
 
     def set_absolute_pixel(self, frame_buffer, x, y, colored):
         # To avoid display orientation effects
         # use EPD_WIDTH instead of self.width
         # use EPD_HEIGHT instead of self.height
-        if (x < 0 or x >= EPD_WIDTH or y < 0 or y >= EPD_HEIGHT):
-            return
-        if (colored):
-            frame_buffer[(x + y * EPD_WIDTH) // 8] &= ~(0x80 >> (x % 8))
-        else:
-            frame_buffer[(x + y * EPD_WIDTH) // 8] |= 0x80 >> (x % 8)
+        self.framebuffer(frame_buffer).pixel(x, y, 0 if colored else 1)
 
     def display_string_at(self, frame_buffer, x, y, text, font, colored):
-        image = Image.new('1', (self.width, self.height))
-        draw = ImageDraw.Draw(image)
-        draw.text((x, y), text, font = font, fill = 255)
-        # Set buffer to value of Python Imaging Library image.
-        # Image must be in mode 1.
-        pixels = image.load()
-        for y in range(self.height):
-            for x in range(self.width):
-                # Set the bits for the column of pixels at the current position.
-                if pixels[x, y] != 0:
-                    self.set_pixel(frame_buffer, x, y, colored)
+        # font: bitmap_font.BitmapFont - cached glyphs blitted in C
+        fb = self.framebuffer(frame_buffer)
+        color = 0 if colored else 1
+        w = font.width
+        h = font.height
+        for char in text:
+            if char != ' ':
+                ax0, ay0 = self._point(x, y)
+                ax1, ay1 = self._point(x + w - 1, y + h - 1)
+                fb.blit(font.glyph(char, self.rotate, color), min(ax0, ax1), min(ay0, ay1), 1 - color)
+            x += font.advance
 
     def draw_line(self, frame_buffer, x0, y0, x1, y1, colored):
-        # Bresenham algorithm
-        dx = abs(x1 - x0)
-        sx = 1 if x0 < x1 else -1
-        dy = -abs(y1 - y0)
-        sy = 1 if y0 < y1 else -1
-        err = dx + dy
-        while((x0 != x1) and (y0 != y1)):
-            self.set_pixel(frame_buffer, x0, y0 , colored)
-            if (2 * err >= dy):
-                err += dy
-                x0 += sx
-            if (2 * err <= dx):
-                err += dx
-                y0 += sy
+        # Bresenham in C (framebuf), end points rotated once
+        if x0 == x1 or y0 == y1:
+            self.draw_filled_rectangle(frame_buffer, x0, y0, x1, y1, colored)
+            return
+        x0, y0 = self._point(x0, y0)
+        x1, y1 = self._point(x1, y1)
+        self.framebuffer(frame_buffer).line(x0, y0, x1, y1, 0 if colored else 1)
+
+    def _fill_area(self, frame_buffer, area, colored):
+        if area:
+            self.framebuffer(frame_buffer).fill_rect(area[0], area[1], area[2], area[3], 0 if colored else 1)
 
     def draw_horizontal_line(self, frame_buffer, x, y, width, colored):
-        for i in range(x, x + width):
-            self.set_pixel(frame_buffer, i, y, colored)
+        self._fill_area(frame_buffer, self._area(x, y, width, 1), colored)
 
     def draw_vertical_line(self, frame_buffer, x, y, height, colored):
-        for i in range(y, y + height):
-            self.set_pixel(frame_buffer, x, i, colored)
+        self._fill_area(frame_buffer, self._area(x, y, 1, height), colored)
 
     def draw_rectangle(self, frame_buffer, x0, y0, x1, y1, colored):
         min_x = x0 if x1 > x0 else x1
@@ -289,21 +512,32 @@ class EPD:
         max_x = x1 if x1 > x0 else x0
         min_y = y0 if y1 > y0 else y1
         max_y = y1 if y1 > y0 else y0
-        for i in range(min_x, max_x + 1):
-            self.draw_vertical_line(frame_buffer, i, min_y, max_y - min_y + 1, colored)
+        self._fill_area(frame_buffer, self._area(min_x, min_y, max_x - min_x + 1, max_y - min_y + 1), colored)
+
+    def _circle_center(self, x, y, radius):
+        # A circle is symmetric under 90 degree rotations: only the centre
+        # needs rotating, the shape is then drawn in panel coordinates.
+        # Parts outside the logical screen fall outside the panel as well.
+        if (x >= self.width or y >= self.height):
+            return None
+        return self._point(x, y)
 
     def draw_circle(self, frame_buffer, x, y, radius, colored):
         # Bresenham algorithm
+        center = self._circle_center(x, y, radius)
+        if center is None:
+            return
+        x, y = center
+        fb = self.framebuffer(frame_buffer)
+        c = 0 if colored else 1
         x_pos = -radius
         y_pos = 0
         err = 2 - 2 * radius
-        if (x >= self.width or y >= self.height):
-            return
         while True:
-            self.set_pixel(frame_buffer, x - x_pos, y + y_pos, colored)
-            self.set_pixel(frame_buffer, x + x_pos, y + y_pos, colored)
-            self.set_pixel(frame_buffer, x + x_pos, y - y_pos, colored)
-            self.set_pixel(frame_buffer, x - x_pos, y - y_pos, colored)
+            fb.pixel(x - x_pos, y + y_pos, c)
+            fb.pixel(x + x_pos, y + y_pos, c)
+            fb.pixel(x + x_pos, y - y_pos, c)
+            fb.pixel(x - x_pos, y - y_pos, c)
             e2 = err
             if (e2 <= y_pos):
                 y_pos += 1
@@ -317,30 +551,29 @@ class EPD:
                 break
 
     def draw_filled_circle(self, frame_buffer, x, y, radius, colored):
-        # Bresenham algorithm
-        x_pos = -radius
-        y_pos = 0
-        err = 2 - 2 * radius
-        if (x >= self.width or y >= self.height):
+        # Cached span table (shapes.py), one hline in C per row
+        center = self._circle_center(x, y, radius)
+        if center is None:
             return
-        while True:
-            self.set_pixel(frame_buffer, x - x_pos, y + y_pos, colored)
-            self.draw_horizontal_line(frame_buffer, x + x_pos, y + y_pos, 2 * (-x_pos) + 1, colored)
-            self.draw_horizontal_line(frame_buffer, x + x_pos, y - y_pos, 2 * (-x_pos) + 1, colored)
-            self.set_pixel(frame_buffer, x - x_pos, y - y_pos, colored)
-            e2 = err
-            if (e2 <= y_pos):
-                y_pos += 1
-                err += y_pos * 2 + 1
-                if(-x_pos == y_pos and e2 <= x_pos):
-                    e2 = 0
-            if (e2 >= x_pos):
-                x_pos += 1
-                err += x_pos * 2 + 1
-            if x_pos > 0:
-                break
-
-    def sleep(self):
+        x, y = center
+        fb = self.framebuffer(frame_buffer)
+        c = 0 if colored else 1
+        for dy, x0, x1 in shapes.circle(radius):
+            fb.hline(x + x0, y + dy, x1 - x0 + 1, c)
+
+    def sleep(self, wait=True):
+        # No DEEP_SLEEP command on this panel: VCOM/booster off, then power off.
+        # The next transfer wakes the panel with init() (hardware reset).
+        # wait=False: POWER_OFF is sent by poll() / wait_refresh() once idle.
+        self._command(VCOM_AND_DATA_INTERVAL_SETTING, b'\x17')
+        self._command(VCM_DC_SETTING_REGISTER, b'\x00')
+        self._command(POWER_SETTING, b'\x02\x00\x00\x00')
+        self.powering_down = True
+        if wait:
+            self.wait_until_idle()
+            self._power_off()
+
+    def _power_off(self):
         self._command(POWER_OFF)
-        self.wait_until_idle()
-        self._command(DEEP_SLEEP, b'\xA5')
+        self.powering_down = False
+        self.asleep = True
@@ -0,0 +1,107 @@
+# Fehler-Deduplizierung: ein Eintrag pro Fehlerzustand statt einer pro Loop
+
+
+class ErrorReporter:
+    def __init__(self, firebase, min_interval=600, max_interval=86400):
+        """
+        Deduplicate errors by (component, error type).
+        A repeated fault only updates its occurrence count locally; it is
+        re-sent after min_interval seconds, then with doubling intervals up
+        to max_interval. New faults, message/severity changes and recovery
+        are sent immediately.
+        """
+        self.fb = firebase
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.faults = {}  # (component, error_type) -> fault state dict
+        self.suppressed = 0  # Reports swallowed by deduplication
+
+    def report(self, error_type, component, message, severity="error"):
+        """Record an occurrence of a fault"""
+        system = self.fb.system
+        if not system:
+            return
+        now_ms = system.get_timestamp()
+        fault_id = (component, error_type)
+        fault = self.faults.get(fault_id)
+
+        if fault is None:
+            # New fault state
+            fault = {
+                "key": self.fb.push_id(now_ms),
+                "count": 1,
+                "firstSeen": now_ms,
+                "lastSeen": now_ms,
+                "lastReport": now_ms,
+                "interval": self.min_interval,
+                "message": message,
+                "severity": severity,
+            }
+            self.faults[fault_id] = fault
+            print(f"! New fault: {component} ({error_type}): {message}")
+            self._send(error_type, component, fault, False)
+            return
+
+        fault["count"] += 1
+        fault["lastSeen"] = now_ms
+        changed = message[:80] != fault["message"][:80] or severity != fault["severity"]
+        fault["message"] = message
+        fault["severity"] = severity
+
+        if changed or now_ms - fault["lastReport"] >= fault["interval"] * 1000:
+            if not changed:
+                fault["interval"] = min(fault["interval"] * 2, self.max_interval)
+            fault["lastReport"] = now_ms
+            self._send(error_type, component, fault, False)
+        else:
+            self.suppressed += 1
+
+    def resolve(self, error_type, component):
+        """Fault is gone - send final update with resolved flag"""
+        fault = self.faults.pop((component, error_type), None)
+        if fault is None or not self.fb.system:
+            return
+        fault["lastSeen"] = self.fb.system.get_timestamp()
+        print(f"✓ Fault resolved: {component} ({error_type}) after {fault['count']}x")
+        self._send(error_type, component, fault, True)
+
+    def is_active(self, error_type, component):
+        """Check if a fault is currently open"""
+        return (component, error_type) in self.faults
+
+    def get_state(self):
+        """Open faults as compact lists (for RTC memory across deep sleep)"""
+        state = []
+        for (component, error_type), fault in self.faults.items():
+            state.append([component, error_type, fault["key"], fault["count"],
+                          fault["firstSeen"], fault["lastSeen"], fault["lastReport"],
+                          fault["interval"], fault["message"][:80], fault["severity"]])
+        return state
+
+    def restore_state(self, state):
+        """Restore open faults saved by get_state()"""
+        for item in state:
+            component, error_type = item[0], item[1]
+            self.faults[(component, error_type)] = {
+                "key": item[2],
+                "count": item[3],
+                "firstSeen": item[4],
+                "lastSeen": item[5],
+                "lastReport": item[6],
+                "interval": item[7],
+                "message": item[8],
+                "severity": item[9],
+            }
+
+    def _send(self, error_type, component, fault, resolved):
+        self.fb.write_error(fault["key"], {
+            "timestamp": fault["lastSeen"],
+            "errorType": error_type,
+            "component": component,
+            "message": fault["message"],
+            "severity": fault["severity"],
+            "resolved": resolved,
+            "count": fault["count"],
+            "firstSeen": fault["firstSeen"],
+            "lastSeen": fault["lastSeen"],
+        })
@@ -1,71 +1,218 @@
 # Firebase Realtime Database Client mit Retry-Logik
 import ujson as json
-import urequests as requests
 import time
+import random
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+from http_client import HTTPClient
+from offline_queue import KIND_HISTORY, KIND_ERROR, KIND_TEST
+
+
+# Firebase push ID alphabet (lexicographically ordered)
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+def split_url(url):
+    """Split URL into (scheme, host, port, path)"""
+    scheme, _, rest = url.partition("://")
+    host, slash, path = rest.partition("/")
+    path = slash + path if slash else "/"
+    port = 443 if scheme == "https" else 80
+    if ":" in host:
+        host, port_str = host.split(":", 1)
+        port = int(port_str)
+    return scheme, host, port, path
+
+
+class SSEParser:
+    """Incremental text/event-stream parser - feed() bytes, get (event, data) tuples"""
+    def __init__(self):
+        self.buffer = b""
+        self.event = None
+        self.data = []
+    
+    def feed(self, chunk):
+        events = []
+        self.buffer += chunk
+        while True:
+            i = self.buffer.find(b"\n")
+            if i < 0:
+                break
+            line = self.buffer[:i]
+            self.buffer = self.buffer[i + 1:]
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            
+            if not line:
+                # Blank line = dispatch event
+                if self.event is not None or self.data:
+                    events.append((self.event or "message", "\n".join(self.data)))
+                self.event = None
+                self.data = []
+            elif line.startswith(b":"):
+                continue  # Comment
+            else:
+                field, _, value = line.partition(b":")
+                if value.startswith(b" "):
+                    value = value[1:]
+                if field == b"event":
+                    self.event = value.decode()
+                elif field == b"data":
+                    self.data.append(value.decode())
+        return events
+
+
+def apply_stream_event(value, event, payload):
+    """Apply Firebase put/patch event ({path, data}) to locally cached node value"""
+    keys = [k for k in payload["path"].split("/") if k]
+    data = payload["data"]
+    
+    if event == "patch":
+        for key, item in data.items():
+            value = apply_stream_event(value, "put", {"path": payload["path"] + "/" + key, "data": item})
+        return value
+    
+    if not keys:
+        return data
+    if not isinstance(value, dict):
+        value = {}
+    node = value
+    for key in keys[:-1]:
+        if not isinstance(node.get(key), dict):
+            node[key] = {}
+        node = node[key]
+    if data is None:
+        node.pop(keys[-1], None)
+    else:
+        node[keys[-1]] = data
+    return value
 
 class FirebaseClient:
-    def __init__(self, base_url, max_retries=3):
+    def __init__(self, base_url, max_retries=3, timeout=10, error_ring_size=16):
         """Initialize Firebase client with retry logic"""
-        self.base_url = base_url
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout  # Socket timeout (seconds) per request
+        self.connections = {}  # (host, port) -> HTTPClient (keep-alive)
+        self.last_headers = {}
         self.system = None  # Will be set by WateringSystem
         self.error_count = 0
         self.max_retries = max_retries
+        self.streams = {}  # path -> True while stream connection is live
+        self.batch = None  # {path: data} while batching, else None
+        self.offline = None  # OfflineQueue (optional, set by WateringSystem)
+        self.metrics = None  # Metrics (optional, set by WateringSystem)
+        self.last_push_ms = 0
+        self.last_push_rand = [0] * 12
+        self.error_ring = [None] * error_ring_size  # (key, data) slots
+        self.error_ring_head = 0  # Next slot to write
+        self.error_ring_count = 0  # Unsent entries
+        self.errors_dropped = 0
+    
+    def _connection(self, url):
+        """Reusable keep-alive connection for the URL's host"""
+        scheme, host, port, path = split_url(url)
+        key = (host, port)
+        conn = self.connections.get(key)
+        if conn is None:
+            conn = HTTPClient(host, port, use_ssl=scheme == "https", timeout=self.timeout)
+            self.connections[key] = conn
+        return conn, path
+    
+    def set_timeout(self, timeout):
+        """Socket timeout (seconds) for new and open connections"""
+        self.timeout = timeout
+        for conn in self.connections.values():
+            conn.set_timeout(timeout)
+    
+    def close(self):
+        """Close all keep-alive connections (e.g. before WiFi goes down)"""
+        for conn in self.connections.values():
+            conn.close()
     
-    def _make_request(self, method, url, data=None, headers=None):
-        """Make HTTP request with retry (MicroPython urequests doesn't support timeout kwarg)"""
+    def _timed(self, func, *args):
+        """One HTTP round trip, measured as an "http" span (failed ones too)"""
+        start = time.ticks_us()
+        try:
+            return func(*args)
+        finally:
+            if self.metrics:
+                self.metrics.since("http", start)
+    
+    def _count(self, name):
+        if self.metrics:
+            self.metrics.inc(name)
+    
+    def _make_request(self, method, url, data=None, headers=None, raw=False):
+        """Make HTTP request with retry over the persistent connection (raw=True: body bytes)"""
+        conn, path = self._connection(url)
         for attempt in range(self.max_retries):
-            response = None
+            if attempt:
+                self._count("retries")
             try:
-                # Note: urequests in MicroPython does NOT support timeout parameter!
-                if method == "GET":
-                    response = requests.get(url)
-                elif method == "PUT":
-                    response = requests.put(url, data=data, headers=headers)
-                elif method == "POST":
-                    response = requests.post(url, data=data, headers=headers)
-                elif method == "DELETE":
-                    response = requests.delete(url)
+                status, body = self._timed(conn.request, method, path, data, headers)
+                self.last_headers = conn.headers
                 
-                if response.status_code in [200, 201]:
-                    result = response.json() if response.text else None
+                if status in [200, 201]:
+                    if raw:
+                        return body
+                    result = json.loads(body) if body else None
                     return result
                 else:
-                    print(f"  ⚠ Firebase {method} status {response.status_code} (attempt {attempt+1}/{self.max_retries})")
+                    print(f"  ⚠ Firebase {method} status {status} (attempt {attempt+1}/{self.max_retries})")
                     if attempt < self.max_retries - 1:
                         time.sleep(2 ** attempt)  # Exponential backoff
             except Exception as e:
                 print(f"  ⚠ Firebase {method} error: {e} (attempt {attempt+1}/{self.max_retries})")
                 if attempt < self.max_retries - 1:
                     time.sleep(2 ** attempt)  # Exponential backoff
-            finally:
-                if response:
-                    try:
-                        response.close()
-                    except:
-                        pass
         
         # All retries failed
         print(f"  ✗ Firebase {method} failed after {self.max_retries} attempts")
+        self._count("failures")
         return None
     
+    def get_many(self, paths):
+        """Pipelined GETs on one connection - returns list of values (None on error)"""
+        conn, _ = self._connection(self.base_url + "/")
+        requests = [("GET", split_url(f"{self.base_url}/{path}.json")[3], None, None) for path in paths]
+        for attempt in range(self.max_retries):
+            if attempt:
+                self._count("retries")
+            try:
+                results = []
+                for status, body in self._timed(conn.pipeline, requests):
+                    results.append(json.loads(body) if status == 200 and body else None)
+                return results
+            except Exception as e:
+                print(f"  ⚠ Firebase pipelined GET error: {e} (attempt {attempt+1}/{self.max_retries})")
+                if attempt < self.max_retries - 1:
+                    time.sleep(2 ** attempt)
+        self._count("failures")
+        return [None] * len(paths)
+    
     def get(self, path):
         """GET request to Firebase with retry"""
         url = f"{self.base_url}/{path}.json"
         return self._make_request("GET", url)
     
     def put(self, path, data):
-        """PUT request to Firebase with retry"""
+        """PUT request to Firebase with retry (queued while batching)"""
+        if self.batch is not None:
+            self.batch[path] = data
+            return True
         url = f"{self.base_url}/{path}.json"
         headers = {'Content-Type': 'application/json'}
         result = self._make_request("PUT", url, data=json.dumps(data), headers=headers)
         return result is not None
     
-    def post(self, path, data):
-        """POST request to Firebase with retry"""
+    def patch(self, path, data):
+        """PATCH request to Firebase with retry (multi-location update)"""
         url = f"{self.base_url}/{path}.json"
         headers = {'Content-Type': 'application/json'}
-        result = self._make_request("POST", url, data=json.dumps(data), headers=headers)
-        return result
+        result = self._make_request("PATCH", url, data=json.dumps(data), headers=headers)
+        return result is not None
     
     def delete(self, path):
         """DELETE request to Firebase with retry"""
@@ -73,17 +220,229 @@ class FirebaseClient:
         result = self._make_request("DELETE", url)
         return result is not None
     
+    # =========================================================================
+    # BATCHING (one multi-location PATCH per loop instead of one PUT per node)
+    # =========================================================================
+    
+    def begin_batch(self):
+        """Collect all following writes until flush_batch()"""
+        if self.batch is None:
+            self.batch = {}
+    
+    def flush_batch(self):
+        """Send collected writes as one PATCH on the root - returns success"""
+        batch = self.batch
+        self.batch = None
+        if batch is None:
+            return True
+        
+        # Buffered errors ride along as keyed children of systemErrors
+        sent_errors = self.error_ring_count
+        for key, data in self._pending_errors().items():
+            batch["systemErrors/" + key] = data
+        if not batch:
+            return True
+        
+        print(f"→ Firebase batch: {len(batch)} paths in 1 request")
+        url = f"{self.base_url}/.json"
+        headers = {'Content-Type': 'application/json'}
+        result = self._make_request("PATCH", url, data=json.dumps(batch), headers=headers)
+        if result is None:
+            # Keep history / errors / test results on flash for later
+            if self.store_offline(batch):
+                self.error_ring_count -= sent_errors
+            return False
+        self.error_ring_count -= sent_errors
+        return True
+    
+    # =========================================================================
+    # OFFLINE QUEUE (store-and-forward on flash, see offline_queue.py)
+    # =========================================================================
+    
+    def store_offline(self, updates):
+        """Persist durable paths of a failed update - returns True if all were stored"""
+        if self.offline is None:
+            return False
+        stored = 0
+        failed = 0
+        for path, data in updates.items():
+            if data is None:
+                continue
+            if path.startswith("historicalData/"):
+                ok = self.offline.append(KIND_HISTORY, path[15:], data)
+            elif path.startswith("systemErrors/"):
+                ok = self.offline.append(KIND_ERROR, path[13:], data)
+            elif path == "lastTest":
+                ok = self.offline.append(KIND_TEST, self.push_id(), data)
+            else:
+                continue  # sensorData / systemStatus / command clears are transient
+            if ok:
+                stored += 1
+            else:
+                failed += 1
+        if stored:
+            print(f"→ {stored} records stored offline")
+        return not failed
+    
+    def drain_offline(self, max_records=50):
+        """Upload queued records as bulk PATCHes - returns number of records sent"""
+        if self.offline is None or self.offline.is_empty():
+            return 0
+        sent = 0
+        while not self.offline.is_empty():
+            updates, end = self.offline.read_batch(max_records)
+            if not updates:
+                # Only unknown or corrupt records: skip them and go on
+                self.offline.commit(end)
+                continue
+            print(f"→ Draining offline queue: {len(updates)} records")
+            if not self.patch("", updates):
+                print("⚠ Offline drain failed - will retry")
+                break
+            self.offline.commit(end)
+            sent += len(updates)
+        return sent
+    
+    def cancel_batch(self):
+        """Drop collected writes (e.g. after an error mid-loop)"""
+        self.batch = None
+    
+    def push_id(self, now_ms=None):
+        """Generate Firebase-compatible push ID on the device (chronologically sortable)"""
+        if now_ms is None:
+            now_ms = self.system.get_timestamp() if self.system else int(time.time() * 1000)
+        now_ms = int(now_ms)
+        
+        if now_ms == self.last_push_ms:
+            # Same millisecond: increment random part to keep ordering
+            for i in range(11, -1, -1):
+                if self.last_push_rand[i] < 63:
+                    self.last_push_rand[i] += 1
+                    break
+                self.last_push_rand[i] = 0
+        else:
+            self.last_push_rand = [random.getrandbits(6) for _ in range(12)]
+        self.last_push_ms = now_ms
+        
+        time_chars = []
+        t = now_ms
+        for _ in range(8):
+            time_chars.append(PUSH_CHARS[t % 64])
+            t //= 64
+        time_chars.reverse()
+        return "".join(time_chars) + "".join(PUSH_CHARS[r] for r in self.last_push_rand)
+    
+    # =========================================================================
+    # STREAMING (Firebase REST: Accept: text/event-stream)
+    # =========================================================================
+    
+    def is_streaming(self, path):
+        """Check if a live stream connection exists for path"""
+        return self.streams.get(path, False)
+    
+    async def stream(self, path, callback, retry_delay=5, idle_timeout=75):
+        """
+        Listen to a node over one long-lived connection and call
+        callback(path, value) whenever it changes. Reconnects forever.
+        Firebase sends keep-alive events every ~30s, so idle_timeout
+        detects dead connections.
+        """
+        while True:
+            try:
+                await self._stream_once(path, callback, idle_timeout)
+            except Exception as e:
+                print(f"  ⚠ Firebase stream '{path}' error: {e}")
+            self.streams[path] = False
+            await asyncio.sleep(retry_delay)
+    
+    async def _stream_once(self, path, callback, idle_timeout):
+        """Open one stream connection (following redirects) and process events"""
+        url = f"{self.base_url}/{path}.json"
+        
+        for redirect in range(3):
+            scheme, host, port, req_path = split_url(url)
+            reader, writer = await asyncio.open_connection(host, port, ssl=True if scheme == "https" else None)
+            try:
+                request = (
+                    f"GET {req_path} HTTP/1.1\r\n"
+                    f"Host: {host}\r\n"
+                    "Accept: text/event-stream\r\n"
+                    "Connection: keep-alive\r\n\r\n"
+                )
+                writer.write(request.encode())
+                await writer.drain()
+                
+                status_line = await asyncio.wait_for(reader.readline(), idle_timeout)
+                status = int(status_line.split(b" ")[1])
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), idle_timeout)
+                    if not line or line == b"\r\n":
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                
+                if status in (301, 302, 307) and "location" in headers:
+                    url = headers["location"]
+                    continue
+                if status != 200:
+                    raise Exception(f"stream status {status}")
+                
+                print(f"✓ Firebase stream '{path}' connected")
+                self.streams[path] = True
+                await self._read_events(reader, path, callback, idle_timeout,
+                                        headers.get("transfer-encoding", "") == "chunked")
+                return
+            finally:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except Exception:
+                    pass
+        
+        raise Exception("too many redirects")
+    
+    async def _read_events(self, reader, path, callback, idle_timeout, chunked):
+        """Read body (plain or chunked), parse SSE and dispatch node changes"""
+        parser = SSEParser()
+        value = None
+        
+        while True:
+            if chunked:
+                size_line = await asyncio.wait_for(reader.readline(), idle_timeout)
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    raise Exception("stream closed")
+                chunk = await asyncio.wait_for(reader.readexactly(size + 2), idle_timeout)
+                chunk = chunk[:-2]
+            else:
+                chunk = await asyncio.wait_for(reader.readline(), idle_timeout)
+                if not chunk:
+                    raise Exception("stream closed")
+            
+            for event, data in parser.feed(chunk):
+                if event in ("put", "patch"):
+                    value = apply_stream_event(value, event, json.loads(data))
+                    try:
+                        callback(path, value)
+                    except Exception as e:
+                        print(f"✗ Stream callback error ({path}): {e}")
+                elif event in ("cancel", "auth_revoked"):
+                    raise Exception(f"stream {event}")
+                # keep-alive: nothing to do
+    
+    # =========================================================================
+    # ERROR LOG (ring buffer on device, append-only keyed writes)
+    # =========================================================================
+    
     def log_error(self, error_type, component, message, severity="error"):
-        """Log error to Firebase (best effort - no retries)"""
+        """Buffer error locally - sent with the next batch / flush_errors()"""
         try:
             if not self.system:
                 return
             
             self.error_count += 1
-            existing_errors = self.get("systemErrors") or {}
-            
             now_ms = self.system.get_timestamp()
-            error_key = f"error_{int(now_ms/1000)}_{self.error_count}"
             
             error_data = {
                 "timestamp": now_ms,
@@ -94,20 +453,66 @@ class FirebaseClient:
                 "resolved": False
             }
             
-            existing_errors[error_key] = error_data
-            
-            # Keep only the 10 newest
-            if len(existing_errors) > 10:
-                sorted_errors = sorted(
-                    existing_errors.items(),
-                    key=lambda x: x[1].get("timestamp", 0),
-                    reverse=True
-                )[:10]
-                existing_errors = dict(sorted_errors)
+            # Push ID key = chronological order without reading the node
+            self.write_error(self.push_id(now_ms), error_data)
+        except Exception as e:
+            print(f"✗ Failed to buffer error: {e}")
+    
+    def write_error(self, key, error_data):
+        """Buffer keyed error entry - replaces a still unsent entry with same key"""
+        size = len(self.error_ring)
+        start = (self.error_ring_head - self.error_ring_count) % size
+        for n in range(self.error_ring_count):
+            slot = (start + n) % size
+            if self.error_ring[slot][0] == key:
+                self.error_ring[slot] = (key, error_data)
+                return
+        
+        slot = self.error_ring_head
+        self.error_ring[slot] = (key, error_data)
+        self.error_ring_head = (slot + 1) % size
+        if self.error_ring_count < size:
+            self.error_ring_count += 1
+        else:
+            self.errors_dropped += 1  # Oldest unsent entry overwritten
+    
+    def _pending_errors(self):
+        """Unsent ring entries as {key: data} (oldest first)"""
+        size = len(self.error_ring)
+        start = (self.error_ring_head - self.error_ring_count) % size
+        pending = {}
+        for n in range(self.error_ring_count):
+            key, data = self.error_ring[(start + n) % size]
+            pending[key] = data
+        return pending
+    
+    def flush_errors(self):
+        """Send buffered errors as one PATCH on systemErrors (joins batch if active)"""
+        if self.error_ring_count == 0 or self.batch is not None:
+            return True
+        
+        if self.patch("systemErrors", self._pending_errors()):
+            self.error_ring_count = 0
+            return True
+        return False
+    
+    def trim_errors(self, keep=10):
+        """Delete all but the newest `keep` errors (scheduled, not per error)"""
+        try:
+            keys = self._make_request("GET", f"{self.base_url}/systemErrors.json?shallow=true")
+            if not keys or len(keys) <= keep:
+                return True
             
-            self.put("systemErrors", existing_errors)
+            # Legacy "error_<sec>_<n>" keys sort first = treated as oldest
+            ordered = sorted(keys, key=lambda k: (not k.startswith("error_"), k))
+            removals = {}
+            for key in ordered[:len(ordered) - keep]:
+                removals[key] = None
+            print(f"→ Trimming {len(removals)} old errors")
+            return self.patch("systemErrors", removals)
         except Exception as e:
-            print(f"✗ Failed to log error to Firebase: {e}")
+            print(f"✗ Error trim failed: {e}")
+            return False
     
     # Convenience methods
     def update_sensor_data(self, data):
@@ -118,22 +523,30 @@ class FirebaseClient:
         """Update system status in Firebase"""
         return self.put("systemStatus", status)
     
-    def get_settings(self):
-        """Get system settings from Firebase"""
-        return self.get("settings")
+    def get_settings_version(self):
+        """Tiny version counter bumped by the website on every settings save"""
+        return self.get("settingsVersion")
     
-    def get_manual_watering(self):
-        """Check for manual watering commands"""
-        return self.get("manualWatering")
+    def get_with_etag(self, path, etag=None):
+        """
+        GET with X-Firebase-ETag. Returns (changed, value, etag); value is
+        only parsed when the ETag differs. (None, None, etag) on error.
+        Firebase has no conditional GET: the body is transferred either
+        way, only settingsVersion saves the download.
+        """
+        url = f"{self.base_url}/{path}.json"
+        body = self._make_request("GET", url, headers={"X-Firebase-ETag": "true"}, raw=True)
+        if body is None:
+            return None, None, etag
+        new_etag = self.last_headers.get("etag")
+        if etag and new_etag == etag:
+            return False, None, etag
+        return True, json.loads(body) if body else None, new_etag
     
     def clear_manual_watering(self):
         """Clear manual watering command"""
         return self.put("manualWatering", None)
     
-    def get_manual_test_trigger(self):
-        """Check for manual test trigger"""
-        return self.get("manualTest")
-    
     def clear_manual_test_trigger(self):
         """Clear manual test trigger"""
         if not self.system:
@@ -141,10 +554,19 @@ class FirebaseClient:
         return self.put("manualTest", {"trigger": False, "timestamp": self.system.get_timestamp()})
     
     def update_test_result(self, result):
-        """Update test result in Firebase"""
-        return self.put("lastTest", result)
+        """Update test result in Firebase (stored offline on failure)"""
+        if self.put("lastTest", result):
+            return True
+        self.store_offline({"lastTest": result})
+        return False
     
     def save_historical_data(self, data):
-        """Save historical data point to Firebase"""
-        # POST creates unique key automatically
-        return self.post("historicalData", data) is not None
+        """Save historical data point to Firebase (stored offline on failure)"""
+        # Push ID generated on device: joins batch PATCH, retries stay idempotent
+        path = "historicalData/" + self.push_id(data.get("timestamp"))
+        if self.batch is not None:
+            self.batch[path] = data
+            return True
+        if self.put(path, data):
+            return True
+        return self.store_offline({path: data})
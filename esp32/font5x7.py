@@ -0,0 +1,23 @@
+# 5x7 Bitmap-Font (Glyph-Tabelle) - zum Einfrieren in die Firmware (frozen module)
+#
+# 5 bytes per glyph, one per column (left to right), bit 0 = top row.
+# As a frozen module the table stays in flash and costs no RAM.
+# Lowercase letters are drawn as uppercase; unknown characters as '?'.
+
+WIDTH = 5
+HEIGHT = 7
+CHARS = ' !%-./0123456789:?ABCDEFGHIJKLMNOPQRSTUVWXYZ°'
+GLYPHS = (
+    b"\x00\x00\x00\x00\x00\x00\x00\x5f\x00\x00\x23\x13\x08\x64\x62\x08\x08\x08\x08\x08"
+    b"\x00\x60\x60\x00\x00\x20\x10\x08\x04\x02\x3e\x51\x49\x45\x3e\x00\x42\x7f\x40\x00"
+    b"\x42\x61\x51\x49\x46\x21\x41\x45\x4b\x31\x18\x14\x12\x7f\x10\x27\x45\x45\x45\x39"
+    b"\x3c\x4a\x49\x49\x30\x01\x71\x09\x05\x03\x36\x49\x49\x49\x36\x06\x49\x49\x29\x1e"
+    b"\x00\x36\x36\x00\x00\x02\x01\x51\x09\x06\x7e\x09\x09\x09\x7e\x7f\x49\x49\x49\x36"
+    b"\x3e\x41\x41\x41\x22\x7f\x41\x41\x22\x1c\x7f\x49\x49\x49\x41\x7f\x09\x09\x09\x01"
+    b"\x3e\x41\x49\x49\x7a\x7f\x08\x08\x08\x7f\x00\x41\x7f\x41\x00\x20\x40\x41\x3f\x01"
+    b"\x7f\x08\x14\x22\x41\x7f\x40\x40\x40\x40\x7f\x02\x0c\x02\x7f\x7f\x04\x08\x10\x7f"
+    b"\x3e\x41\x41\x41\x3e\x7f\x09\x09\x09\x06\x3e\x41\x51\x21\x5e\x7f\x09\x19\x29\x46"
+    b"\x46\x49\x49\x49\x31\x01\x01\x7f\x01\x01\x3f\x40\x40\x40\x3f\x1f\x20\x40\x20\x1f"
+    b"\x3f\x40\x38\x40\x3f\x63\x14\x08\x14\x63\x07\x08\x70\x08\x07\x61\x51\x49\x45\x43"
+    b"\x06\x09\x09\x06\x00"
+)
@@ -0,0 +1,105 @@
+# Reines Python-Ersatzmodul für framebuf (nur MONO_HLSB) - Rendering-Tests auf dem PC
+#
+# Implements the subset of MicroPython's framebuf.FrameBuffer used by the
+# display drivers, with the same clipping and bit layout (MSB = leftmost
+# pixel), so frames rendered on Linux are byte-identical to the device.
+# On the ESP32 the built-in C module is used instead.
+
+MONO_HLSB = 3
+
+
+class FrameBuffer:
+    def __init__(self, buf, width, height, format=MONO_HLSB, stride=None):
+        if format != MONO_HLSB:
+            raise ValueError("only MONO_HLSB is supported")
+        self.buf = buf
+        self.width = width
+        self.height = height
+        self.stride = ((stride or width) + 7) // 8  # Bytes per row
+
+    def fill(self, c):
+        value = 0xFF if c else 0x00
+        buf = self.buf
+        for i in range(self.stride * self.height):
+            buf[i] = value
+
+    def pixel(self, x, y, c=None):
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            return None
+        index = (x >> 3) + y * self.stride
+        mask = 0x80 >> (x & 7)
+        if c is None:
+            return 1 if self.buf[index] & mask else 0
+        if c:
+            self.buf[index] |= mask
+        else:
+            self.buf[index] &= ~mask
+
+    def fill_rect(self, x, y, w, h, c):
+        # Clip once, then set whole bytes in the middle of each row
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self.width)
+        y1 = min(y + h, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        buf = self.buf
+        first = x0 >> 3
+        last = (x1 - 1) >> 3
+        left = 0xFF >> (x0 & 7)
+        right = (0xFF << (7 - ((x1 - 1) & 7))) & 0xFF
+        for row in range(y0, y1):
+            base = row * self.stride
+            if first == last:
+                masks = ((first, left & right),)
+            else:
+                masks = ((first, left), (last, right))
+            for index, mask in masks:
+                if c:
+                    buf[base + index] |= mask
+                else:
+                    buf[base + index] &= ~mask
+            full = 0xFF if c else 0x00
+            for index in range(first + 1, last):
+                buf[base + index] = full
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.fill_rect(x, y, w, 1, c)
+        self.fill_rect(x, y + h - 1, w, 1, c)
+        self.fill_rect(x, y, 1, h, c)
+        self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x0, y0, x1, y1, c):
+        # Bresenham, both end points included
+        dx = abs(x1 - x0)
+        sx = 1 if x0 < x1 else -1
+        dy = -abs(y1 - y0)
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x0, y0, c)
+            if x0 == x1 and y0 == y1:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def blit(self, fbuf, x, y, key=-1):
+        for sy in range(fbuf.height):
+            for sx in range(fbuf.width):
+                c = fbuf.pixel(sx, sy)
+                if c != key:
+                    self.pixel(x + sx, y + sy, c)
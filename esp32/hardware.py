@@ -1,7 +1,9 @@
 # Hardware Controller für ESP32-S3 Bewässerungssystem
 import time
-from machine import Pin, ADC
+from array import array
+from machine import Pin, ADC, Timer, time_pulse_us
 import dht
+from calibration import MoistureCalibration
 
 class HardwareController:
     def __init__(self, config):
@@ -14,88 +16,343 @@ class HardwareController:
         for adc in self.moisture_adcs:
             adc.atten(ADC.ATTN_11DB)  # Full range 0-3.3V
         
+        # Moisture sampling: N samples per channel, interleaved across the
+        # ADCs, into one preallocated buffer (millivolts, channel-major)
+        self.moisture_samples = max(1, config.get('MOISTURE_SAMPLES', 16))
+        self.moisture_filter = config.get('MOISTURE_FILTER', 'trimmed')  # 'trimmed' or 'median'
+        self.sample_buf = array('H', [0] * (self.moisture_samples * len(self.moisture_adcs)))
+        self.moisture_mv = [0] * len(self.moisture_adcs)  # Filtered value per channel
+        self.moisture_noise = [0.0] * len(self.moisture_adcs)  # Noise estimate per channel (%)
+        self.adc_uv = hasattr(self.moisture_adcs[0], 'read_uv') if self.moisture_adcs else False
+        
+        # Calibration curve per sensor (flash, overridden by settings)
+        self.calibration = MoistureCalibration(
+            len(self.moisture_adcs),
+            config.get('MOISTURE_DRY_MV', 3100),
+            config.get('MOISTURE_WET_MV', 910),
+            config.get('CALIBRATION_FILE', '/calibration.json'))
+        if self.calibration.load():
+            print("✓ Moisture calibration loaded from flash")
+        
         # Initialize DHT11
         self.dht_sensor = dht.DHT11(Pin(config['DHT_PIN']))
+        self.dht_min_period_ms = config.get('DHT_MIN_PERIOD_MS', 1000)  # Sensor needs ~1 s between reads
+        self.dht_max_age_ms = config.get('DHT_MAX_AGE_MS', 5000)  # Cached value still counts as fresh
+        self.dht_retries = config.get('DHT_RETRIES', 2)  # Failed reads bridged by the last good value
+        self.dht_failures = 0  # Consecutive failed measure() calls
+        self.dht_value = None  # Last good (temperature, humidity)
+        self.dht_time = 0  # ticks_ms of dht_value
+        self.dht_last_measure = None  # ticks_ms of the last measure() attempt
         
         # Initialize Ultrasonic Sensor
         self.trigger = Pin(config['ULTRASONIC_TRIGGER'], Pin.OUT)
         self.echo = Pin(config['ULTRASONIC_ECHO'], Pin.IN)
+        self.ultrasonic_pings = max(1, config.get('ULTRASONIC_PINGS', 5))
+        self.ultrasonic_gap_ms = config.get('ULTRASONIC_PING_GAP_MS', 50)  # Let echoes die out
+        self.ultrasonic_timeout_us = config.get('ULTRASONIC_TIMEOUT_US', 30000)  # ~5 m
+        self.ultrasonic_valid = 0  # Pings used for the last reading
         
         # Initialize Relays (active LOW for most relay modules)
         self.relays = [Pin(pin, Pin.OUT, value=1) for pin in config['RELAY_PINS']]
+        for relay in self.relays:
+            try:
+                relay.init(Pin.OUT, value=1, hold=False)  # Release deep-sleep hold
+            except Exception:
+                pass
         
         # Last watered timestamps
         self.last_watered = [0, 0, 0, 0]
         self.last_pump4_run = 0
         
+        # Pump scheduler: one pump at a time, further jobs are queued
+        self.pump_queue = []  # [(pump_id, duration_s), ...]
+        self.active_pump = None
+        self.pump_deadline = 0  # ticks_ms when active pump must stop
+        self.pump_timer = Timer(config.get('PUMP_TIMER_ID', 0))
+        self.pump_run = 0  # Counts pump starts: a late timer callback of an earlier run is ignored
+        
         print("✓ Hardware initialized")
     
+    def _read_mv(self, adc):
+        """One ADC reading in mV (eFuse-calibrated read_uv() where available)"""
+        if self.adc_uv:
+            return adc.read_uv() // 1000
+        return adc.read() * 3100 // 4095
+    
+    def _filter_samples(self, offset, n):
+        """
+        Sort one channel's samples in place (insertion sort, no allocation)
+        and return (value mV, noise mV). Value: median or interquartile mean,
+        noise: interquartile range scaled to a standard deviation.
+        """
+        buf = self.sample_buf
+        for i in range(offset + 1, offset + n):
+            v = buf[i]
+            j = i - 1
+            while j >= offset and buf[j] > v:
+                buf[j + 1] = buf[j]
+                j -= 1
+            buf[j + 1] = v
+        
+        q1 = offset + n // 4
+        q3 = offset + (3 * n) // 4
+        if self.moisture_filter == 'median' or q3 <= q1:
+            value = buf[offset + n // 2]
+        else:
+            total = 0
+            for i in range(q1, q3):
+                total += buf[i]
+            value = total // (q3 - q1)
+        noise = (buf[min(q3, offset + n - 1)] - buf[q1]) * 20 // 27  # IQR / 1.35
+        return value, noise
+    
+    def sample_moisture(self, channels=None):
+        """
+        Oversample moisture channels (interleaved, so slow drifts and
+        ADC noise affect all channels alike). Returns one entry per channel:
+        moisture % or the exception of a failed channel. Noise estimates
+        (%) are kept in self.moisture_noise.
+        """
+        if channels is None:
+            channels = range(len(self.moisture_adcs))
+        n = self.moisture_samples
+        buf = self.sample_buf
+        adcs = self.moisture_adcs
+        failed = {}
+        for s in range(n):
+            for ch in channels:
+                if ch in failed:
+                    continue
+                try:
+                    buf[ch * n + s] = self._read_mv(adcs[ch])
+                except Exception as e:
+                    failed[ch] = e
+        
+        results = []
+        calibration = self.calibration
+        for ch in channels:
+            if ch in failed:
+                results.append(Exception(f"Moisture sensor {ch} read failed: {failed[ch]}"))
+                continue
+            value, noise = self._filter_samples(ch * n, n)
+            self.moisture_mv[ch] = value
+            self.moisture_noise[ch] = noise * 100 / calibration.spans[ch]
+            results.append(calibration.percent(ch, value))
+        return results
+    
     def read_moisture(self, sensor_id):
-        """Read moisture sensor (0-100%) - raises exception on error"""
-        try:
-            raw = self.moisture_adcs[sensor_id].read()
-            # Calibration: 4095 (dry) -> 0%, 1200 (wet) -> 100%
-            dry_value = 4095
-            wet_value = 1200
-            moisture = 100 - ((raw - wet_value) * 100 / (dry_value - wet_value))
-            return max(0, min(100, moisture))
-        except Exception as e:
-            raise Exception(f"Moisture sensor {sensor_id} read failed: {e}")
+        """Read moisture sensor (0-100%, oversampled) - raises exception on error"""
+        if sensor_id < 0 or sensor_id >= len(self.moisture_adcs):
+            raise Exception(f"Moisture sensor {sensor_id} read failed: no such sensor")
+        result = self.sample_moisture((sensor_id,))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def calibrate_moisture(self, sensor_id, percent):
+        """
+        Capture a calibration point: probe sensor_id is at a known moisture
+        (0 = dry air, 100 = water). Returns the channel's new curve.
+        """
+        if sensor_id < 0 or sensor_id >= len(self.moisture_adcs):
+            raise ValueError(f"no moisture sensor {sensor_id}")
+        result = self.sample_moisture((sensor_id,))[0]
+        if isinstance(result, Exception):
+            raise result
+        curve = self.calibration.capture(sensor_id, self.moisture_mv[sensor_id], percent)
+        self.calibration.save()
+        return curve
     
-    def read_dht11(self):
-        """Read temperature and humidity from DHT11 - raises exception on error"""
+    def dht_ready(self):
+        """True once DHT_MIN_PERIOD_MS have passed since the last measure()"""
+        return (self.dht_last_measure is None or
+                time.ticks_diff(time.ticks_ms(), self.dht_last_measure) >= self.dht_min_period_ms)
+    
+    def read_dht11(self, max_age_ms=None):
+        """
+        Read temperature and humidity from DHT11 - raises exception on error.
+        Never waits: a reading younger than max_age_ms (default
+        DHT_MAX_AGE_MS) or taken less than DHT_MIN_PERIOD_MS ago is
+        returned from the cache. A failed measure is retried on the next
+        call; up to DHT_RETRIES failures in a row return the last good value.
+        """
+        if max_age_ms is None:
+            max_age_ms = self.dht_max_age_ms
+        if self.dht_value and time.ticks_diff(time.ticks_ms(), self.dht_time) <= max_age_ms:
+            return self.dht_value
+        if not self.dht_ready():
+            if self.dht_value:
+                return self.dht_value
+            raise Exception("DHT11 read failed: sensor not ready")
+        
+        self.dht_last_measure = time.ticks_ms()
         try:
             self.dht_sensor.measure()
-            temp = self.dht_sensor.temperature()
-            humidity = self.dht_sensor.humidity()
-            return temp, humidity
         except Exception as e:
-            raise Exception(f"DHT11 read failed: {e}")
+            # OSError: checksum mismatch or no response
+            self.dht_failures += 1
+            if self.dht_value and self.dht_failures <= self.dht_retries:
+                return self.dht_value
+            raise Exception(f"DHT11 read failed: {e} ({self.dht_failures}x in a row)")
+        self.dht_failures = 0
+        self.dht_value = (self.dht_sensor.temperature(), self.dht_sensor.humidity())
+        self.dht_time = self.dht_last_measure
+        return self.dht_value
     
-    def read_ultrasonic(self):
-        """Read distance from ultrasonic sensor (cm) - raises exception on error"""
-        try:
-            self.trigger.value(0)
-            time.sleep_us(2)
-            self.trigger.value(1)
-            time.sleep_us(10)
-            self.trigger.value(0)
-            
-            # Timeout after 30ms (max distance ~5m)
-            timeout = 30000
-            pulse_start = time.ticks_us()
-            
-            while self.echo.value() == 0:
-                if time.ticks_diff(time.ticks_us(), pulse_start) > timeout:
-                    raise Exception("Echo timeout (start)")
-                pulse_start = time.ticks_us()
-            
-            pulse_end = time.ticks_us()
-            while self.echo.value() == 1:
-                if time.ticks_diff(time.ticks_us(), pulse_start) > timeout:
-                    raise Exception("Echo timeout (end)")
-                pulse_end = time.ticks_us()
-            
-            pulse_duration = time.ticks_diff(pulse_end, pulse_start)
-            distance = (pulse_duration * 0.0343) / 2
-            
-            return distance
-        except Exception as e:
-            raise Exception(f"Ultrasonic read failed: {e}")
+    def _ping(self):
+        """One ping -> echo pulse width in us (hardware-timed), None on timeout"""
+        if self.echo.value():
+            return None  # Previous echo still high - would measure a partial pulse
+        self.trigger.value(0)
+        time.sleep_us(2)
+        self.trigger.value(1)
+        time.sleep_us(10)
+        self.trigger.value(0)
+        width = time_pulse_us(self.echo, 1, self.ultrasonic_timeout_us)
+        return width if width > 0 else None  # -2: no echo start, -1: echo too long
+    
+    def read_ultrasonic(self, temperature=None):
+        """
+        Read distance from ultrasonic sensor (cm) - raises exception on error.
+        Burst of pings; pulses further than 5% from the median are dropped,
+        the rest averaged. Speed of sound corrected for temperature (°C,
+        20 °C if unknown).
+        """
+        pulses = []
+        for i in range(self.ultrasonic_pings):
+            if i:
+                time.sleep_ms(self.ultrasonic_gap_ms)
+            width = self._ping()
+            if width is not None:
+                pulses.append(width)
+        
+        if len(pulses) * 2 < self.ultrasonic_pings:
+            raise Exception(f"Ultrasonic read failed: Echo timeout ({len(pulses)}/{self.ultrasonic_pings} pings)")
+        
+        pulses.sort()
+        median = pulses[len(pulses) // 2]
+        tolerance = median // 20 + 30  # 5% + ~0.5 cm
+        total = 0
+        count = 0
+        for width in pulses:
+            if abs(width - median) <= tolerance:
+                total += width
+                count += 1
+        self.ultrasonic_valid = count
+        
+        if temperature is None:
+            temperature = 20
+        speed = (331.3 + 0.606 * temperature) / 10000  # cm/us
+        return total / count * speed / 2
     
     def activate_pump(self, pump_id, duration):
-        """Activate pump for specified duration (seconds)"""
+        """Queue pump for specified duration (seconds) - returns immediately"""
+        if pump_id < 0 or pump_id >= len(self.relays):
+            print(f"  ✗ Invalid pump {pump_id + 1}")
+            return False
+        
+        self.pump_queue.append((pump_id, duration))
+        print(f"  → Pump {pump_id + 1} queued for {duration}s ({len(self.pump_queue)} waiting)")
+        self.update_pumps()
+        return True
+    
+    def update_pumps(self):
+        """
+        Stop the active pump once its deadline passed and start the next job.
+        Must be called regularly (see sleep()). Returns True while pumps are busy.
+        """
+        if self.active_pump is not None:
+            if time.ticks_diff(time.ticks_ms(), self.pump_deadline) >= 0:
+                self._stop_pump()
+        
+        if self.active_pump is None and self.pump_queue:
+            pump_id, duration = self.pump_queue.pop(0)
+            self._start_pump(pump_id, duration)
+        
+        return self.pumps_busy()
+    
+    def pumps_busy(self):
+        """Check if a pump is running or jobs are waiting"""
+        return self.active_pump is not None or len(self.pump_queue) > 0
+    
+    def pump_pending(self, pump_id):
+        """Check if pump is running or already queued"""
+        if self.active_pump == pump_id:
+            return True
+        for job in self.pump_queue:
+            if job[0] == pump_id:
+                return True
+        return False
+    
+    def wait_for_pumps(self, timeout=300):
+        """Block until all queued pump jobs are done (seconds timeout)"""
+        start = time.ticks_ms()
+        while self.update_pumps():
+            if time.ticks_diff(time.ticks_ms(), start) > timeout * 1000:
+                print("  ⚠ Pump wait timeout - stopping all pumps")
+                self.stop_all_pumps()
+                return False
+            time.sleep_ms(50)
+        return True
+    
+    def sleep(self, seconds):
+        """Sleep while still switching pumps off on time"""
+        end = time.ticks_add(time.ticks_ms(), int(seconds * 1000))
+        while True:
+            self.update_pumps()
+            remaining = time.ticks_diff(end, time.ticks_ms())
+            if remaining <= 0:
+                return
+            if self.active_pump is not None:
+                # Wake up for the pump deadline
+                remaining = min(remaining, max(0, time.ticks_diff(self.pump_deadline, time.ticks_ms())))
+            time.sleep_ms(min(remaining, 1000) if remaining > 0 else 10)
+    
+    def stop_all_pumps(self):
+        """Emergency stop: all relays OFF, queue cleared"""
+        self.pump_queue = []
+        try:
+            self.pump_timer.deinit()
+        except:
+            pass
+        for relay in self.relays:
+            try:
+                relay.value(1)
+            except:
+                pass
+        self.active_pump = None
+    
+    def prepare_deep_sleep(self):
+        """Stop pumps and hold relay pins HIGH (OFF) while the CPU sleeps"""
+        self.stop_all_pumps()
+        for relay in self.relays:
+            try:
+                relay.init(Pin.OUT, value=1, hold=True)
+            except Exception:
+                pass  # Port without pin hold support
+        try:
+            import esp32
+            esp32.gpio_deep_sleep_hold(True)
+        except Exception:
+            pass
+    
+    def _start_pump(self, pump_id, duration):
+        """Switch relay ON and arm deadline + one-shot timer"""
         try:
             print(f"  → Activating pump {pump_id + 1} for {duration}s")
+            period_ms = int(duration * 1000)
+            self.active_pump = pump_id
+            self.pump_run += 1
+            run = self.pump_run
+            self.pump_deadline = time.ticks_add(time.ticks_ms(), period_ms)
             self.relays[pump_id].value(0)  # Relay ON (active LOW)
-            time.sleep(duration)
-            self.relays[pump_id].value(1)  # Relay OFF
-            print(f"  ✓ Pump {pump_id + 1} done")
-            
-            # Update timestamp
-            if self.system:
-                self.last_watered[pump_id] = self.system.get_timestamp()
-            return True
+            try:
+                # Closure allocated here, not in the callback
+                self.pump_timer.init(mode=Timer.ONE_SHOT, period=max(1, period_ms),
+                                     callback=lambda timer: self._on_pump_timer(run))
+            except Exception as e:
+                # Ticks check in update_pumps() still stops the pump
+                print(f"  ⚠ Pump timer unavailable: {e}")
         except Exception as e:
             print(f"  ✗ Pump {pump_id + 1} activation failed: {e}")
             # Make sure relay is OFF even on error
@@ -103,4 +360,28 @@ class HardwareController:
                 self.relays[pump_id].value(1)
             except:
                 pass
-            return False
+            self.active_pump = None
+    
+    def _stop_pump(self):
+        """Switch active relay OFF and record watering time"""
+        pump_id = self.active_pump
+        try:
+            self.relays[pump_id].value(1)  # Relay OFF
+        except Exception as e:
+            print(f"  ✗ Pump {pump_id + 1} stop failed: {e}")
+        self.active_pump = None
+        print(f"  ✓ Pump {pump_id + 1} done")
+        
+        # Update timestamp
+        if self.system:
+            self.last_watered[pump_id] = self.system.get_timestamp()
+    
+    def _on_pump_timer(self, run):
+        """
+        Timer callback - only switches the relay OFF, bookkeeping in update_pumps().
+        A scheduled callback can run after update_pumps() already stopped that
+        run and started the next pump: run no longer matches, the new pump stays on.
+        """
+        pump_id = self.active_pump
+        if pump_id is not None and run == self.pump_run:
+            self.relays[pump_id].value(1)
@@ -0,0 +1,176 @@
+# Minimaler HTTP/1.1 Client mit Keep-Alive (eine TLS-Verbindung pro Host)
+try:
+    import usocket as socket
+except ImportError:
+    import socket
+try:
+    import ussl as ssl
+except ImportError:
+    import ssl
+
+
+class HTTPClient:
+    def __init__(self, host, port=443, use_ssl=True, timeout=10):
+        """Persistent connection to one host - reconnects transparently"""
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.sock = None
+        self.stream = None
+        self.connects = 0  # Number of (re)connects, useful for diagnostics
+        self.headers = {}  # Headers of the last response (lowercase names)
+
+    def connect(self):
+        """Open TCP (+TLS) connection with real socket timeout"""
+        self.close()
+        addr = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)[0][-1]
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(addr)
+            if self.use_ssl:
+                if hasattr(ssl, "create_default_context"):
+                    sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+                else:
+                    sock = ssl.wrap_socket(sock, server_hostname=self.host)
+        except Exception:
+            sock.close()
+            raise
+
+        self.sock = sock
+        # MicroPython sockets are streams; CPython needs a buffered file
+        self.stream = sock if hasattr(sock, "readline") else sock.makefile("rwb")
+        self.connects += 1
+
+    def set_timeout(self, timeout):
+        """Change the socket timeout (applies to an open connection too)"""
+        self.timeout = timeout
+        if self.sock is not None:
+            try:
+                self.sock.settimeout(timeout)
+            except Exception:
+                self.close()  # Socket without settimeout: reconnect with the new one
+
+    def close(self):
+        """Close connection (next request reconnects)"""
+        for obj in (self.stream, self.sock):
+            if obj is not None:
+                try:
+                    obj.close()
+                except Exception:
+                    pass
+        self.sock = None
+        self.stream = None
+
+    def request(self, method, path, body=None, headers=None):
+        """Single request - returns (status, body bytes)"""
+        return self.pipeline([(method, path, body, headers)])[0]
+
+    def pipeline(self, requests):
+        """
+        Send several requests back-to-back on the one connection, then read
+        the responses in order. requests: [(method, path, body, headers), ...]
+        Returns [(status, body bytes), ...]. When the server closes the
+        connection mid-pipeline, only the requests without a response are
+        sent again on a new one. A stale keep-alive connection is re-opened
+        once before the error is raised to the caller.
+        """
+        responses = []
+        retried = False
+        while len(responses) < len(requests):
+            pending = requests[len(responses):]
+            answered = len(responses)
+            fresh = self.sock is None
+            try:
+                if fresh:
+                    self.connect()
+                for method, path, body, headers in pending:
+                    self._send(method, path, body, headers)
+                self._flush()
+                for _ in pending:
+                    responses.append(self._read_response())
+                    if self.stream is None:
+                        break  # Connection: close - the rest goes on a new connection
+            except Exception:
+                self.close()
+                if len(responses) > answered:
+                    continue  # Closed after some responses - re-send the rest
+                if fresh or retried:
+                    raise
+                retried = True  # Server closed the idle connection - retry on a new one
+        return responses
+
+    def _send(self, method, path, body, headers):
+        if isinstance(body, str):
+            body = body.encode()
+        lines = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}",
+            "Connection: keep-alive",
+            f"Content-Length: {len(body) if body else 0}",
+        ]
+        if headers:
+            for name, value in headers.items():
+                lines.append(f"{name}: {value}")
+        self.stream.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        if body:
+            self.stream.write(body)
+
+    def _flush(self):
+        if hasattr(self.stream, "flush"):
+            self.stream.flush()
+
+    def _read_response(self):
+        status_line = self.stream.readline()
+        if not status_line:
+            raise OSError("connection closed by server")
+        status = int(status_line.split(b" ")[1])
+
+        length = None
+        chunked = False
+        keep_alive = True
+        self.headers = {}
+        while True:
+            line = self.stream.readline()
+            if not line or line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            name = name.strip().lower()
+            value = value.strip()
+            self.headers[name] = value
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding":
+                chunked = value.lower() == "chunked"
+            elif name == "connection":
+                keep_alive = value.lower() != "close"
+
+        if chunked:
+            body = b""
+            while True:
+                size = int(self.stream.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    self.stream.readline()  # Trailing CRLF
+                    break
+                body += self._read_exact(size)
+                self._read_exact(2)  # CRLF after chunk
+        elif length is not None:
+            body = self._read_exact(length)
+        else:
+            # No length: body ends with the connection
+            body = self.stream.read()
+            keep_alive = False
+
+        if not keep_alive:
+            self.close()
+        return status, body
+
+    def _read_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.stream.read(size - len(data))
+            if not chunk:
+                raise OSError("connection closed mid-response")
+            data += chunk
+        return data
@@ -2,13 +2,29 @@
 # MicroPython Implementation - Modular & Robust Version
 
 import time
+import machine
 from machine import Pin, SPI
+try:
+    import uasyncio as asyncio
+except ImportError:
+    try:
+        import asyncio
+    except ImportError:
+        asyncio = None
 from epaper1in54b import EPD
 
 # Import our modules
 from hardware import HardwareController
 from wifi_manager import WiFiManager
 from firebase_client import FirebaseClient
+from error_reporter import ErrorReporter
+from offline_queue import OfflineQueue
+from rtc_state import RTCState
+from settings_cache import SettingsCache
+from self_test import SelfTest
+from metrics import Metrics
+from status_frames import StatusFrames
+from dashboard import Dashboard, sync_age_text
 from ntp_sync import NTPSync
 
 # =============================================================================
@@ -51,9 +67,47 @@ CONFIG = {
     # System Configuration
     'MEASUREMENT_INTERVAL': 300,  # 5 minutes default
     'WATERING_DURATION': 5,  # seconds
+    'PUMP_TIMER_ID': 0,  # Hardware timer used to switch pumps off
+    'MOISTURE_SAMPLES': 16,  # ADC samples per channel and reading
+    'MOISTURE_FILTER': 'trimmed',  # 'trimmed' (interquartile mean) or 'median'
+    'MOISTURE_DRY_MV': 3100,  # Sensor voltage in dry soil -> 0%
+    'MOISTURE_WET_MV': 910,  # Sensor voltage in water -> 100%
+    'CALIBRATION_FILE': '/calibration.json',  # Captured per-sensor curves (settings.moistureCalibration wins)
+    'ULTRASONIC_PINGS': 5,  # Pings per tank reading (median-filtered)
+    'ULTRASONIC_PING_GAP_MS': 50,
+    'SELF_TEST_PUMP_SECONDS': 5,  # Test pulse per pump (pumps run one after another)
+    'SELF_TEST_SOAK': 50,  # One soak window for all sensors after the last pump
     'HISTORICAL_DATA_INTERVAL': 3600,  # Save every hour (3600 seconds)
+    'SETTINGS_CACHE_FILE': '/settings.json',  # Last known settings (boot without network)
+    'STATUS_FRAME_DIR': '/frames',  # Pre-rendered display frames (raw panel data)
+    'DISPLAY_DASHBOARD': True,  # Moisture/tank/sync dashboard (False: status icon only)
+    'OFFLINE_QUEUE_FILE': '/offline.q',  # Store-and-forward queue on flash
+    'OFFLINE_QUEUE_MAX_BYTES': 65536,
+    'ERROR_TRIM_INTERVAL': 3600,  # Trim systemErrors hourly, not per error
+    'MAX_STORED_ERRORS': 10,
+    'METRICS_INTERVAL': 900,  # Publish loop/HTTP timings + heap to deviceMetrics every 15 min
+    'METRICS_HEAP_PROBE': False,  # Also probe the largest allocatable block (allocates across the heap)
+    'ERROR_REREPORT_MIN': 600,  # Unchanged fault re-sent after 10 min, then doubling...
+    'ERROR_REREPORT_MAX': 86400,  # ...up to once a day
+    
+    # Deep-Sleep Mode (battery/solar): wake, sample, upload, sleep
+    'DEEP_SLEEP': False,
+    'NTP_RESYNC_INTERVAL': 86400,  # RTC keeps time in deep sleep - resync daily
+    
+    # Task Runtime (asyncio) - each task runs with its own period (seconds)
+    'USE_ASYNCIO': True,  # False = classic sequential loop
+    'USE_STREAMING': True,  # Firebase event stream per command path (COMMAND_PATHS)
+    'COMMAND_POLL_INTERVAL': 15,  # Poll fallback while no stream is connected
+    'DISPLAY_INTERVAL': 60,
+    'SETTINGS_INTERVAL': 300,
+    'WIFI_CHECK_INTERVAL': 30,
+    'ASYNC_HTTP_TIMEOUT': 3,  # Requests block all tasks: short timeout, failed ones retried next period
+    'PUMP_CHECK_INTERVAL': 0.1,
 }
 
+# Website commands: streamed in the asyncio runtime, polled otherwise
+COMMAND_PATHS = ("manualWatering", "manualTest", "manualCalibration")
+
 # =============================================================================
 # WATERING SYSTEM CONTROLLER
 # =============================================================================
@@ -65,16 +119,33 @@ class WateringSystem:
         self.fb = firebase
         self.ntp = ntp
         self.eink = eink_display
+        self.frames = StatusFrames(eink_display, CONFIG['STATUS_FRAME_DIR']) if eink_display else None
+        self.dashboard = Dashboard(eink_display) if eink_display else None
+        self.last_sync = 0  # Timestamp (ms) of the last successful upload
         
-        self.settings = None
+        # Cached settings from flash: usable immediately, even without network
+        self.settings_cache = SettingsCache(CONFIG['SETTINGS_CACHE_FILE'])
+        self.settings = self.settings_cache.load()
+        if self.settings:
+            print("✓ Cached settings loaded from flash")
+            self.apply_calibration(reload=False)
         self.last_test_time = 0
+        self.self_test = None  # Running SelfTest
         self.test_interval = 7 * 24 * 60 * 60  # 7 days
         self.last_display_status = None
         self.last_historical_save = 0  # Track when we last saved historical data
+        self.sensor_data = None  # Latest sample (shared between tasks)
+        self.last_error_trim = 0
+        self.metrics = Metrics()  # Step / HTTP spans, heap, retries (deviceMetrics)
+        self.last_metrics_publish = 0
         
         # Connect modules
         self.hw.system = self
         self.fb.system = self
+        self.fb.metrics = self.metrics
+        
+        # Repeated faults -> one entry per fault state (count, firstSeen, lastSeen)
+        self.errors = ErrorReporter(self.fb, CONFIG['ERROR_REREPORT_MIN'], CONFIG['ERROR_REREPORT_MAX'])
     
     def get_timestamp(self):
         """Get current UTC timestamp in milliseconds"""
@@ -85,48 +156,86 @@ class WateringSystem:
         return self.ntp.get_time()
     
     def load_settings(self):
-        """Load settings from Firebase (with error handling)"""
+        """
+        Sync settings from Firebase (with error handling).
+        1. settingsVersion unchanged -> done (tiny response)
+        2. GET with ETag -> full download, unchanged content is not parsed
+        3. New settings -> cached on flash for the next boot
+        """
+        cache = self.settings_cache
         try:
-            print("→ Loading settings from Firebase")
-            settings = self.fb.get_settings()
+            print("→ Syncing settings from Firebase")
+            version = self.fb.get_settings_version()
+            if self.settings and version is not None and version == cache.version:
+                print("✓ Settings unchanged (version)")
+                return True
+            
+            changed, settings, etag = self.fb.get_with_etag("settings", cache.etag if self.settings else None)
+            if changed is None:
+                print("⚠ Failed to load settings, using " + ("cached" if self.settings else "defaults"))
+                return False
+            if not changed:
+                print("✓ Settings unchanged (ETag)")
+                if version != cache.version:
+                    # Persist the new version, or the next boot fetches the settings again
+                    cache.save(self.settings, version, cache.etag)
+                return True
             if settings:
                 self.settings = settings
+                cache.save(settings, version, etag)
+                self.apply_calibration()
                 print(f"✓ Settings loaded: {settings['numberOfPlants']} plants")
                 return True
             else:
-                print("⚠ Failed to load settings, using defaults")
+                print("⚠ No settings in Firebase, using defaults")
                 return False
         except Exception as e:
             print(f"✗ Settings load error: {e}")
             return False
     
+    def apply_calibration(self, reload=True):
+        """Calibration curves from settings override the ones captured on flash"""
+        curves = self.settings.get('moistureCalibration') if self.settings else None
+        if not curves:
+            return
+        if reload:
+            self.hw.calibration.load()  # Channels without settings curve: flash / default
+        self.hw.calibration.apply(curves)
+        print("✓ Moisture calibration from settings applied")
+    
     def read_all_sensors(self):
         """Read all sensor data with comprehensive error handling"""
-        # Read moisture sensors
+        # Read moisture sensors (all channels oversampled in one pass)
         moisture = []
-        for i in range(4):
-            try:
-                value = self.hw.read_moisture(i)
-                moisture.append(round(value, 1))
-            except Exception as e:
+        noise = []
+        for i, value in enumerate(self.hw.sample_moisture()):
+            if isinstance(value, Exception):
                 moisture.append(0.0)
-                self.fb.log_error("sensor", f"Moisture Sensor {i+1}", str(e), "error")
+                noise.append(0.0)
+                self.errors.report("sensor", f"Moisture Sensor {i+1}", str(value), "error")
+            else:
+                moisture.append(round(value, 1))
+                noise.append(round(self.hw.moisture_noise[i], 1))
+                self.errors.resolve("sensor", f"Moisture Sensor {i+1}")
         
         # Read DHT11
         try:
             temp, humidity = self.hw.read_dht11()
             if temp == 0 and humidity == 0:
-                self.fb.log_error("sensor", "DHT11", "Returns zeros", "warning")
+                self.errors.report("sensor", "DHT11", "Returns zeros", "warning")
+            else:
+                self.errors.resolve("sensor", "DHT11")
         except Exception as e:
             temp, humidity = 0.0, 0.0
-            self.fb.log_error("sensor", "DHT11", str(e), "error")
+            self.errors.report("sensor", "DHT11", str(e), "error")
         
         # Read ultrasonic
         try:
-            distance_cm = self.hw.read_ultrasonic()
+            distance_cm = self.hw.read_ultrasonic(temp if temp or humidity else None)
+            self.errors.resolve("sensor", "Ultrasonic")
         except Exception as e:
             distance_cm = 0.0
-            self.fb.log_error("sensor", "Ultrasonic", str(e), "error")
+            self.errors.report("sensor", "Ultrasonic", str(e), "error")
         
         # Calculate water level percentage
         water_level = 0.0
@@ -139,6 +248,7 @@ class WateringSystem:
         return {
             "timestamp": self.get_timestamp(),
             "plantMoisture": moisture,
+            "moistureNoise": noise,
             "temperature": round(temp, 1),
             "humidity": round(humidity, 1),
             "waterLevel": round(water_level, 1),
@@ -149,162 +259,129 @@ class WateringSystem:
         """Check moisture and water if needed"""
         if not self.settings:
             return
+        if self.self_test:
+            print("→ Self-test running - auto-watering skipped")
+            return
         
         for i in range(self.settings['numberOfPlants']):
             profile = self.settings['plantProfiles'][i]
             moisture = sensor_data['plantMoisture'][i]
             
             if moisture < profile['moistureMin']:
+                if self.hw.pump_pending(i):
+                    continue  # Already running or queued
                 print(f"! Plant {i+1} needs water ({moisture}% < {profile['moistureMin']}%)")
                 self.hw.activate_pump(i, CONFIG['WATERING_DURATION'])
     
-    def check_manual_watering(self):
-        """Check for manual watering commands"""
+    def check_commands(self, paths=COMMAND_PATHS):
+        """Poll command paths in one pipelined round trip"""
         try:
-            command = self.fb.get_manual_watering()
-            if command and 'plantId' in command:
-                plant_id = command['plantId'] - 1
-                duration = command.get('duration', CONFIG['WATERING_DURATION'])
-                print(f"! Manual watering: Plant {plant_id + 1}, {duration}s")
-                self.hw.activate_pump(plant_id, duration)
-                self.fb.clear_manual_watering()
+            for path, value in zip(paths, self.fb.get_many(paths)):
+                self.on_stream_event(path, value)
         except Exception as e:
-            print(f"✗ Manual watering check error: {e}")
+            print(f"✗ Manual command check error: {e}")
     
-    def check_manual_test(self):
-        """Check for manual test trigger"""
-        try:
-            trigger = self.fb.get_manual_test_trigger()
-            if trigger and trigger.get('trigger') == True:
-                print("! Manual test triggered from website")
-                self.fb.clear_manual_test_trigger()
-                self.run_system_test()
-        except Exception as e:
-            print(f"✗ Manual test check error: {e}")
+    def handle_manual_watering(self, command):
+        """Execute manual watering command (from poll or stream)"""
+        if command and 'plantId' in command:
+            plant_id = command['plantId'] - 1
+            duration = command.get('duration', CONFIG['WATERING_DURATION'])
+            print(f"! Manual watering: Plant {plant_id + 1}, {duration}s")
+            self.hw.activate_pump(plant_id, duration)
+            self.fb.clear_manual_watering()
     
-    def run_system_test(self):
-        """Run comprehensive system test with new logic"""
-        print("\n" + "="*50)
-        print("SYSTEM SELF-TEST")
-        print("="*50 + "\n")
-        
-        test_result = {
-            "timestamp": self.get_timestamp(),
-            "moistureSensors": [],
-            "pumps": [],
-            "dht11": {"passed": False, "message": ""},
-            "ultrasonic": {"passed": False, "message": ""},
-            "overall": False
-        }
-        
-        # Test each plant: Pump 3s, wait 1min, check moisture increase
-        print("→ Testing moisture sensors and pumps...")
-        for i in range(4):
-            try:
-                print(f"\n  Plant {i+1}:")
-                
-                # Read initial moisture
-                moisture_before = self.hw.read_moisture(i)
-                print(f"    Initial moisture: {moisture_before:.1f}%")
-                
-                # Run pump for 5 seconds
-                print(f"    Running pump for 5 seconds...")
-                self.hw.activate_pump(i, 5)
-                
-                # Wait 1 minute
-                print(f"    Waiting 60 seconds...")
-                time.sleep(60)
-                
-                # Read moisture after
-                moisture_after = self.hw.read_moisture(i)
-                print(f"    Moisture after: {moisture_after:.1f}%")
-                
-                # Check if moisture increased by at least 1%
-                moisture_increase = moisture_after - moisture_before
-                moisture_increased = moisture_increase >= 1.0
-                
-                sensor_result = {
-                    "passed": moisture_increased,
-                    "moistureBefore": round(moisture_before, 1),
-                    "moistureAfter": round(moisture_after, 1),
-                    "message": "OK" if moisture_increased else f"Increase too small ({moisture_increase:.1f}%, min. 1%)"
-                }
-                
-                test_result["moistureSensors"].append(sensor_result)
-                test_result["pumps"].append(sensor_result)
-                
-                print(f"    Result: {'✓ PASSED' if moisture_increased else '✗ FAILED'}")
-                
-            except Exception as e:
-                test_result["moistureSensors"].append({"passed": False, "message": str(e)})
-                test_result["pumps"].append({"passed": False, "message": str(e)})
-                print(f"    ✗ Error: {e}")
-        
-        # Test DHT11
-        print("\n→ Testing DHT11 sensor...")
+    def handle_manual_test(self, trigger):
+        """Execute manual test trigger (from poll or stream)"""
+        if trigger and trigger.get('trigger') == True:
+            print("! Manual test triggered from website")
+            self.fb.clear_manual_test_trigger()
+            self.start_system_test()  # Advanced by the selftest task / run_cycle
+    
+    def handle_manual_calibration(self, command):
+        """
+        Capture a calibration point: {"sensorId": 1-4, "percent": 0-100}.
+        The website places the probe (dry air -> 0, water -> 100) first;
+        the resulting curve is written back with the cleared command.
+        """
+        if not command or 'sensorId' not in command or command.get('done'):
+            return
+        sensor_id = command['sensorId'] - 1
+        percent = command.get('percent', 0)
+        print(f"! Calibration: Sensor {sensor_id + 1} at {percent}%")
+        result = {"sensorId": command['sensorId'], "percent": percent, "done": True,
+                  "timestamp": self.get_timestamp()}
         try:
-            temp, humidity = self.hw.read_dht11()
-            passed = temp > 0 and humidity > 0
-            test_result["dht11"] = {
-                "passed": passed,
-                "temperature": round(temp, 1),
-                "humidity": round(humidity, 1),
-                "message": "OK" if passed else "Returns zeros"
-            }
-            print(f"  {'✓ PASSED' if passed else '✗ FAILED'}: {temp}°C, {humidity}%")
+            result["curve"] = self.hw.calibrate_moisture(sensor_id, percent)
+            result["mv"] = self.hw.moisture_mv[sensor_id]
+            print(f"✓ Sensor {sensor_id + 1} curve: {result['curve']}")
         except Exception as e:
-            test_result["dht11"] = {"passed": False, "message": str(e)}
-            print(f"  ✗ FAILED: {e}")
-        
-        # Test Ultrasonic (must be <= tank_height + 5cm)
-        print("\n→ Testing ultrasonic sensor...")
+            result["error"] = str(e)
+            print(f"✗ Calibration failed: {e}")
+        self.fb.put("manualCalibration", result)
+    
+    def on_stream_event(self, path, value):
+        """Firebase stream callback - commands arrive within ~1s"""
+        if path == "manualWatering":
+            self.handle_manual_watering(value)
+        elif path == "manualTest":
+            self.handle_manual_test(value)
+        elif path == "manualCalibration":
+            self.handle_manual_calibration(value)
+    
+    def start_system_test(self):
+        """Start the self-test; it advances via step_system_test()"""
+        if self.self_test:
+            print("⚠ Self-test already running")
+            return self.self_test
+        self.self_test = SelfTest(self, CONFIG['SELF_TEST_PUMP_SECONDS'], CONFIG['SELF_TEST_SOAK'])
+        self.self_test.step()
+        return self.self_test
+    
+    def step_system_test(self):
+        """Advance a running self-test (called every second) - True when it finished"""
+        test = self.self_test
+        if not test or not test.step():
+            return False
+        self.self_test = None
+        self.last_test_time = self.get_time()
+        return True
+    
+    def sleep(self, seconds):
+        """
+        Idle between cycles: pumps switched on time, a running self-test
+        advanced, a background display refresh finished (panel powered down)
+        """
+        end = time.ticks_add(time.ticks_ms(), int(seconds * 1000))
+        refreshing = self.poll_display()
+        while self.self_test or refreshing:
+            remaining = time.ticks_diff(end, time.ticks_ms())
+            if remaining <= 0:
+                return
+            self.hw.sleep(min(remaining, 1000) / 1000)
+            self.step_system_test()
+            refreshing = self.poll_display()
+        self.hw.sleep(max(0, time.ticks_diff(end, time.ticks_ms())) / 1000)
+    
+    def poll_display(self):
+        """Finish a background refresh (panel to sleep) - True while it runs"""
+        if not self.eink:
+            return False
         try:
-            distance_cm = self.hw.read_ultrasonic()
-            max_distance = 100  # Default
-            
-            if self.settings and 'waterTank' in self.settings:
-                max_distance = self.settings['waterTank']['height'] + 5
-            
-            passed = distance_cm <= max_distance
-            test_result["ultrasonic"] = {
-                "passed": passed,
-                "distance": round(distance_cm, 1),
-                "maxAllowed": max_distance,
-                "message": "OK" if passed else f"Too high ({distance_cm:.1f}cm > {max_distance}cm)"
-            }
-            print(f"  {'✓ PASSED' if passed else '✗ FAILED'}: {distance_cm:.1f}cm (max: {max_distance}cm)")
+            return self.eink.poll()
         except Exception as e:
-            test_result["ultrasonic"] = {"passed": False, "message": str(e)}
-            print(f"  ✗ FAILED: {e}")
-        
-        # Overall result (no database test needed)
-        all_passed = (
-            all(s.get("passed", False) for s in test_result["moistureSensors"]) and
-            test_result["dht11"]["passed"] and
-            test_result["ultrasonic"]["passed"]
-        )
-        test_result["overall"] = all_passed
-        
-        print(f"\n{'='*50}")
-        print(f"OVERALL: {'✓ ALL TESTS PASSED' if all_passed else '✗ SOME TESTS FAILED'}")
-        print(f"{'='*50}\n")
-        
-        # Upload results to Firebase
-        print("→ Uploading test results to Firebase...")
-        if self.fb.update_test_result(test_result):
-            print("✓ Test results uploaded successfully")
-        else:
-            print("✗ Failed to upload test results")
-        
-        self.last_test_time = self.get_time()
-        return test_result
+            print(f"✗ Display refresh error: {e}")
+            return False
+    
+    def historical_data_due(self):
+        """Check if the hourly history point is due"""
+        return self.get_time() - self.last_historical_save >= CONFIG['HISTORICAL_DATA_INTERVAL']
     
-    def save_historical_data(self, sensor_data):
-        """Save historical data point every hour"""
+    def save_historical_data(self, sensor_data, offline=False):
+        """Save historical data point every hour (offline=True: straight to flash queue)"""
         current_time = self.get_time()
         
         # Check if it's time to save (every hour)
-        if current_time - self.last_historical_save >= CONFIG['HISTORICAL_DATA_INTERVAL']:
+        if self.historical_data_due():
             try:
                 print("→ Saving historical data point...")
                 
@@ -317,6 +394,13 @@ class WateringSystem:
                     "waterLevel": sensor_data['waterLevel']
                 }
                 
+                if offline:
+                    key = self.fb.push_id(hist_data['timestamp'])
+                    if self.fb.store_offline({"historicalData/" + key: hist_data}):
+                        print("✓ Historical data stored offline")
+                        self.last_historical_save = current_time
+                    return
+                
                 # Save to Firebase
                 if self.fb.save_historical_data(hist_data):
                     print("✓ Historical data saved")
@@ -326,11 +410,34 @@ class WateringSystem:
             except Exception as e:
                 print(f"✗ Historical data save error: {e}")
     
-    def update_display(self, sensor_data):
-        """Update E-Ink display if status changed"""
+    def maintain_errors(self, force=False):
+        """Send leftover buffered errors and trim systemErrors (hourly)"""
+        current_time = self.get_time()
+        if not force and current_time - self.last_error_trim < CONFIG['ERROR_TRIM_INTERVAL']:
+            return
+        self.fb.flush_errors()
+        if self.fb.trim_errors(CONFIG['MAX_STORED_ERRORS']):
+            self.last_error_trim = current_time
+    
+    def publish_metrics(self, force=False):
+        """Queue the deviceMetrics window (call while batching: no extra request)"""
+        current_time = self.get_time()
+        if not force and current_time - self.last_metrics_publish < CONFIG['METRICS_INTERVAL']:
+            return
+        try:
+            self.fb.put("deviceMetrics", self.metrics.report(self.get_timestamp(),
+                                                             probe=CONFIG['METRICS_HEAP_PROBE']))
+            self.last_metrics_publish = current_time
+        except Exception as e:
+            print(f"✗ Metrics error: {e}")
+    
+    def update_display(self, sensor_data, wait=True):
+        """Update E-Ink display if status changed (wait=False: refresh runs in background)"""
         if not self.eink:
             return
         
+        self.poll_display()
+        
         # Determine status
         status = "ok"
         if sensor_data['waterLevel'] < 20:
@@ -339,49 +446,74 @@ class WateringSystem:
             status = "warning"
         
         # Check if any plant needs water
-        if self.settings:
-            for i in range(self.settings['numberOfPlants']):
+        plants = []
+        num_plants = self.settings['numberOfPlants'] if self.settings else len(sensor_data['plantMoisture'])
+        for i in range(num_plants):
+            needs_water = False
+            if self.settings:
                 profile = self.settings['plantProfiles'][i]
-                if sensor_data['plantMoisture'][i] < profile['moistureMin']:
+                needs_water = sensor_data['plantMoisture'][i] < profile['moistureMin']
+                if needs_water:
                     status = "warning" if status == "ok" else status
+            plants.append((sensor_data['plantMoisture'][i], needs_water))
+        
+        if CONFIG['DISPLAY_DASHBOARD']:
+            # Redrawn every time - refreshes only if the picture changed
+            try:
+                age = (self.get_timestamp() - self.last_sync) // 1000 if self.last_sync else None
+                sync_text = sync_age_text(age)
+                result = self.dashboard.show(status, sensor_data['waterLevel'], plants, sync_text, wait)
+                if result != 'none':
+                    print(f"✓ Dashboard updated ({result} refresh)")
+                self.last_display_status = status
+                self.errors.resolve("eink_display", "Display Update")
+            except Exception as e:
+                print(f"✗ Display update error: {e}")
+                self.errors.report("eink_display", "Display Update", str(e), "warning")
+            return
         
         # Only update if changed
         if status != self.last_display_status:
             try:
                 print(f"→ Updating E-Ink display: {status}")
-                self.draw_status_icon(status)
+                self.draw_status_icon(status, wait)
                 self.last_display_status = status
                 print("✓ Display updated")
+                self.errors.resolve("eink_display", "Display Update")
             except Exception as e:
                 print(f"✗ Display update error: {e}")
-                self.fb.log_error("eink_display", "Display Update", str(e), "warning")
-    
-    def draw_status_icon(self, status):
-        """Draw status icon on E-Ink display"""
-        # Create frame buffers
-        frame_black = bytearray(5000)
-        frame_red = bytearray(5000)
-        
-        # Fill with white
-        for i in range(5000):
-            frame_black[i] = 0xFF
-            frame_red[i] = 0x00
-        
-        # Draw circle (center: 100,100, radius: 40)
-        if status == "ok":
-            self.eink.draw_filled_circle(frame_black, 100, 100, 40, 0)  # Black
-        else:
-            self.eink.draw_filled_circle(frame_red, 100, 100, 40, 1)  # Red
+                self.errors.report("eink_display", "Display Update", str(e), "warning")
+    
+    def draw_status_icon(self, status, wait=True):
+        """Show status icon on E-Ink display (cached frame from flash)"""
+        self.frames.show(status, wait)
+    
+    def get_interval(self):
+        """Measurement interval in seconds (settings override CONFIG)"""
+        if self.settings and 'measurementInterval' in self.settings:
+            return self.settings['measurementInterval']
+        return CONFIG['MEASUREMENT_INTERVAL']
+    
+    def update_system_status(self, sensor_data):
+        """Upload online flag + display status"""
+        status = {
+            "online": True,
+            "lastUpdate": self.get_timestamp(),
+            "displayStatus": "ok"
+        }
+        if sensor_data['waterLevel'] < 20:
+            status['displayStatus'] = "error"
+        elif sensor_data['waterLevel'] < 40:
+            status['displayStatus'] = "warning"
         
-        self.eink.display_frame(frame_black, frame_red)
+        return self.fb.update_system_status(status)
     
-    def run(self):
-        """Main system loop - robust and fault-tolerant"""
+    def startup(self):
+        """WiFi, NTP and initial settings (shared by all run modes)"""
         print("\n" + "="*50)
         print("STARTING WATERING SYSTEM")
         print("="*50 + "\n")
         
-        # Initial setup
         if not self.wifi.connect():
             print("✗ Initial WiFi connection failed - will retry in loop")
         
@@ -389,9 +521,182 @@ class WateringSystem:
             if self.ntp.sync():
                 print("✓ NTP synchronized")
             else:
-                self.fb.log_error("ntp", "NTP Sync", "All servers failed", "warning")
+                self.errors.report("ntp", "NTP Sync", "All servers failed", "warning")
+        
+        self.load_settings()
+    
+    def run_cycle(self):
+        """One measurement cycle (steps 3-10) - used by loop and deep-sleep mode"""
+        metrics = self.metrics
+        start = t = time.ticks_us()
+        
+        # ===== Step 3: Read all sensors =====
+        print("→ Reading sensors...")
+        sensor_data = self.read_all_sensors()
+        print(f"  Moisture: {sensor_data['plantMoisture']}")
+        print(f"  Temp: {sensor_data['temperature']}°C, Humidity: {sensor_data['humidity']}%")
+        print(f"  Water: {sensor_data['waterLevel']}%")
+        t = metrics.since("sensors", t)
+        
+        # ===== Step 4: Upload to Firebase (writes batched until step 7) =====
+        self.fb.drain_offline()  # Data stored during outages first
+        self.fb.begin_batch()
+        self.fb.update_sensor_data(sensor_data)
+        
+        # ===== Step 5: Save historical data (every hour) =====
+        self.save_historical_data(sensor_data)
+        t = metrics.since("upload", t)
+        
+        # ===== Step 6: Update system status =====
+        self.update_system_status(sensor_data)
+        self.publish_metrics()  # Every 15 min, rides along in the batch
+        t = metrics.since("status", t)
+        
+        # ===== Step 7: Check manual commands =====
+        self.check_commands()
+        t = metrics.since("commands", t)
+        
+        print("→ Uploading sensor data...")
+        if self.fb.flush_batch():
+            self.last_sync = self.get_timestamp()
+            print("✓ Sensor data uploaded")
+        else:
+            print("⚠ Sensor data upload failed")
+        t = metrics.since("flush", t)
+        
+        # ===== Step 7b: Self-test (if triggered), outside the batch =====
+        # Only the due step - the test continues while the loop sleeps
+        if self.self_test:
+            self.step_system_test()
+            t = metrics.since("selftest", t)
+        
+        # ===== Step 8: Auto-watering =====
+        self.check_and_water(sensor_data)
+        t = metrics.since("watering", t)
         
+        # ===== Step 9: Update E-Ink display =====
+        self.update_display(sensor_data, wait=False)  # Refresh continues during the next steps
+        t = metrics.since("display", t)
+        
+        # ===== Step 10: Reload settings =====
         self.load_settings()
+        self.maintain_errors()
+        t = metrics.since("settings", t)
+        
+        # Whole cycle longer than the interval: the loop falls behind
+        elapsed = time.ticks_diff(t, start)
+        metrics.add("cycle", elapsed)
+        if elapsed > self.get_interval() * 1000000:
+            metrics.inc("overruns")
+        metrics.sample_heap()
+        
+        return sensor_data
+    
+    # =========================================================================
+    # DEEP-SLEEP MODE - wake, sample, upload, sleep (state in RTC memory)
+    # =========================================================================
+    
+    def get_state(self):
+        """Everything that must survive deep sleep"""
+        return {
+            "lastWatered": self.hw.last_watered,
+            "lastPump4Run": self.hw.last_pump4_run,
+            "lastHistoricalSave": self.last_historical_save,
+            "lastTestTime": self.last_test_time,
+            "lastErrorTrim": self.last_error_trim,
+            "lastMetricsPublish": self.last_metrics_publish,
+            "lastDisplayStatus": self.last_display_status,
+            "ntp": self.ntp.get_state(),
+            "faults": self.errors.get_state(),
+            "selfTest": self.self_test.get_state() if self.self_test else None,
+            "metrics": self.metrics.get_state(),
+        }
+    
+    def restore_state(self, state):
+        """Restore state saved by get_state() - returns True if applied"""
+        if not state:
+            return False
+        self.hw.last_watered = state.get("lastWatered", self.hw.last_watered)
+        self.hw.last_pump4_run = state.get("lastPump4Run", 0)
+        self.last_historical_save = state.get("lastHistoricalSave", 0)
+        self.last_test_time = state.get("lastTestTime", 0)
+        self.last_error_trim = state.get("lastErrorTrim", 0)
+        self.last_metrics_publish = state.get("lastMetricsPublish", 0)
+        self.last_display_status = state.get("lastDisplayStatus")
+        if "ntp" in state:
+            self.ntp.restore_state(state["ntp"])
+        if "faults" in state:
+            self.errors.restore_state(state["faults"])
+        if state.get("metrics"):
+            self.metrics.restore_state(state["metrics"])
+        if state.get("selfTest"):
+            # Test started on an earlier wake - continues in run_cycle
+            self.self_test = SelfTest(self, CONFIG['SELF_TEST_PUMP_SECONDS'], CONFIG['SELF_TEST_SOAK'])
+            self.self_test.restore_state(state["selfTest"])
+        return True
+    
+    def run_deep_sleep(self):
+        """Single wake cycle, then machine.deepsleep() for the measurement interval"""
+        rtc_state = RTCState()
+        if self.restore_state(rtc_state.load()):
+            print("✓ State restored from RTC memory")
+        else:
+            print("→ Cold start (no RTC state)")
+        
+        try:
+            if self.wifi.connect():
+                if not self.ntp.is_synced() or self.ntp.sync_age() > CONFIG['NTP_RESYNC_INTERVAL']:
+                    if self.ntp.sync():
+                        print("✓ NTP synchronized")
+                    else:
+                        self.errors.report("ntp", "NTP Sync", "All servers failed", "warning")
+                if not self.settings:
+                    self.load_settings()  # Nothing cached yet - run_cycle syncs them at its end
+                self.run_cycle()
+            else:
+                print("⚠ WiFi not connected - storing data offline")
+                if self.historical_data_due():
+                    self.save_historical_data(self.read_all_sensors(), offline=True)
+            
+            # Relays must not be left running while the CPU sleeps
+            self.hw.wait_for_pumps()
+            self.step_system_test()  # Test pumps done: soak window starts
+        except Exception as e:
+            print(f"✗ Error in wake cycle: {e}")
+        finally:
+            if self.eink:
+                try:
+                    self.eink.wait_refresh()  # Panel powered down before the CPU sleeps
+                except Exception as e:
+                    print(f"✗ Display refresh error: {e}")
+            interval = self.get_interval()
+            soak_left = self.self_test.soak_left_ms() if self.self_test else 0
+            if soak_left:
+                # Wake again when the soak window is over to finish the test
+                interval = min(interval, soak_left // 1000 + 1)
+            rtc_state.save(self.get_state())
+            self.fb.close()
+            self.wifi.disconnect()
+            self.hw.prepare_deep_sleep()
+            print(f"→ Deep sleep for {interval} seconds...")
+            machine.deepsleep(int(interval * 1000))
+    
+    def run(self):
+        """Start the system (deep-sleep, asyncio task runtime or classic loop)"""
+        if CONFIG['DEEP_SLEEP']:
+            self.run_deep_sleep()
+        elif CONFIG['USE_ASYNCIO'] and asyncio:
+            try:
+                asyncio.run(self.run_async())
+            except KeyboardInterrupt:
+                print("\n✗ System stopped by user")
+                self.hw.stop_all_pumps()
+        else:
+            self.run_sequential()
+    
+    def run_sequential(self):
+        """Main system loop - robust and fault-tolerant"""
+        self.startup()
         
         # Main loop
         loop_count = 0
@@ -405,68 +710,171 @@ class WateringSystem:
                 # ===== Step 1: Ensure WiFi Connection =====
                 if not self.wifi.ensure_connection():
                     print("⚠ WiFi not connected - retrying in 30s...")
-                    time.sleep(30)
+                    if self.historical_data_due():
+                        self.save_historical_data(self.read_all_sensors(), offline=True)
+                    self.hw.sleep(30)
                     continue  # Skip this loop iteration
                 
                 # ===== Step 2: Get measurement interval =====
-                interval = CONFIG['MEASUREMENT_INTERVAL']
-                if self.settings and 'measurementInterval' in self.settings:
-                    interval = self.settings['measurementInterval']
-                
-                # ===== Step 3: Read all sensors =====
-                print("→ Reading sensors...")
-                sensor_data = self.read_all_sensors()
-                print(f"  Moisture: {sensor_data['plantMoisture']}")
-                print(f"  Temp: {sensor_data['temperature']}°C, Humidity: {sensor_data['humidity']}%")
-                print(f"  Water: {sensor_data['waterLevel']}%")
-                
-                # ===== Step 4: Upload to Firebase =====
-                print("→ Uploading sensor data...")
-                if self.fb.update_sensor_data(sensor_data):
-                    print("✓ Sensor data uploaded")
-                else:
-                    print("⚠ Sensor data upload failed")
-                
-                # ===== Step 5: Save historical data (every hour) =====
-                self.save_historical_data(sensor_data)
+                interval = self.get_interval()
                 
-                # ===== Step 6: Update system status =====
-                status = {
-                    "online": True,
-                    "lastUpdate": self.get_timestamp(),
-                    "displayStatus": "ok"
-                }
-                if sensor_data['waterLevel'] < 20:
-                    status['displayStatus'] = "error"
-                elif sensor_data['waterLevel'] < 40:
-                    status['displayStatus'] = "warning"
-                
-                self.fb.update_system_status(status)
-                
-                # ===== Step 7: Check manual commands =====
-                self.check_manual_watering()
-                self.check_manual_test()
-                
-                # ===== Step 8: Auto-watering =====
-                self.check_and_water(sensor_data)
-                
-                # ===== Step 9: Update E-Ink display =====
-                self.update_display(sensor_data)
-                
-                # ===== Step 10: Reload settings =====
-                self.load_settings()
+                # ===== Step 3-10: Sensors, upload, commands, watering, display, settings =====
+                self.run_cycle()
                 
-                # ===== Step 11: Sleep =====
+                # ===== Step 11: Sleep (pumps keep being switched off on time) =====
                 print(f"→ Sleeping for {interval} seconds...")
-                time.sleep(interval)
+                self.sleep(interval)
                 
             except KeyboardInterrupt:
                 print("\n✗ System stopped by user")
+                self.hw.stop_all_pumps()
                 break
             except Exception as e:
+                self.fb.cancel_batch()
                 print(f"\n✗ Error in main loop: {e}")
                 print("  Continuing in 60 seconds...")
-                time.sleep(60)
+                self.hw.sleep(60)
+    
+    # =========================================================================
+    # ASYNCIO RUNTIME - every step is its own cooperating task
+    # =========================================================================
+    
+    async def run_async(self):
+        """Run sensors, upload, commands, display and settings as separate tasks"""
+        self.startup()
+        self.sensor_event = asyncio.Event()
+        
+        # HTTP is blocking and stalls every task while it runs: short socket
+        # timeout and no in-line retries with backoff sleeps. A failed request
+        # is retried by the task's next period (uploads via the offline queue).
+        self.fb.max_retries = 1
+        self.fb.set_timeout(CONFIG['ASYNC_HTTP_TIMEOUT'])
+        
+        tasks = [
+            asyncio.create_task(self._periodic("pumps", self._pump_step, lambda: CONFIG['PUMP_CHECK_INTERVAL'], needs_wifi=False)),
+            asyncio.create_task(self._wifi_task()),
+            asyncio.create_task(self._periodic("sensors", self._sensor_step, self.get_interval, needs_wifi=False)),
+            asyncio.create_task(self._upload_task()),
+            asyncio.create_task(self._periodic("commands", self._command_step, lambda: CONFIG['COMMAND_POLL_INTERVAL'])),
+            asyncio.create_task(self._display_task()),
+            asyncio.create_task(self._periodic("settings", self.load_settings, lambda: CONFIG['SETTINGS_INTERVAL'])),
+            asyncio.create_task(self._periodic("errors", self.maintain_errors, lambda: CONFIG['ERROR_TRIM_INTERVAL'])),
+            asyncio.create_task(self._periodic("selftest", self.step_system_test, lambda: 1, needs_wifi=False)),
+        ]
+        if CONFIG['USE_STREAMING']:
+            # Push commands instead of polling (polling stays as fallback)
+            for path in COMMAND_PATHS:
+                tasks.append(asyncio.create_task(self.fb.stream(path, self.on_stream_event)))
+        print(f"✓ {len(tasks)} tasks started")
+        
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            self.hw.stop_all_pumps()
+    
+    async def _periodic(self, name, step, get_period, needs_wifi=True):
+        """Call step() every get_period() seconds; errors never kill the task"""
+        while True:
+            start = time.ticks_ms()
+            start_us = time.ticks_us()
+            try:
+                if not needs_wifi or self.wifi.is_connected():
+                    step()
+            except Exception as e:
+                print(f"✗ Task '{name}' error: {e}")
+            self.metrics.since(name, start_us)
+            
+            period_ms = int(get_period() * 1000)
+            elapsed = time.ticks_diff(time.ticks_ms(), start)
+            if elapsed > period_ms:
+                self.metrics.inc("overruns")
+            await asyncio.sleep(max(0, period_ms - elapsed) / 1000)
+    
+    async def _upload_task(self):
+        """Upload each new sample (sensorData, history, status)"""
+        while True:
+            await self.sensor_event.wait()
+            self.sensor_event.clear()
+            
+            if not self.wifi.is_connected():
+                print("⚠ WiFi not connected - upload skipped")
+                self.save_historical_data(self.sensor_data, offline=True)
+                continue
+            
+            start = time.ticks_us()
+            try:
+                sensor_data = self.sensor_data
+                self.fb.drain_offline()  # Data stored during outages first
+                print("→ Uploading sensor data...")
+                
+                # sensorData + history + status (+ metrics) as one PATCH
+                self.fb.begin_batch()
+                self.fb.update_sensor_data(sensor_data)
+                self.save_historical_data(sensor_data)
+                self.update_system_status(sensor_data)
+                self.publish_metrics()
+                
+                if self.fb.flush_batch():
+                    self.last_sync = self.get_timestamp()
+                    print("✓ Sensor data uploaded")
+                else:
+                    print("⚠ Sensor data upload failed")
+            except Exception as e:
+                self.fb.cancel_batch()
+                print(f"✗ Task 'upload' error: {e}")
+            self.metrics.since("upload", start)
+            self.metrics.sample_heap()
+    
+    def _pump_step(self):
+        self.hw.update_pumps()
+    
+    async def _wifi_task(self):
+        """Reconnect without blocking: the link is polled with await"""
+        while True:
+            start_us = time.ticks_us()
+            try:
+                if not await self.wifi.ensure_connection_async():
+                    print("⚠ WiFi not connected - network tasks paused")
+            except Exception as e:
+                print(f"✗ Task 'wifi' error: {e}")
+            self.metrics.since("wifi", start_us)
+            await asyncio.sleep(CONFIG['WIFI_CHECK_INTERVAL'])
+    
+    def _sensor_step(self):
+        """Sample sensors, decide on watering, hand the sample to the upload task"""
+        print("→ Reading sensors...")
+        sensor_data = self.read_all_sensors()
+        print(f"  Moisture: {sensor_data['plantMoisture']}")
+        print(f"  Temp: {sensor_data['temperature']}°C, Humidity: {sensor_data['humidity']}%")
+        print(f"  Water: {sensor_data['waterLevel']}%")
+        
+        self.sensor_data = sensor_data
+        self.check_and_water(sensor_data)
+        self.sensor_event.set()
+    
+    def _command_step(self):
+        # Streams deliver commands directly - only poll paths without live stream
+        paths = [p for p in COMMAND_PATHS if not self.fb.is_streaming(p)]
+        if paths:
+            self.check_commands(paths)
+    
+    async def _display_task(self):
+        """Start refreshes without waiting, await BUSY while other tasks run"""
+        while True:
+            start = time.ticks_ms()
+            try:
+                if self.sensor_data:
+                    start_us = time.ticks_us()
+                    self.update_display(self.sensor_data, wait=False)
+                    self.metrics.since("display", start_us)
+                if self.eink:
+                    await self.eink.wait_refresh_async()
+            except Exception as e:
+                print(f"✗ Task 'display' error: {e}")
+            
+            period_ms = int(CONFIG['DISPLAY_INTERVAL'] * 1000)
+            elapsed = time.ticks_diff(time.ticks_ms(), start)
+            await asyncio.sleep(max(0, period_ms - elapsed) / 1000)
 
 # =============================================================================
 # ENTRY POINT
@@ -490,7 +898,8 @@ def main():
     
     # Initialize Firebase Client
     print("→ Initializing Firebase Client...")
-    firebase = FirebaseClient(FIREBASE_URL, max_retries=3)
+    firebase = FirebaseClient(FIREBASE_URL, max_retries=3, timeout=10)
+    firebase.offline = OfflineQueue(CONFIG['OFFLINE_QUEUE_FILE'], CONFIG['OFFLINE_QUEUE_MAX_BYTES'])
     print("✓ Firebase Client ready\n")
     
     # Initialize NTP Sync
@@ -514,13 +923,9 @@ def main():
             eink = EPD(spi, cs_pin, dc_pin, rst_pin, busy_pin)
             eink.init()
             
-            # Clear display
-            frame_black = bytearray(5000)
-            frame_red = bytearray(5000)
-            for i in range(5000):
-                frame_black[i] = 0xFF
-                frame_red[i] = 0x00
-            eink.display_frame(frame_black, frame_red)
+            # Clear display (not after deep-sleep wake: e-paper keeps its image)
+            if machine.reset_cause() != machine.DEEPSLEEP_RESET:
+                StatusFrames(eink, CONFIG['STATUS_FRAME_DIR']).show("blank")
             
             print("✓ E-Ink Display ready\n")
         except Exception as e:
@@ -0,0 +1,165 @@
+# Laufzeit-Metriken: Zeitspannen, Heap und Retries in festen Zählern (deviceMetrics)
+#
+# ticks_us spans around the steps of the main loop and every Firebase
+# round trip are folded into preallocated counters per span name (count,
+# total, max); HTTP latency also goes into a small histogram. Nothing
+# grows with the number of samples, so the instrumentation costs the same
+# few hundred bytes forever. report() turns the window into one JSON
+# object for deviceMetrics and starts the next window.
+import gc
+import time
+from array import array
+
+# Span names (main loop steps, asyncio tasks, HTTP round trips)
+SPANS = ("cycle", "sensors", "upload", "status", "commands", "flush", "selftest", "watering",
+         "display", "settings", "wifi", "pumps", "errors", "http")
+COUNTERS = ("retries", "failures", "overruns")
+HTTP_BUCKETS_MS = (50, 100, 200, 500, 1000, 2000, 5000)  # Upper bounds, last bucket: slower
+
+
+def largest_free_block(limit, resolution=256):
+    """
+    Largest bytearray that can be allocated right now (binary search).
+    Allocates across the heap it measures - only run on request.
+    """
+    low, high = 0, limit
+    while high - low > resolution:
+        size = (low + high) // 2
+        try:
+            block = bytearray(size)
+            del block
+            low = size
+        except MemoryError:
+            high = size
+    return low
+
+
+def idf_largest_free():
+    """Largest free block of the ESP-IDF data heap (no allocation) - None off the ESP32 port"""
+    try:
+        import esp32
+        return max(region[2] for region in esp32.idf_heap_info(esp32.HEAP_DATA))
+    except Exception:
+        return None
+
+
+class Metrics:
+    def __init__(self):
+        n = len(SPANS)
+        self.index = {name: i for i, name in enumerate(SPANS)}
+        self.count = array('L', [0] * n)
+        self.total_us = array('L', [0] * n)
+        self.max_us = array('L', [0] * n)
+        self.counters = array('L', [0] * len(COUNTERS))
+        self.http_hist = array('L', [0] * (len(HTTP_BUCKETS_MS) + 1))
+        self.min_free = -1  # Lowest gc.mem_free() seen in this window
+        self.window_start = time.ticks_ms()
+        self.uptime_ms = 0  # Closed windows (ticks_ms wraps after ~12 days)
+
+    def add(self, name, us):
+        """Record one span of us microseconds"""
+        i = self.index[name]
+        us = max(0, us)
+        self.count[i] += 1
+        self.total_us[i] = min(0xFFFFFFFF, self.total_us[i] + us)
+        if us > self.max_us[i]:
+            self.max_us[i] = us
+        if name == "http":
+            ms = us // 1000
+            b = 0
+            while b < len(HTTP_BUCKETS_MS) and ms >= HTTP_BUCKETS_MS[b]:
+                b += 1
+            self.http_hist[b] += 1
+
+    def since(self, name, start_us):
+        """Record the span from start_us (ticks_us) to now - returns now, to chain steps"""
+        now = time.ticks_us()
+        self.add(name, time.ticks_diff(now, start_us))
+        return now
+
+    def inc(self, name, n=1):
+        self.counters[COUNTERS.index(name)] += n
+
+    def sample_heap(self):
+        """Track the lowest free heap (cheap: call once per cycle)"""
+        free = gc.mem_free()
+        if self.min_free < 0 or free < self.min_free:
+            self.min_free = free
+
+    def heap(self, probe=False):
+        """
+        Heap snapshot after a collection. The IDF heap's largest block comes
+        from esp32.idf_heap_info(); probe=True also measures the largest
+        allocatable block of the Python heap (and its fragmentation).
+        """
+        gc.collect()
+        free = gc.mem_free()
+        result = {
+            "free": free,
+            "alloc": gc.mem_alloc(),
+            "minFree": self.min_free if self.min_free >= 0 else free,
+        }
+        idf_largest = idf_largest_free()
+        if idf_largest is not None:
+            result["idfLargestFree"] = idf_largest
+        if probe:
+            largest = largest_free_block(free)
+            result["largestFree"] = largest
+            result["fragmentation"] = round(100 * (1 - largest / free), 1) if free else 0
+        return result
+
+    def report(self, timestamp, reset=True, probe=False):
+        """deviceMetrics object for this window (reset=True: start the next one)"""
+        window_ms = time.ticks_diff(time.ticks_ms(), self.window_start)
+        spans = {}
+        for i, name in enumerate(SPANS):
+            if self.count[i]:
+                spans[name] = {
+                    "n": self.count[i],
+                    "avgMs": round(self.total_us[i] / self.count[i] / 1000, 1),
+                    "maxMs": round(self.max_us[i] / 1000, 1),
+                }
+        result = {
+            "timestamp": timestamp,
+            "windowS": window_ms // 1000,
+            "uptimeS": (self.uptime_ms + window_ms) // 1000,
+            "spans": spans,
+            "httpHistogram": list(self.http_hist),
+            "heap": self.heap(probe),
+        }
+        for i, name in enumerate(COUNTERS):
+            result[name] = self.counters[i]
+        if reset:
+            self.reset(window_ms)
+        return result
+
+    def get_state(self):
+        """Open window as compact lists (for RTC memory across deep sleep)"""
+        spans = [[i, self.count[i], self.total_us[i], self.max_us[i]]
+                 for i in range(len(SPANS)) if self.count[i]]
+        return [spans, list(self.counters), list(self.http_hist), self.min_free,
+                self.uptime_ms, time.ticks_diff(time.ticks_ms(), self.window_start)]
+
+    def restore_state(self, state):
+        """Continue the window saved by get_state() (awake time only)"""
+        spans, counters, http_hist, min_free, uptime_ms, window_ms = state
+        for i, n, total, longest in spans:
+            self.count[i] = n
+            self.total_us[i] = total
+            self.max_us[i] = longest
+        for counts, saved in ((self.counters, counters), (self.http_hist, http_hist)):
+            for i in range(min(len(counts), len(saved))):
+                counts[i] = saved[i]
+        self.min_free = min_free
+        self.uptime_ms = uptime_ms
+        self.window_start = time.ticks_add(time.ticks_ms(), -window_ms)
+
+    def reset(self, window_ms=None):
+        if window_ms is None:
+            window_ms = time.ticks_diff(time.ticks_ms(), self.window_start)
+        self.uptime_ms += window_ms
+        self.window_start = time.ticks_ms()
+        for counts in (self.count, self.total_us, self.max_us, self.counters, self.http_hist):
+            for i in range(len(counts)):
+                counts[i] = 0
+        self.min_free = -1
@@ -121,6 +121,22 @@ class NTPSync:
         print("="*50 + "\n")
         return False
     
+    def is_synced(self):
+        """Check if a sync (or restored sync) is available"""
+        return self.ntp_sync_timestamp != 0
+    
+    def sync_age(self):
+        """Seconds since last successful sync"""
+        return time.time() - self.ntp_sync_localtime
+    
+    def get_state(self):
+        """Sync reference for RTC memory (RTC keeps counting in deep sleep)"""
+        return [self.ntp_sync_timestamp, self.ntp_sync_localtime]
+    
+    def restore_state(self, state):
+        """Restore sync reference saved by get_state()"""
+        self.ntp_sync_timestamp, self.ntp_sync_localtime = state
+    
     def get_timestamp(self):
         """Get current UTC timestamp in milliseconds"""
         unix_offset = 946684800
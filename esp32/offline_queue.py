@@ -0,0 +1,216 @@
+# Offline Store-and-Forward Queue auf dem Flash (append-only, crash-sicher)
+#
+# Record: <B magic> <B kind> <H payload length> <payload> <I crc32(kind + payload)>
+# Payload: 20-byte key (Firebase push ID) + body
+#   KIND_HISTORY: struct HISTORY_FORMAT (22 bytes instead of ~120 bytes JSON)
+#   KIND_ERROR / KIND_TEST: JSON
+# A record torn by a power loss fails the length/CRC check and is dropped
+# at the next boot. The read position lives in a separate file that is
+# replaced atomically, and keys are stored in the record, so re-sending
+# after a crash overwrites instead of duplicating.
+import os
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+try:
+    import ubinascii as binascii
+except ImportError:
+    import binascii
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+MAGIC = 0xA5
+KIND_HISTORY = 1
+KIND_ERROR = 2
+KIND_TEST = 3
+
+HEADER_FORMAT = "<BBH"
+HEADER_SIZE = 4
+CRC_SIZE = 4
+KEY_SIZE = 20
+# timestamp ms, 4x moisture (x10), temperature (x10), humidity (x10), water level (x10)
+HISTORY_FORMAT = "<QHHHHhHH"
+
+
+def encode_history(data):
+    moisture = [int(round(m * 10)) for m in data["plantMoisture"]]
+    return struct.pack(HISTORY_FORMAT, int(data["timestamp"]),
+                       moisture[0], moisture[1], moisture[2], moisture[3],
+                       int(round(data["temperature"] * 10)),
+                       int(round(data["humidity"] * 10)),
+                       int(round(data["waterLevel"] * 10)))
+
+
+def decode_history(body):
+    values = struct.unpack(HISTORY_FORMAT, body)
+    return {
+        "timestamp": values[0],
+        "plantMoisture": [v / 10 for v in values[1:5]],
+        "temperature": values[5] / 10,
+        "humidity": values[6] / 10,
+        "waterLevel": values[7] / 10,
+    }
+
+
+class OfflineQueue:
+    def __init__(self, path="/offline.q", max_bytes=65536):
+        """Append-only queue file for writes that could not be sent"""
+        self.path = path
+        self.pos_path = path + ".pos"
+        self.max_bytes = max_bytes
+        self.dropped = 0  # Records rejected because the queue was full
+        self.recover()
+
+    def _size(self):
+        try:
+            return os.stat(self.path)[6]
+        except OSError:
+            return 0
+
+    def _read_pos(self):
+        try:
+            with open(self.pos_path) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 0
+
+    def _write_pos(self, pos):
+        tmp = self.pos_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(pos))
+        os.rename(tmp, self.pos_path)  # Atomic replace
+
+    def _remove(self):
+        for path in (self.path, self.pos_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __len__(self):
+        """Number of unsent records"""
+        return len(self._scan(self._read_pos(), None)[0])
+
+    def is_empty(self):
+        return self._read_pos() >= self._size()
+
+    def append(self, kind, key, data):
+        """Store one record - returns False if the queue is full"""
+        if kind == KIND_HISTORY:
+            body = encode_history(data)
+        else:
+            body = json.dumps(data).encode()
+        payload = key.encode()[:KEY_SIZE]
+        payload = payload + b"-" * (KEY_SIZE - len(payload)) + body
+
+        if self._size() + HEADER_SIZE + len(payload) + CRC_SIZE > self.max_bytes:
+            self.dropped += 1
+            print(f"⚠ Offline queue full - record dropped ({self.dropped} total)")
+            return False
+
+        crc = binascii.crc32(bytes([kind]) + payload) & 0xFFFFFFFF
+        record = struct.pack(HEADER_FORMAT, MAGIC, kind, len(payload)) + payload + struct.pack("<I", crc)
+        with open(self.path, "ab") as f:
+            f.write(record)
+        return True
+
+    def _scan(self, offset, max_records):
+        """Parse records from offset -> ([(kind, key, body)], end offset, clean)"""
+        records = []
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return records, offset, True
+        try:
+            f.seek(offset)
+            while max_records is None or len(records) < max_records:
+                header = f.read(HEADER_SIZE)
+                if not header:
+                    return records, offset, True
+                if len(header) < HEADER_SIZE:
+                    return records, offset, False
+                magic, kind, length = struct.unpack(HEADER_FORMAT, header)
+                payload = f.read(length)
+                crc_bytes = f.read(CRC_SIZE)
+                if (magic != MAGIC or len(payload) < length or len(crc_bytes) < CRC_SIZE or
+                        struct.unpack("<I", crc_bytes)[0] != binascii.crc32(bytes([kind]) + payload) & 0xFFFFFFFF):
+                    return records, offset, False
+                records.append((kind, payload[:KEY_SIZE].decode(), payload[KEY_SIZE:]))
+                offset += HEADER_SIZE + length + CRC_SIZE
+            return records, offset, True
+        finally:
+            f.close()
+
+    def recover(self):
+        """Boot check: drop a torn tail record (power loss during append)"""
+        pos = self._read_pos()
+        records, end, clean = self._scan(pos, None)
+        if clean:
+            if pos >= self._size():
+                self._remove()
+            return
+        print(f"⚠ Offline queue: corrupt tail dropped ({len(records)} records kept)")
+        # Rewrite the valid records (no truncate() on MicroPython)
+        tmp = self.path + ".tmp"
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            src.seek(pos)
+            remaining = end - pos
+            while remaining > 0:
+                chunk = src.read(min(512, remaining))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                remaining -= len(chunk)
+        os.rename(tmp, self.path)
+        try:
+            os.remove(self.pos_path)
+        except OSError:
+            pass
+
+    def _resync(self, offset):
+        """Offset of the next valid record at or after offset (file size: none left)"""
+        size = self._size()
+        with open(self.path, "rb") as f:
+            while offset < size:
+                f.seek(offset)
+                window = f.read(512)
+                if not window:
+                    break
+                i = window.find(bytes([MAGIC]))
+                if i < 0:
+                    offset += len(window)
+                    continue
+                offset += i
+                if self._scan(offset, 1)[0]:
+                    return offset
+                offset += 1
+        return size
+
+    def read_batch(self, max_records=50):
+        """Next records as Firebase multi-path update -> (updates, end offset)"""
+        pos = self._read_pos()
+        records, end, clean = self._scan(pos, max_records)
+        if not records and not clean:
+            # Corrupt record at the read position: skip to the next valid one,
+            # otherwise it would block the queue until the next boot
+            end = self._resync(pos + 1)
+            print(f"⚠ Offline queue: corrupt record skipped ({end - pos} bytes)")
+        updates = {}
+        for kind, key, body in records:
+            if kind == KIND_HISTORY:
+                updates["historicalData/" + key] = decode_history(body)
+            elif kind == KIND_ERROR:
+                updates["systemErrors/" + key] = json.loads(body)
+            elif kind == KIND_TEST:
+                updates["lastTest"] = json.loads(body)  # Latest result wins
+        return updates, end
+
+    def commit(self, end):
+        """Mark records up to end as sent (file removed once fully drained)"""
+        if end >= self._size():
+            self._remove()
+        else:
+            self._write_pos(end)
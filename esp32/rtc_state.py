@@ -0,0 +1,83 @@
+# RTC-Speicher: Zustand über Deep-Sleep hinweg erhalten
+#
+# Layout: <4s magic> <H payload length> <I crc32(payload)> <payload = JSON>
+# RTC user memory is 2 KB on the ESP32 port; optional keys are dropped
+# until the state fits.
+try:
+    import ujson as json
+except ImportError:
+    import json
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+try:
+    import ubinascii as binascii
+except ImportError:
+    import binascii
+
+MAGIC = b"BWS1"
+HEADER_FORMAT = "<4sHI"
+HEADER_SIZE = 10
+RTC_MEMORY_SIZE = 2048
+
+# Dropped (in this order) if the state is too large
+OPTIONAL_KEYS = ("metrics", "faults", "selfTest")
+
+
+def encode_state(state, max_size=RTC_MEMORY_SIZE):
+    """State dict -> bytes (raises ValueError if it cannot fit)"""
+    state = dict(state)
+    payload = json.dumps(state).encode()
+    for key in OPTIONAL_KEYS:
+        if HEADER_SIZE + len(payload) <= max_size:
+            break
+        state.pop(key, None)
+        payload = json.dumps(state).encode()
+    if HEADER_SIZE + len(payload) > max_size:
+        raise ValueError(f"state too large ({len(payload)} bytes)")
+    crc = binascii.crc32(payload) & 0xFFFFFFFF
+    return struct.pack(HEADER_FORMAT, MAGIC, len(payload), crc) + payload
+
+
+def decode_state(data):
+    """Bytes -> state dict, None if empty/corrupt (e.g. after power-on)"""
+    if not data or len(data) < HEADER_SIZE:
+        return None
+    magic, length, crc = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+    payload = data[HEADER_SIZE:HEADER_SIZE + length]
+    if magic != MAGIC or len(payload) != length:
+        return None
+    if binascii.crc32(payload) & 0xFFFFFFFF != crc:
+        return None
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class RTCState:
+    def __init__(self, rtc=None):
+        """Persist a small state dict in RTC memory (survives deep sleep, not power loss)"""
+        if rtc is None:
+            from machine import RTC
+            rtc = RTC()
+        self.rtc = rtc
+
+    def save(self, state):
+        try:
+            self.rtc.memory(encode_state(state))
+            return True
+        except Exception as e:
+            print(f"✗ RTC state save failed: {e}")
+            return False
+
+    def load(self):
+        try:
+            return decode_state(self.rtc.memory())
+        except Exception as e:
+            print(f"✗ RTC state load failed: {e}")
+            return None
+
+    def clear(self):
+        self.rtc.memory(b"")
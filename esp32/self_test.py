@@ -0,0 +1,215 @@
+# Selbsttest als Zustandsautomat (nicht-blockierend, ~70 s statt 4 x 60 s)
+#
+# All pumps are queued at once (the pump scheduler runs them one after
+# another), then all moisture channels share one soak window. DHT11 and
+# ultrasonic are tested while the water soaks in. Each phase writes the
+# partial result to lastTest, so the website can follow the test.
+import time
+
+
+class SelfTest:
+    def __init__(self, system, pump_seconds=5, soak_seconds=50, sample_seconds=10):
+        self.system = system
+        self.hw = system.hw
+        self.pump_seconds = pump_seconds
+        self.soak_ms = int(soak_seconds * 1000)
+        self.sample_ms = int(sample_seconds * 1000)
+        self.phase = "start"  # start -> pumping -> soak -> done
+        self.next_ms = time.ticks_ms()
+        self.soak_start = 0
+        self.channels = range(len(self.hw.relays))
+        self.before = {}  # channel -> moisture % before pumping
+        self.after = {}  # channel -> highest moisture % during the soak window
+        self.failed = {}  # channel -> exception of the initial reading
+        self.result = {
+            "timestamp": system.get_timestamp(),
+            "running": True,
+            "phase": self.phase,
+            "moistureSensors": [],
+            "pumps": [],
+            "dht11": {"passed": False, "message": "Pending"},
+            "ultrasonic": {"passed": False, "message": "Pending"},
+            "overall": False
+        }
+
+    @property
+    def done(self):
+        return self.phase == "done"
+
+    def step(self):
+        """Advance the test if its next step is due - returns True when finished"""
+        if self.done:
+            return True
+        if time.ticks_diff(time.ticks_ms(), self.next_ms) < 0:
+            return False
+        if self.phase == "start":
+            self._start()
+        elif self.phase == "pumping":
+            if any(self.hw.pump_pending(i) for i in self.before):
+                return False
+            self._begin_soak()
+        elif self.phase == "soak":
+            self._sample()
+            elapsed = time.ticks_diff(time.ticks_ms(), self.soak_start)
+            if elapsed >= self.soak_ms:
+                self._finish()
+            else:
+                self.next_ms = time.ticks_add(time.ticks_ms(), min(self.sample_ms, self.soak_ms - elapsed))
+        return self.done
+
+    def soak_left_ms(self):
+        """Time until the soak window is over (0 outside the soak phase)"""
+        if self.phase != "soak":
+            return 0
+        return max(0, self.soak_ms - time.ticks_diff(time.ticks_ms(), self.soak_start))
+
+    def get_state(self):
+        """Progress for RTC memory: deep-sleep mode finishes the test on a later wake"""
+        return {
+            "phase": self.phase,
+            "before": [[i, v] for i, v in self.before.items()],
+            "after": [[i, v] for i, v in self.after.items()],
+            "failed": [[i, str(e)] for i, e in self.failed.items()],
+            "soakElapsed": self.soak_ms - self.soak_left_ms() if self.phase == "soak" else 0,
+            "savedAt": self.system.get_time(),
+            "result": self.result,
+        }
+
+    def restore_state(self, state):
+        """Continue a test saved by get_state() - the time asleep counts as soak time"""
+        self.phase = state["phase"]
+        self.before = {i: v for i, v in state["before"]}
+        self.after = {i: v for i, v in state["after"]}
+        self.failed = {i: e for i, e in state["failed"]}
+        self.result = state["result"]
+        slept_ms = max(0, self.system.get_time() - state["savedAt"]) * 1000
+        now = time.ticks_ms()
+        self.soak_start = time.ticks_add(now, -(state["soakElapsed"] + slept_ms))
+        self.next_ms = now  # Next step due right away
+
+    def _report(self, phase):
+        """Partial result to lastTest (final result: update_test_result)"""
+        self.phase = phase
+        self.result["phase"] = phase
+        try:
+            self.system.fb.put("lastTest", self.result)
+        except Exception as e:
+            print(f"  ⚠ Test progress not uploaded: {e}")
+
+    def _start(self):
+        print("\n" + "="*50)
+        print("SYSTEM SELF-TEST")
+        print("="*50 + "\n")
+        print("→ Reading initial moisture (all sensors)...")
+        for i, value in zip(self.channels, self.hw.sample_moisture(self.channels)):
+            if isinstance(value, Exception):
+                print(f"  ✗ Plant {i+1}: {value}")
+                self.failed[i] = value
+            else:
+                print(f"  Plant {i+1}: {value:.1f}%")
+                self.before[i] = value
+
+        print(f"→ Queueing pumps ({self.pump_seconds}s each)...")
+        for i in self.before:
+            self.hw.activate_pump(i, self.pump_seconds)
+        self._report("pumping")
+
+    def _begin_soak(self):
+        self.soak_start = time.ticks_ms()
+        self.next_ms = time.ticks_add(self.soak_start, self.sample_ms)
+        print(f"→ Pumps done, soaking for {self.soak_ms // 1000} seconds")
+        self._test_dht()
+        self._test_ultrasonic()
+        self._report("soak")
+
+    def _sample(self):
+        """Sample all sensors at once, keep the highest reading per plant"""
+        channels = tuple(self.before)
+        for i, value in zip(channels, self.hw.sample_moisture(channels)):
+            if isinstance(value, Exception):
+                continue  # A single failed sample does not fail the test
+            if i not in self.after or value > self.after[i]:
+                self.after[i] = value
+
+    def _test_dht(self):
+        print("\n→ Testing DHT11 sensor...")
+        try:
+            temp, humidity = self.hw.read_dht11()
+            passed = temp > 0 and humidity > 0
+            self.result["dht11"] = {
+                "passed": passed,
+                "temperature": round(temp, 1),
+                "humidity": round(humidity, 1),
+                "message": "OK" if passed else "Returns zeros"
+            }
+            print(f"  {'✓ PASSED' if passed else '✗ FAILED'}: {temp}°C, {humidity}%")
+        except Exception as e:
+            self.result["dht11"] = {"passed": False, "message": str(e)}
+            print(f"  ✗ FAILED: {e}")
+
+    def _test_ultrasonic(self):
+        # Must be <= tank_height + 5cm
+        print("\n→ Testing ultrasonic sensor...")
+        try:
+            dht = self.result["dht11"]
+            distance_cm = self.hw.read_ultrasonic(dht["temperature"] if dht["passed"] else None)
+            max_distance = 100  # Default
+
+            settings = self.system.settings
+            if settings and 'waterTank' in settings:
+                max_distance = settings['waterTank']['height'] + 5
+
+            passed = distance_cm <= max_distance
+            self.result["ultrasonic"] = {
+                "passed": passed,
+                "distance": round(distance_cm, 1),
+                "maxAllowed": max_distance,
+                "message": "OK" if passed else f"Too high ({distance_cm:.1f}cm > {max_distance}cm)"
+            }
+            print(f"  {'✓ PASSED' if passed else '✗ FAILED'}: {distance_cm:.1f}cm (max: {max_distance}cm)")
+        except Exception as e:
+            self.result["ultrasonic"] = {"passed": False, "message": str(e)}
+            print(f"  ✗ FAILED: {e}")
+
+    def _finish(self):
+        result = self.result
+        print("\n→ Moisture sensors and pumps:")
+        for i in self.channels:
+            after = self.after.get(i)
+            if i in self.failed:
+                sensor_result = {"passed": False, "message": str(self.failed[i])}
+            elif after is None:
+                sensor_result = {"passed": False, "moistureBefore": round(self.before[i], 1),
+                                 "message": "No reading after pumping"}
+            else:
+                # Moisture must increase by at least 1%
+                increase = after - self.before[i]
+                passed = increase >= 1.0
+                sensor_result = {
+                    "passed": passed,
+                    "moistureBefore": round(self.before[i], 1),
+                    "moistureAfter": round(after, 1),
+                    "message": "OK" if passed else f"Increase too small ({increase:.1f}%, min. 1%)"
+                }
+            result["moistureSensors"].append(sensor_result)
+            result["pumps"].append(sensor_result)
+            print(f"  Plant {i+1}: {'✓ PASSED' if sensor_result['passed'] else '✗ FAILED'} ({sensor_result['message']})")
+
+        all_passed = (
+            all(s.get("passed", False) for s in result["moistureSensors"]) and
+            result["dht11"]["passed"] and
+            result["ultrasonic"]["passed"]
+        )
+        result["overall"] = all_passed
+        result["running"] = False
+        result["phase"] = self.phase = "done"
+
+        print(f"\n{'='*50}")
+        print(f"OVERALL: {'✓ ALL TESTS PASSED' if all_passed else '✗ SOME TESTS FAILED'}")
+        print(f"{'='*50}\n")
+
+        print("→ Uploading test results to Firebase...")
+        if self.system.fb.update_test_result(result):
+            print("✓ Test results uploaded successfully")
+        else:
+            print("✗ Failed to upload test results")
@@ -0,0 +1,42 @@
+# Settings-Cache auf dem Flash (Start ohne Netzwerk, Sync nur bei Änderung)
+import os
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+
+class SettingsCache:
+    def __init__(self, path="/settings.json"):
+        """Last known settings plus their settingsVersion and ETag"""
+        self.path = path
+        self.settings = None
+        self.version = None
+        self.etag = None
+
+    def load(self):
+        """Read cache from flash - returns settings or None"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.settings = data.get("settings")
+            self.version = data.get("version")
+            self.etag = data.get("etag")
+        except (OSError, ValueError):
+            pass
+        return self.settings
+
+    def save(self, settings, version, etag):
+        """Store new settings (tmp file + rename, never half-written)"""
+        self.settings = settings
+        self.version = version
+        self.etag = etag
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"settings": settings, "version": version, "etag": etag}, f)
+            os.rename(tmp, self.path)
+            return True
+        except OSError as e:
+            print(f"✗ Settings cache write failed: {e}")
+            return False
@@ -0,0 +1,90 @@
+# Form-Rasterizer mit Span-Tabellen (gemeinsam für epaper1in54b.py und waveshare_epd.py)
+#
+# A shape is a tuple of row spans (dy, x0, x1) relative to its centre,
+# computed once and cached. Filling a shape into a 1-bit plane (MONO_HLSB,
+# MSB = leftmost pixel) then costs one span per row: masked edge bytes
+# plus a slice assignment for the whole bytes in between.
+
+_FULL = b"\xff" * 32  # Whole bytes for a span (up to 256 pixels)
+_ZERO = bytes(32)
+_cache = {}
+
+
+def circle(radius):
+    """Spans of a filled circle (midpoint/Bresenham, same as EPD.draw_circle)"""
+    key = ("circle", radius)
+    spans = _cache.get(key)
+    if spans is not None:
+        return spans
+    half = [0] * (radius + 1)  # Half width per row distance
+    x_pos = -radius
+    y_pos = 0
+    err = 2 - 2 * radius
+    last_y = -1
+    while True:
+        if y_pos != last_y:
+            half[y_pos] = -x_pos  # First step on a row is the widest
+            last_y = y_pos
+        e2 = err
+        if (e2 <= y_pos):
+            y_pos += 1
+            err += y_pos * 2 + 1
+            if(-x_pos == y_pos and e2 <= x_pos):
+                e2 = 0
+        if (e2 >= x_pos):
+            x_pos += 1
+            err += x_pos * 2 + 1
+        if x_pos > 0:
+            break
+    spans = tuple((dy, -half[abs(dy)], half[abs(dy)]) for dy in range(-radius, radius + 1))
+    _cache[key] = spans
+    return spans
+
+
+def rectangle(width, height):
+    """Spans of a filled rectangle centred on (0, 0)"""
+    key = ("rect", width, height)
+    spans = _cache.get(key)
+    if spans is None:
+        x0 = -(width // 2)
+        y0 = -(height // 2)
+        spans = tuple((y0 + dy, x0, x0 + width - 1) for dy in range(height))
+        _cache[key] = spans
+    return spans
+
+
+def fill_span(buf, stride, y, x0, x1, value=1):
+    """Set (value=1) or clear (value=0) pixels x0..x1 of row y"""
+    base = y * stride
+    first = base + (x0 >> 3)
+    last = base + (x1 >> 3)
+    left = 0xFF >> (x0 & 7)
+    right = (0xFF << (7 - (x1 & 7))) & 0xFF
+    if first == last:
+        mask = left & right
+        if value:
+            buf[first] |= mask
+        else:
+            buf[first] &= ~mask
+        return
+    if value:
+        buf[first] |= left
+        buf[last] |= right
+        buf[first + 1:last] = _FULL[:last - first - 1]
+    else:
+        buf[first] &= ~left
+        buf[last] &= ~right
+        buf[first + 1:last] = _ZERO[:last - first - 1]
+
+
+def fill(buf, width, height, cx, cy, spans, value=1):
+    """Fill a shape centred at (cx, cy) into a width x height plane (clipped)"""
+    stride = (width + 7) // 8
+    for dy, dx0, dx1 in spans:
+        y = cy + dy
+        if y < 0 or y >= height:
+            continue
+        x0 = max(cx + dx0, 0)
+        x1 = min(cx + dx1, width - 1)
+        if x0 <= x1:
+            fill_span(buf, stride, y, x0, x1, value)
@@ -0,0 +1,121 @@
+# Host-Simulator: die ESP32-Module unverändert unter CPython ausführen (nicht auf den ESP32 kopieren)
+#
+# install(board) registers fake machine / network / dht / ntptime /
+# micropython / ujson modules and switches the time module and asyncio
+# to the board's virtual clock (time.sleep returns at once, timers fire
+# on the way).
+# The firmware modules are then imported as usual. See sim/harness.py for
+# a complete system against the local Firebase stand-in.
+import asyncio
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from sim.board import Board, Trace, UNIX_2000
+
+_board = None
+_saved = None
+
+FAKE_MODULES = ("machine", "network", "dht", "ntptime", "micropython")
+TIME_FUNCTIONS = ("time", "time_ns", "sleep", "sleep_ms", "sleep_us", "ticks_ms", "ticks_us",
+                  "ticks_cpu", "ticks_diff", "ticks_add", "gmtime", "localtime", "mktime")
+_real_gmtime = time.gmtime
+
+
+def board():
+    """The installed board (fake modules call this on every access)"""
+    if _board is None:
+        raise RuntimeError("sim.install() has not been called")
+    return _board
+
+
+def device_gmtime(secs=None):
+    """time.gmtime() on the device: seconds since 2000, no time zone"""
+    if secs is None:
+        secs = board().device_time()
+    return _real_gmtime(int(secs) + UNIX_2000)
+
+
+def _device_mktime(tm):
+    import calendar
+    return calendar.timegm(tuple(tm[:6]) + (0, 0, 0)) - UNIX_2000
+
+
+def _sleep(seconds):
+    board().clock.sleep_us(seconds * 1000000)
+
+
+def _mem_alloc():
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+def _mem_free():
+    return max(0, board().heap_bytes - _mem_alloc())
+
+
+def install(new_board):
+    """Make the board current and patch the module system - returns the board"""
+    global _board, _saved
+    if _saved is None:
+        _saved = {
+            "modules": {name: sys.modules.get(name) for name in FAKE_MODULES + ("ujson",)},
+            "time": {name: getattr(time, name) for name in TIME_FUNCTIONS if hasattr(time, name)},
+            "gc": {name: getattr(gc, name) for name in ("mem_free", "mem_alloc") if hasattr(gc, name)},
+            "asyncio": asyncio.get_event_loop_policy(),
+        }
+    _board = new_board
+
+    import importlib
+    for name in FAKE_MODULES:
+        sys.modules[name] = importlib.import_module("sim." + name)
+    sys.modules["ujson"] = json
+
+    # MicroPython time API on the virtual clock - looked up on every call,
+    # modules that did "from time import ticks_ms" follow the next board too
+    time.time = lambda: int(board().device_time())
+    time.time_ns = lambda: int(board().device_time() * 1000000000)
+    time.sleep = _sleep
+    time.sleep_ms = lambda ms: board().clock.sleep_us(ms * 1000)
+    time.sleep_us = lambda us: board().clock.sleep_us(us)
+    time.ticks_ms = lambda: board().clock.ticks_ms()
+    time.ticks_us = lambda: board().clock.ticks_us()
+    time.ticks_cpu = time.ticks_us
+    time.ticks_diff = lambda a, b: a - b
+    time.ticks_add = lambda a, b: a + b
+    time.gmtime = device_gmtime
+    time.localtime = device_gmtime
+    time.mktime = _device_mktime
+
+    gc.mem_alloc = _mem_alloc
+    gc.mem_free = _mem_free
+
+    from sim.loop import VirtualLoopPolicy
+    asyncio.set_event_loop_policy(VirtualLoopPolicy())
+    return new_board
+
+
+def uninstall():
+    """Restore the real modules and time functions"""
+    global _board, _saved
+    if _saved is None:
+        return
+    for name, module in _saved["modules"].items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
+    for name, func in _saved["time"].items():
+        setattr(time, name, func)
+    for name in TIME_FUNCTIONS:
+        if name not in _saved["time"] and hasattr(time, name):
+            delattr(time, name)
+    for name in ("mem_free", "mem_alloc"):
+        if name in _saved["gc"]:
+            setattr(gc, name, _saved["gc"][name])
+        elif hasattr(gc, name):
+            delattr(gc, name)
+    asyncio.set_event_loop_policy(_saved["asyncio"])
+    _board = None
+    _saved = None
@@ -0,0 +1,37 @@
+# Simulator starten: python -m sim [--cycles N] [--deep-sleep] [--verbose]  (im Ordner esp32/)
+import argparse
+import time
+
+from sim import Board
+from sim.harness import Simulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the watering firmware on a simulated board")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--deep-sleep", action="store_true", help="wake cycles instead of the main loop")
+    parser.add_argument("--no-display", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="show the firmware output")
+    args = parser.parse_args()
+
+    # Soil slowly drying out on plant 1, the others steady
+    board = Board(moisture_mv=([(0, 2300), (6 * 3600, 2700)], 2000, 1800, 2100))
+    start = time.perf_counter()
+    with Simulation(board, display=not args.no_display, quiet=not args.verbose,
+                    config={'DEEP_SLEEP': args.deep_sleep}) as simulation:
+        if args.deep_sleep:
+            for _ in range(args.cycles):
+                simulation.wake()
+        else:
+            simulation.run(cycles=args.cycles)
+
+        stats = simulation.server.stats()
+        data = simulation.server.get("sensorData")
+        print(f"✓ {args.cycles} cycles, {board.t():.0f} s simulated in {time.perf_counter() - start:.1f} s")
+        print(f"  Firebase: {stats['requests']} requests, {stats['bytesIn']} bytes in, {stats['bytesOut']} bytes out")
+        print(f"  Pumps started: {board.pump_starts}, display refreshes: {board.refreshes}")
+        print(f"  Last sensorData: {data}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+# Benchmark: die Firmware im Simulator, pro Messintervall und Schritt gemessen
+#
+# python -m sim.benchmark [-o results.json] [--baseline old.json]  (im Ordner esp32/)
+#
+# Runs the firmware's own entry point (WateringSystem.run: the asyncio
+# task runtime with event streams, unless a scenario's CONFIG says
+# otherwise) on the virtual clock against the simulated board and
+# Firebase stand-in, and reports per measurement interval and per step:
+# wall time on the host (perf_counter), simulated device time (virtual
+# clock: sensor sampling, SPI, pump waits), HTTP requests and bytes, and
+# the peak of traced heap. Writes are batched, so their requests show up
+# under "upload" (flush_batch), not under "status".
+#
+# Requests, bytes and device time are deterministic (seeded board) and
+# are what --baseline compares; wall time depends on the host and is
+# only reported. Heap is
+# CPython's (tracemalloc): the peak per cycle includes the in-process
+# Firebase stand-in, the growth over the run leaves it out - useful for
+# trends and leaks, not as an ESP32 figure.
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from sim.board import Board
+from sim.harness import Simulation
+
+# Step -> methods (on WateringSystem, "fb." / "wifi." on its clients)
+STEPS = (
+    ("wifi", ("wifi.ensure_connection",)),
+    ("sensors", ("read_all_sensors",)),
+    ("upload", ("fb.drain_offline", "fb.update_sensor_data", "save_historical_data", "fb.flush_batch")),
+    ("status", ("update_system_status",)),
+    ("commands", ("check_commands", "on_stream_event")),
+    ("selftest", ("step_system_test",)),
+    ("watering", ("check_and_water",)),
+    ("display", ("update_display",)),
+    ("settings", ("load_settings", "maintain_errors")),
+)
+
+# Allocations of the in-process Firebase stand-in, left out of the heap growth
+SERVER_FILES = ("*/sim/firebase_server.py", "*/http/server.py", "*/http/client.py", "*/socketserver.py",
+                "*/email/*", "*/threading.py", "*/queue.py", "*/socket.py")
+
+
+class StepProfiler:
+    """Wraps the step methods of one WateringSystem and sums up per step"""
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.active = False
+        self.depth = 0  # Only the outermost wrapped call counts
+        self.steps = {name: self._empty() for name, _ in STEPS}
+        for name, methods in STEPS:
+            for method in methods:
+                owner, attr = self._resolve(method)
+                setattr(owner, attr, self._wrap(name, getattr(owner, attr)))
+
+    @staticmethod
+    def _empty():
+        return {"calls": 0, "wallMs": 0.0, "wallMsMax": 0.0, "deviceMs": 0.0,
+                "requests": 0, "bytesIn": 0, "bytesOut": 0, "peakHeapBytes": 0}
+
+    def _resolve(self, method):
+        owner = self.simulation.system
+        *path, attr = method.split(".")
+        for part in path:
+            owner = getattr(owner, part)
+        return owner, attr
+
+    def _wrap(self, step, func):
+        def timed(*args, **kwargs):
+            if not self.active or self.depth:
+                return func(*args, **kwargs)
+            server = self.simulation.server
+            clock = self.simulation.board.clock
+            first = len(server.requests)
+            heap = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            device = clock.now_us
+            self.depth += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                wall_ms = (time.perf_counter() - start) * 1000
+                self.depth -= 1
+                stats = server.stats(first, streams=False)
+                totals = self.steps[step]
+                totals["calls"] += 1
+                totals["wallMs"] += wall_ms
+                totals["wallMsMax"] = max(totals["wallMsMax"], wall_ms)
+                totals["deviceMs"] += (clock.now_us - device) / 1000
+                totals["requests"] += stats["requests"]
+                totals["bytesIn"] += stats["bytesIn"]
+                totals["bytesOut"] += stats["bytesOut"]
+                totals["peakHeapBytes"] = max(totals["peakHeapBytes"],
+                                              tracemalloc.get_traced_memory()[1] - heap)
+        return timed
+
+
+def device_heap():
+    """Traced bytes without the Firebase stand-in's (JSON decoding is shared: counted)"""
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, pattern) for pattern in SERVER_FILES])
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+def run_scenario(board, cycles, before_cycle=None, config=None, latency_ms=0):
+    """
+    WateringSystem.run() for cycles measurement intervals after startup,
+    before_cycle(simulation, i) at the start of each - returns the report
+    """
+    tracemalloc.start()
+    try:
+        with Simulation(board, config=config, latency_ms=latency_ms) as simulation:
+            profiler = StepProfiler(simulation)
+            system = simulation.system
+            interval = system.get_interval()
+            wall = []
+            device = []
+            heap_after = []
+            window = {}  # Start of the current interval
+            peak = 0
+
+            def step_device_ms():
+                return sum(totals["deviceMs"] for totals in profiler.steps.values())
+
+            def boundary(simulation, i):
+                """End of interval i - 1, start of interval i"""
+                nonlocal peak
+                if i:
+                    wall.append((time.perf_counter() - window["wall"]) * 1000)
+                    device.append(step_device_ms() - window["device"])
+                    # Peak above the heap at interval start (steps reset the peak: take theirs too)
+                    peak = max(peak, tracemalloc.get_traced_memory()[1] - window["heap"],
+                               max(totals["peakHeapBytes"] for totals in profiler.steps.values()))
+                if i in (1, cycles):
+                    heap_after.append(device_heap())
+                if i == cycles:
+                    simulation.end_run()
+                    return
+                if before_cycle:
+                    before_cycle(simulation, i)
+                simulation.output.seek(0)  # Captured console output is not device heap
+                simulation.output.truncate()
+                window["heap"] = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                window["device"] = step_device_ms()
+                window["wall"] = time.perf_counter()
+
+            startup = system.startup
+
+            def measured_startup():
+                """Boot (WiFi, NTP, settings) is not part of the measured intervals"""
+                startup()
+                window["requests"] = len(simulation.server.requests)
+                device_heap()  # Warm-up: the first snapshot imports its helpers
+                profiler.active = True
+                boundary(simulation, 0)
+                for i in range(1, cycles + 1):
+                    simulation.at(i * interval, lambda simulation, i=i: boundary(simulation, i))
+
+            system.startup = measured_startup
+            simulation.run()
+            profiler.active = False
+            firebase = simulation.server.stats(window["requests"])
+            errors = simulation.server.get("systemErrors") or {}
+    finally:
+        tracemalloc.stop()
+
+    for totals in profiler.steps.values():
+        totals["wallMs"] = round(totals["wallMs"], 3)
+        totals["wallMsMax"] = round(totals["wallMsMax"], 3)
+        totals["deviceMs"] = round(totals["deviceMs"], 1)
+    ordered = sorted(wall)
+    return {
+        "cycles": cycles,
+        "cycle": {
+            "wallMsMean": round(sum(wall) / cycles, 3),
+            "wallMsMedian": round(ordered[cycles // 2], 3),
+            "wallMsMax": round(ordered[-1], 3),
+            "deviceMsMean": round(sum(device) / cycles, 1),
+            "deviceMsMax": round(max(device), 1),
+        },
+        "steps": profiler.steps,
+        "firebase": firebase,
+        "requestsPerCycle": round(firebase["requests"] / cycles, 2),
+        "bytesPerCycle": round((firebase["bytesIn"] + firebase["bytesOut"]) / cycles, 1),
+        "peakHeapBytes": peak,
+        "heapGrowthBytes": heap_after[-1] - heap_after[0],
+        "pumpStarts": list(board.pump_starts),
+        "storedErrors": len(errors),
+        "displayRefreshes": board.refreshes,
+    }
+
+
+# ----- scenarios -----
+
+def healthy(cycles, latency_ms):
+    """All sensors fine, moist soil: the everyday cycle"""
+    return run_scenario(Board(), cycles, latency_ms=latency_ms)
+
+
+def sensor_fault(cycles, latency_ms):
+    """Moisture 2 open wire, DHT11 not answering, no ultrasonic echo"""
+    board = Board(moisture_mv=(2000, None, 2000, 2000), dht_fail_rate=1.0, tank_distance_cm=None)
+    return run_scenario(board, cycles, latency_ms=latency_ms)
+
+
+def wifi_drop(cycles, latency_ms):
+    """Access point gone for ~15 min: reconnects, offline queue, drain"""
+    board = Board(wifi=[(0, 1), (400, 0), (1300, 1)])
+    return run_scenario(board, cycles, latency_ms=latency_ms,
+                        config={'HISTORICAL_DATA_INTERVAL': 300})
+
+
+def command_burst(cycles, latency_ms):
+    """Website sends watering + calibration every cycle, a self-test once"""
+    def send(simulation, i):
+        stamp = simulation.board.unix_time() * 1000
+        simulation.server.set("manualWatering", {"plantId": i % 4 + 1, "duration": 3, "timestamp": stamp})
+        simulation.server.set("manualCalibration", {"sensorId": i % 4 + 1, "percent": 50, "timestamp": stamp})
+        if i == 1:
+            simulation.server.set("manualTest", {"trigger": True, "timestamp": stamp})
+    return run_scenario(Board(), cycles, before_cycle=send, latency_ms=latency_ms)
+
+
+SCENARIOS = {
+    "healthy": healthy,
+    "sensor_fault": sensor_fault,
+    "wifi_drop": wifi_drop,
+    "command_burst": command_burst,
+}
+
+
+# ----- output -----
+
+def print_table(results, out=sys.stdout):
+    for name, report in results["scenarios"].items():
+        cycle = report["cycle"]
+        print(f"{name}: {report['cycles']} cycles, {cycle['wallMsMean']:.1f} ms/cycle (max {cycle['wallMsMax']:.1f}), "
+              f"device {cycle['deviceMsMean'] / 1000:.1f} s/cycle, {report['requestsPerCycle']} req, "
+              f"{report['bytesPerCycle']:.0f} B/cycle, peak heap {report['peakHeapBytes'] // 1024} KiB", file=out)
+        for step, totals in report["steps"].items():
+            if totals["calls"]:
+                print(f"  {step:<9} {totals['wallMs']:9.2f} ms {totals['deviceMs'] / 1000:9.2f} s "
+                      f"{totals['requests']:4d} req {totals['bytesIn'] + totals['bytesOut']:7d} B", file=out)
+
+
+def compare(results, baseline, out=sys.stdout):
+    """
+    Print changes against an earlier results file - returns the number of
+    regressions. Only deterministic numbers are compared (requests, bytes,
+    device time); wall time is host noise.
+    """
+    regressions = 0
+    for name, report in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        checks = [("requests", report["firebase"]["requests"], old["firebase"]["requests"]),
+                  ("bytes", report["bytesPerCycle"], old["bytesPerCycle"]),
+                  ("deviceMs", report["cycle"]["deviceMsMean"], old["cycle"]["deviceMsMean"])]
+        for step, totals in report["steps"].items():
+            before = old["steps"].get(step)
+            if before:
+                checks.append((step + ".requests", totals["requests"], before["requests"]))
+                checks.append((step + ".deviceMs", totals["deviceMs"], before["deviceMs"]))
+        for label, new, previous in checks:
+            if new > previous:
+                regressions += 1
+                print(f"! {name} {label}: {previous} -> {new}", file=out)
+            elif new < previous:
+                print(f"✓ {name} {label}: {previous} -> {new}", file=out)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the main-loop cycle on the simulated board")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"default: all ({', '.join(SCENARIOS)})")
+    parser.add_argument("--cycles", type=int, default=6)
+    parser.add_argument("--latency-ms", type=int, default=0, help="added to every Firebase response")
+    parser.add_argument("-o", "--output", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="earlier results file: report changes, exit 1 on regressions")
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario: {name}")
+
+    results = {
+        "python": platform.python_version(),
+        "cycles": args.cycles,
+        "latencyMs": args.latency_ms,
+        "scenarios": {name: SCENARIOS[name](args.cycles, args.latency_ms)
+                      for name in (args.scenarios or SCENARIOS)},
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print_table(results)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), out=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# Simuliertes Board: Pins, Sensoren, Pumpen, Tank, WLAN und E-Ink Panel
+#
+# All fake MicroPython modules talk to the board installed by
+# sim.install(). Sensor values come from traces (functions of virtual
+# time), so a scenario can script drying soil, a failing DHT11 or a WiFi
+# outage. Pumps feed back into the model: a running pump wets its plant
+# and lowers the tank.
+import math
+import random
+
+UNIX_2000 = 946684800  # MicroPython epoch (2000-01-01) in Unix seconds
+
+
+class Trace:
+    """
+    A value over virtual time (seconds): constant, callable(t), or
+    [(t, value), ...] - linear between points (step=True: hold until the
+    next point), end values held outside.
+    """
+    def __init__(self, spec, step=False):
+        self.spec = spec
+        self.step = step
+
+    def __call__(self, t):
+        spec = self.spec
+        if callable(spec):
+            return spec(t)
+        if not isinstance(spec, (list, tuple)):
+            return spec
+        if t <= spec[0][0]:
+            return spec[0][1]
+        for (t0, v0), (t1, v1) in zip(spec, spec[1:]):
+            if t < t1:
+                if self.step or v0 is None or v1 is None:
+                    return v0
+                return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+        return spec[-1][1]
+
+
+def trace(spec, step=False):
+    return spec if isinstance(spec, Trace) else Trace(spec, step)
+
+
+class PinState:
+    def __init__(self, value=0):
+        self.value = value
+        self.mode = None
+        self.hold = False
+        self.irq_handler = None
+        self.irq_trigger = 0
+        self.pin = None  # Pin object handed to IRQ handlers
+
+
+class Board:
+    def __init__(self, config=None, seed=1, start_unix=1780000000,
+                 moisture_mv=(2000, 2000, 2000, 2000), adc_noise_mv=8,
+                 temperature=21, humidity=45, dht_fail_rate=0.0,
+                 tank_distance_cm=10, wifi=1, ntp=1,
+                 pump_wet_mv_per_s=40, soil_dry_tau_s=6 * 3600, pump_tank_cm_per_s=0.02,
+                 refresh_ms=8000, heap_bytes=8 * 1024 * 1024):
+        """
+        config: firmware CONFIG (pin numbers, or configure() later). Sensor
+        arguments are traces (see Trace). moisture_mv: sensor voltage per channel, wifi / ntp:
+        truthy while the access point / NTP servers are reachable.
+        """
+        from sim.clock import Clock
+        self.clock = Clock()
+        self.random = random.Random(seed)
+        self.start_unix = start_unix
+        self.pins = {}
+
+        self.moisture_mv = [trace(t) for t in moisture_mv]
+        self.adc_noise_mv = adc_noise_mv
+        self.temperature = trace(temperature)
+        self.humidity = trace(humidity)
+        self.dht_fail_rate = trace(dht_fail_rate, step=True)
+        self.dht_last_us = None
+        self.tank_distance_cm = trace(tank_distance_cm)
+        self.wifi = trace(wifi, step=True)
+        self.ntp = trace(ntp, step=True)
+        self.wlan_connected = False
+
+        # Plant / tank model driven by the relays (active LOW)
+        self.pump_wet_mv_per_s = pump_wet_mv_per_s
+        self.soil_dry_tau_s = soil_dry_tau_s
+        self.pump_tank_cm_per_s = pump_tank_cm_per_s
+        self.model_t = 0.0
+        self.refresh_ms = refresh_ms
+
+        self.rtc_memory = b""
+        self.rtc_offset = 0  # Device seconds = clock + offset (power-on: 2000-01-01)
+        self.reset_cause = 1  # PWRON_RESET
+        self.heap_bytes = heap_bytes
+
+        # Counters
+        self.spi_bytes = 0
+        self.refreshes = 0
+        self.adc_reads = 0
+        self.dht_reads = 0
+        self.pings = 0
+        self.configure(config or {})
+
+    def configure(self, config):
+        """Pin assignment from the firmware CONFIG"""
+        self.moisture_pins = list(config.get('MOISTURE_PINS', ()))
+        self.relay_pins = list(config.get('RELAY_PINS', ()))
+        self.wet_offset = [0.0] * len(self.moisture_pins)
+        self.pumped_s = [0.0] * len(self.relay_pins)
+        self.pump_starts = [0] * len(self.relay_pins)
+        for pin in self.relay_pins:
+            self.pin(pin).value = 1  # Relays OFF (active LOW)
+
+        # E-Ink panel: BUSY low while refreshing (GDEW0154Z04)
+        self.eink_dc = config.get('EINK_DC')
+        self.eink_busy = config.get('EINK_BUSY')
+        if self.eink_busy is not None:
+            self.pin(self.eink_busy).value = 1
+
+    # ----- time -----
+
+    def t(self):
+        return self.clock.seconds()
+
+    def unix_time(self):
+        """True wall-clock time of the simulated world"""
+        return self.start_unix + self.t()
+
+    def device_time(self):
+        """time.time() on the device (seconds since 2000, RTC based)"""
+        return self.t() + self.rtc_offset
+
+    def set_device_time(self, seconds_2000):
+        self.rtc_offset = seconds_2000 - self.t()
+
+    # ----- pins -----
+
+    def pin(self, pin_id):
+        state = self.pins.get(pin_id)
+        if state is None:
+            state = self.pins[pin_id] = PinState()
+        return state
+
+    def write_pin(self, pin_id, value):
+        state = self.pin(pin_id)
+        value = 1 if value else 0
+        old = state.value
+        if pin_id in self.relay_pins:
+            self._update_model()
+            if old and not value:
+                self.pump_starts[self.relay_pins.index(pin_id)] += 1
+        state.value = value
+        if old != value:
+            self._edge(state, value)
+
+    def _edge(self, state, value):
+        # machine.Pin.IRQ_RISING = 1, IRQ_FALLING = 2
+        if state.irq_handler and state.irq_trigger & (1 if value else 2):
+            state.irq_handler(state.pin)
+
+    def pump_running(self, pump_id):
+        return self.pin(self.relay_pins[pump_id]).value == 0
+
+    # ----- sensors -----
+
+    def _update_model(self):
+        t = self.t()
+        dt = t - self.model_t
+        if dt <= 0:
+            return
+        self.model_t = t
+        decay = math.exp(-dt / self.soil_dry_tau_s)
+        for i in range(len(self.wet_offset)):
+            self.wet_offset[i] *= decay
+            if i < len(self.relay_pins) and self.pump_running(i):
+                self.wet_offset[i] += self.pump_wet_mv_per_s * dt
+                self.pumped_s[i] += dt
+
+    def adc_mv(self, pin_id):
+        """Sensor voltage incl. noise; raises OSError for a None trace value (open wire)"""
+        self.adc_reads += 1
+        channel = self.moisture_pins.index(pin_id) if pin_id in self.moisture_pins else None
+        if channel is None:
+            return 0
+        self._update_model()
+        mv = self.moisture_mv[channel](self.t())
+        if mv is None:
+            raise OSError(116, "ETIMEDOUT")
+        mv = mv - self.wet_offset[channel] + self.random.gauss(0, self.adc_noise_mv)
+        return int(max(0, min(3300, mv)))
+
+    def dht_measure(self):
+        """One DHT11 transfer -> (temperature, humidity), OSError like the driver"""
+        self.dht_reads += 1
+        now = self.clock.now_us
+        too_soon = self.dht_last_us is not None and now - self.dht_last_us < 1000000
+        self.dht_last_us = now
+        self.clock.advance(25000)  # Start signal + 40 bits
+        if too_soon:
+            raise OSError(116, "ETIMEDOUT")
+        if self.random.random() < self.dht_fail_rate(self.t()):
+            raise OSError(5, "EIO")  # Checksum mismatch
+        return int(round(self.temperature(self.t()))), int(round(self.humidity(self.t())))
+
+    def echo_pulse_us(self):
+        """Echo width for the current tank distance, None without echo"""
+        self.pings += 1
+        distance = self.tank_distance_cm(self.t())
+        if distance is None:
+            return None
+        self._update_model()
+        distance += sum(self.pumped_s) * self.pump_tank_cm_per_s
+        speed = (331.3 + 0.606 * self.temperature(self.t())) / 10000  # cm/us
+        width = distance * 2 / speed
+        return int(width + self.random.gauss(0, 5))
+
+    # ----- network -----
+
+    def wifi_up(self):
+        return bool(self.wifi(self.t()))
+
+    def network_up(self):
+        """Device can reach the internet (connected and access point up)"""
+        if self.wlan_connected and not self.wifi_up():
+            self.wlan_connected = False  # Link lost
+        return self.wlan_connected
+
+    def ntp_up(self):
+        return self.network_up() and bool(self.ntp(self.t()))
+
+    # ----- SPI / e-paper -----
+
+    def spi_write(self, data):
+        self.spi_bytes += len(data)
+        if self.eink_dc is None or self.eink_busy is None:
+            return
+        if len(data) == 1 and self.pin(self.eink_dc).value == 0:
+            command = data[0]
+            if command == 0x12:  # DISPLAY_REFRESH
+                self.refreshes += 1
+                self._busy_for(self.refresh_ms)
+            elif command == 0x04:  # POWER_ON
+                self._busy_for(100)
+
+    def _busy_for(self, ms):
+        self.write_pin(self.eink_busy, 0)
+        self.clock.call_at(self.clock.now_us + ms * 1000, lambda: self.write_pin(self.eink_busy, 1))
@@ -0,0 +1,63 @@
+# Virtuelle Uhr für den Simulator (schneller als Echtzeit)
+#
+# The firmware only ever sees this clock: sleeping advances it instantly
+# and fires the timers that became due on the way. Every ticks read adds
+# one microsecond, so a loop that polls ticks without sleeping still
+# makes progress.
+import heapq
+
+SPIN_US = 1
+
+
+class Deadline(BaseException):
+    """Raised once the clock reaches deadline_us - ends Simulation.run()"""
+
+
+class Clock:
+    def __init__(self):
+        self.now_us = 0
+        self.timers = []  # Heap of (due_us, seq, callback)
+        self.seq = 0
+        self.slept_us = 0  # Total virtual time spent sleeping
+        self.deadline_us = None  # advance() raises Deadline when it gets there
+
+    def ticks_us(self):
+        self.now_us += SPIN_US
+        return self.now_us
+
+    def ticks_ms(self):
+        return self.ticks_us() // 1000
+
+    def seconds(self):
+        return self.now_us / 1000000
+
+    def call_at(self, due_us, callback):
+        """Run callback() once the clock passes due_us - returns a handle for cancel()"""
+        self.seq += 1
+        entry = [due_us, self.seq, callback]
+        heapq.heappush(self.timers, entry)
+        return entry
+
+    def cancel(self, entry):
+        entry[2] = None  # Lazily dropped when due
+
+    def advance(self, us):
+        """Move time forward by us, firing due timers in order"""
+        end = self.now_us + max(0, int(us))
+        while True:
+            if self.deadline_us is not None:  # May be set by a timer callback
+                end = max(self.now_us, min(end, self.deadline_us))
+            if not self.timers or self.timers[0][0] > end:
+                break
+            due, _, callback = heapq.heappop(self.timers)
+            self.now_us = max(self.now_us, due)
+            if callback is not None:
+                callback()
+        self.now_us = max(self.now_us, end)
+        if self.deadline_us is not None and self.now_us >= self.deadline_us:
+            self.deadline_us = None  # Once: the firmware may clean up afterwards
+            raise Deadline()
+
+    def sleep_us(self, us):
+        self.slept_us += max(0, int(us))
+        self.advance(us)
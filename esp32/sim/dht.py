@@ -0,0 +1,26 @@
+# Ersatz für das MicroPython-Modul dht (DHT11 / DHT22)
+import sim
+
+
+class DHTBase:
+    def __init__(self, pin):
+        self.pin = pin
+        self._temperature = 0
+        self._humidity = 0
+
+    def measure(self):
+        self._temperature, self._humidity = sim.board().dht_measure()
+
+    def temperature(self):
+        return self._temperature
+
+    def humidity(self):
+        return self._humidity
+
+
+class DHT11(DHTBase):
+    pass
+
+
+class DHT22(DHTBase):
+    pass
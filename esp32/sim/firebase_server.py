@@ -0,0 +1,322 @@
+# Lokaler Ersatz für die Firebase Realtime Database (REST, nur für den Simulator)
+#
+# Speaks the subset of the RTDB REST API the firmware uses: GET (with
+# shallow=true and X-Firebase-ETag), PUT, POST (push IDs), PATCH
+# (multi-location updates), DELETE and text/event-stream listeners, over
+# HTTP/1.1 keep-alive with pipelining. Every request is recorded with its
+# size, so benchmarks can count calls and bytes. While online() returns
+# False connections are dropped, like a device without network.
+import hashlib
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+def split_path(path):
+    """URL path '/a/b.json' -> ['a', 'b']"""
+    if path.endswith(".json"):
+        path = path[:-5]
+    return [key for key in path.split("/") if key]
+
+
+def clean(value):
+    """RTDB semantics: no null children, no empty objects"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            item = clean(item)
+            if item is not None:
+                result[str(key)] = item
+        return result or None
+    if isinstance(value, list):
+        return clean({str(i): item for i, item in enumerate(value)})
+    return value
+
+
+def as_json(value):
+    """Objects with keys 0..n-1 come back as arrays, like Firebase does"""
+    if isinstance(value, dict):
+        value = {key: as_json(item) for key, item in value.items()}
+        if value and all(key.isdigit() for key in value):
+            indexes = [int(key) for key in value]
+            if max(indexes) < 2 * len(indexes):
+                return [value.get(str(i)) for i in range(max(indexes) + 1)]
+    return value
+
+
+class FirebaseServer:
+    def __init__(self, data=None, host="127.0.0.1", port=0, online=None, latency_ms=0):
+        self.data = clean(data) or {}
+        self.lock = threading.RLock()
+        self.online = online  # Callable -> False: drop connections
+        self.latency_ms = latency_ms  # Added (wall clock) to every response
+        self.requests = []  # {method, path, status, bytesIn, bytesOut}
+        self.failures = []  # Injected status codes for the next requests
+        self.listeners = []  # (keys, queue) of open event streams
+        self.push_count = 0
+        self.stopping = threading.Event()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # ----- data access (scenarios, assertions) -----
+
+    def get(self, path=""):
+        with self.lock:
+            return as_json(self._lookup(split_path(path)))
+
+    def set(self, path, value):
+        with self.lock:
+            self._write(split_path(path), value)
+        self._notify(split_path(path))
+
+    def update(self, path, updates):
+        keys = split_path(path)
+        with self.lock:
+            for child, value in updates.items():
+                self._write(keys + split_path(child), value)
+        self._notify(keys)
+
+    def fail_next(self, count=1, status=503):
+        """Answer the next count requests with an error status"""
+        with self.lock:
+            self.failures.extend([status] * count)
+
+    def stats(self, since=0, streams=True):
+        """
+        Totals over self.requests[since:]. Requests dropped while offline
+        never leave a real device: counted as "dropped" only. streams=False
+        leaves out event-stream connections (opened by a task, not by a step).
+        """
+        with self.lock:
+            records = [r for r in self.requests[since:] if streams or not r["stream"]]
+        sent = [r for r in records if r["status"]]
+        return {
+            "requests": len(sent),
+            "bytesIn": sum(r["bytesIn"] for r in sent),
+            "bytesOut": sum(r["bytesOut"] for r in sent),
+            "errors": sum(1 for r in sent if r["status"] >= 400),
+            "dropped": len(records) - len(sent),
+        }
+
+    # ----- tree -----
+
+    def _lookup(self, keys):
+        node = self.data
+        for key in keys:
+            if not isinstance(node, dict) or key not in node:
+                return None
+            node = node[key]
+        return node
+
+    def _write(self, keys, value):
+        value = clean(value)
+        if not keys:
+            self.data = value or {}
+            return
+        node = self.data
+        parents = []
+        for key in keys[:-1]:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = node[key] = {}
+            parents.append((node, key))
+            node = child
+        if value is None:
+            node.pop(keys[-1], None)
+            for parent, key in reversed(parents):  # Drop emptied parents
+                if parent[key]:
+                    break
+                del parent[key]
+        else:
+            node[keys[-1]] = value
+
+    def _notify(self, keys):
+        for stream_keys, events in list(self.listeners):
+            n = min(len(keys), len(stream_keys))
+            if keys[:n] == stream_keys[:n]:
+                with self.lock:
+                    value = as_json(self._lookup(stream_keys))
+                self._deliver(events, "put", {"path": "/", "data": value})
+
+    def keep_alive(self):
+        """keep-alive event on every open stream (Firebase sends one every ~30 s)"""
+        for _, events in list(self.listeners):
+            self._deliver(events, "keep-alive", None)
+
+    @staticmethod
+    def _deliver(events, event, data):
+        """
+        Queue a stream event and wait until it is written: under the virtual
+        clock the client must be able to read it before time moves on
+        """
+        written = threading.Event()
+        events.put((event, data, written))
+        written.wait(1)
+
+    # ----- HTTP -----
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # Pipelined answers: no 40 ms delayed-ACK stalls
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, record, status, value=None, body=None, headers=()):
+                """Send a response - the record is complete before the client sees it"""
+                if body is None:
+                    body = json.dumps(value).encode()
+                lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}",
+                         "Content-Type: application/json; charset=utf-8",
+                         f"Content-Length: {len(body)}",
+                         "Connection: keep-alive"]
+                lines.extend(headers)
+                data = ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+                record["status"] = status
+                record["bytesOut"] = len(data)
+                if server.latency_ms:
+                    server.stopping.wait(server.latency_ms / 1000)
+                self.wfile.write(data)
+                self.wfile.flush()
+
+            def _handle(self, method):
+                bytes_in = len(self.raw_requestline) + len(str(self.headers))
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                bytes_in += len(body)
+
+                url = urlsplit(self.path)
+                keys = split_path(url.path)
+                query = parse_qs(url.query)
+                stream = method == "GET" and "text/event-stream" in self.headers.get("Accept", "")
+                record = {"method": method, "path": "/".join(keys), "status": 200,
+                          "bytesIn": bytes_in, "bytesOut": 0, "stream": stream}
+                with server.lock:
+                    server.requests.append(record)
+                    if server.online is not None and not server.online():
+                        record["status"] = 0  # Device offline: dropped, no answer
+                        self.close_connection = True
+                        return
+                    status = server.failures.pop(0) if server.failures else None
+                if status:
+                    self._reply(record, status, {"error": "injected failure"})
+                    return
+
+                if stream:
+                    self._stream(keys, record)
+                    return
+
+                try:
+                    value = json.loads(body) if body else None
+                except ValueError:
+                    self._reply(record, 400, {"error": "Invalid data; couldn't parse JSON object"})
+                    return
+
+                headers = []
+                with server.lock:
+                    if method == "GET":
+                        result = as_json(server._lookup(keys))
+                        if query.get("shallow") == ["true"] and isinstance(result, dict):
+                            result = {key: True for key in result}
+                        elif query.get("shallow") == ["true"] and isinstance(result, list):
+                            result = {str(i): True for i, item in enumerate(result) if item is not None}
+                    elif method == "PUT":
+                        server._write(keys, value)
+                        result = value
+                    elif method == "POST":
+                        server.push_count += 1
+                        name = f"-Sim{server.push_count:016d}"
+                        server._write(keys + [name], value)
+                        result = {"name": name}
+                    elif method == "PATCH":
+                        for child, item in (value or {}).items():
+                            server._write(keys + split_path(child), item)
+                        result = value
+                    else:  # DELETE
+                        server._write(keys, None)
+                        result = None
+                    response = json.dumps(result).encode()
+                    if self.headers.get("X-Firebase-ETag") == "true":
+                        headers.append(f"ETag: {hashlib.md5(response).hexdigest()}")
+                if method != "GET":
+                    server._notify(keys)
+                self._reply(record, 200, body=response, headers=headers)
+
+            def _stream(self, keys, record):
+                events = queue.Queue()
+                server.listeners.append((keys, events))
+                try:
+                    head = ("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                            "Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n").encode()
+                    self.wfile.write(head)
+                    record["bytesOut"] += len(head)
+                    with server.lock:
+                        events.put(("put", {"path": "/", "data": as_json(server._lookup(keys))}, None))
+                    while not server.stopping.is_set():
+                        try:
+                            event, data, written = events.get(timeout=0.5)
+                        except queue.Empty:
+                            continue
+                        # Outage noticed with the next event (keep-alive): device time, not host time
+                        if server.online is not None and not server.online():
+                            if written:
+                                written.set()  # Dropped with the connection
+                            break
+                        chunk = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+                        record["bytesOut"] += len(chunk)
+                        if written:
+                            written.set()
+                except OSError:
+                    pass
+                finally:
+                    server.listeners.remove((keys, events))
+                    while not events.empty():  # Nobody waits for undelivered events
+                        written = events.get()[2]
+                        if written:
+                            written.set()
+                    self.close_connection = True
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_PUT(self):
+                self._handle("PUT")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_PATCH(self):
+                self._handle("PATCH")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+        return Handler
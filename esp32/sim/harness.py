@@ -0,0 +1,185 @@
+# Komplettes System im Simulator: Firmware + simuliertes Board + lokales Firebase
+#
+# Builds WateringSystem exactly like main.main() does, from the unmodified
+# firmware modules, against a Board and a FirebaseServer. Flash files go
+# to a temporary directory. run() starts the firmware's own entry point
+# (asyncio runtime with event streams by default) on the virtual clock
+# and stops it after the given device time; wake() runs one deep-sleep
+# wake cycle with fresh RAM.
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import sim
+from sim.board import Board
+from sim.clock import Deadline
+from sim.firebase_server import FirebaseServer
+
+ESP32_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SETTINGS = {
+    "pin": "0000",
+    "measurementInterval": 300,
+    "numberOfPlants": 4,
+    "waterTank": {"diameter": 20, "height": 30},
+    "plantProfiles": [
+        {"id": i, "name": f"Pflanze {i}", "moistureMin": 30, "moistureMax": 70,
+         "enabled": True, "useSeasonalSchedule": False}
+        for i in range(1, 5)
+    ],
+    "notifications": {"enabled": False, "lowWaterThreshold": 10,
+                      "notifyOnTestFailure": True, "notifyOnSensorError": True},
+}
+
+_original_config = None
+KEEP_ALIVE_US = 30000000
+
+
+class Simulation:
+    def __init__(self, board=None, data=None, config=None, display=True, quiet=True, latency_ms=0):
+        """
+        board: sim.Board (default: healthy plants), data: initial database
+        (default: settings only), config: CONFIG overrides, quiet: collect
+        the firmware's print output in self.output instead of stdout.
+        """
+        self.board = board or Board()
+        self.data = data if data is not None else {"settings": DEFAULT_SETTINGS, "settingsVersion": 1}
+        self.overrides = config or {}
+        self.display = display
+        self.quiet = quiet
+        self.latency_ms = latency_ms
+        self.output = io.StringIO()
+        self.flash = None
+        self.server = None
+        self.firmware = None
+        self.system = None
+
+    # ----- setup -----
+
+    def start(self):
+        global _original_config
+        if ESP32_DIR not in sys.path:
+            sys.path.insert(0, ESP32_DIR)
+        sim.install(self.board)
+        with self._console():
+            import main as firmware
+        self.firmware = firmware
+        if _original_config is None:
+            _original_config = dict(firmware.CONFIG)
+
+        # Fresh CONFIG per simulation, flash paths inside a temp directory
+        self.flash = tempfile.TemporaryDirectory(prefix="sim-flash-")
+        config = dict(_original_config)
+        config.update(self.overrides)
+        for key, value in config.items():
+            if isinstance(value, str) and value.startswith('/'):
+                config[key] = os.path.join(self.flash.name, value.lstrip('/'))
+        firmware.CONFIG.clear()
+        firmware.CONFIG.update(config)
+        self.board.configure(config)
+
+        self.server = FirebaseServer(self.data, online=self.board.network_up, latency_ms=self.latency_ms).start()
+        self.system = self._build()
+        return self
+
+    def stop(self):
+        if self.system:
+            self.system.fb.close()
+        if self.server:
+            self.server.stop()
+        if self.flash:
+            self.flash.cleanup()
+        sim.uninstall()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _console(self):
+        return contextlib.redirect_stdout(self.output) if self.quiet else contextlib.nullcontext()
+
+    def _build(self):
+        """Same wiring as main.main() (fresh RAM: new objects)"""
+        fw = self.firmware
+        config = fw.CONFIG
+        with self._console():
+            wifi = fw.WiFiManager(fw.WIFI_SSID, fw.WIFI_PASSWORD)
+            hardware = fw.HardwareController(config)
+            firebase = fw.FirebaseClient(self.server.url, max_retries=3, timeout=10)
+            firebase.offline = fw.OfflineQueue(config['OFFLINE_QUEUE_FILE'], config['OFFLINE_QUEUE_MAX_BYTES'])
+            ntp = fw.NTPSync()
+            eink = None
+            if self.display and config['ENABLE_EINK_DISPLAY']:
+                spi = fw.SPI(2, baudrate=4000000, polarity=0, phase=0,
+                             sck=fw.Pin(config['EINK_CLK']), mosi=fw.Pin(config['EINK_MOSI']))
+                eink = fw.EPD(spi, fw.Pin(config['EINK_CS']), fw.Pin(config['EINK_DC']),
+                              fw.Pin(config['EINK_RST']), fw.Pin(config['EINK_BUSY']))
+                eink.init()
+                if fw.machine.reset_cause() != fw.machine.DEEPSLEEP_RESET:
+                    fw.StatusFrames(eink, config['STATUS_FRAME_DIR']).show("blank")
+            return fw.WateringSystem(hardware, wifi, firebase, ntp, eink)
+
+    # ----- running -----
+
+    def at(self, seconds, callback):
+        """Call callback(simulation) after seconds of device time (while run() runs)"""
+        clock = self.board.clock
+        clock.call_at(clock.now_us + int(seconds * 1000000), lambda: callback(self))
+
+    def run(self, seconds=None, cycles=None):
+        """
+        Run the firmware's entry point WateringSystem.run() - asyncio task
+        runtime, sequential loop or deep-sleep wakes, as CONFIG selects -
+        for seconds of device time, cycles measurement intervals or until
+        a callback (see at()) calls end_run()
+        """
+        if seconds is None and cycles is not None:
+            seconds = cycles * self.system.get_interval()
+        clock = self.board.clock
+        end = None if seconds is None else clock.now_us + int(seconds * 1000000)
+        if self.firmware.CONFIG['DEEP_SLEEP']:
+            if end is None:
+                raise ValueError("deep-sleep mode needs seconds or cycles")
+            while clock.now_us < end:
+                self.wake()
+            return
+        self._keep_alive()
+        clock.deadline_us = end
+        try:
+            with self._console():
+                self.system.run()
+        except Deadline:
+            pass
+        finally:
+            clock.deadline_us = None
+            clock.cancel(self._keep_alive_timer)
+
+    def end_run(self):
+        """Stop run() at the current device time (from a callback)"""
+        self.board.clock.deadline_us = self.board.clock.now_us
+
+    def _keep_alive(self):
+        """Stream keep-alives every 30 s of device time, like Firebase"""
+        def send():
+            self.server.keep_alive()
+            self._keep_alive()
+        clock = self.board.clock
+        self._keep_alive_timer = clock.call_at(clock.now_us + KEEP_ALIVE_US, send)
+
+    def wake(self):
+        """One deep-sleep wake cycle (RAM lost, RTC memory and flash kept)"""
+        machine = sys.modules["machine"]
+        self.system.fb.close()
+        self.system = self._build()
+        try:
+            with self._console():
+                self.system.run()
+        except machine.DeepSleep as sleep:
+            self.board.reset_cause = machine.DEEPSLEEP_RESET
+            self.board.clock.sleep_us(sleep.ms * 1000)
+            return sleep.ms
+        return None
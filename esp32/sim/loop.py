@@ -0,0 +1,69 @@
+# asyncio auf der virtuellen Uhr: die Task-Laufzeit der Firmware läuft unverändert im Simulator
+#
+# sim.install() sets a policy whose loops take their time from the
+# board's clock. When no task is ready and no socket has data, the loop
+# does not wait but moves the clock to the next timer (pump timers and
+# other board timers fire on the way). Sockets stay real: the HTTP
+# client and the event streams talk to the local Firebase stand-in.
+# A connect or a request on the wire is waited for in host time, so a
+# round trip costs no device time - like the blocking HTTP client - and
+# runs are reproducible.
+import asyncio
+import math
+import selectors
+
+import sim
+
+REPLY_TIMEOUT = 1.0  # Host seconds to wait for the stand-in before device time moves on
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    def __init__(self):
+        super().__init__()
+        self.awaiting = set()  # fds with a request sent and no data back yet
+
+    def unregister(self, fileobj):
+        key = super().unregister(fileobj)
+        self.awaiting.discard(key.fd)
+        return key
+
+    def _in_flight(self):
+        return self.awaiting or any(key.events & selectors.EVENT_WRITE for key in self.get_map().values())
+
+    def select(self, timeout=None):
+        ready = super().select(0)
+        if not ready and timeout != 0 and self._in_flight():
+            ready = super().select(REPLY_TIMEOUT)
+        for key, events in ready:
+            if events & selectors.EVENT_READ:
+                self.awaiting.discard(key.fd)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            return super().select(None)  # Only sockets to wait for
+        sim.board().clock.sleep_us(math.ceil(timeout * 1000000))  # Up: the timer must be due
+        return super().select(0)
+
+
+class VirtualLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        super().__init__(VirtualSelector())
+
+    def time(self):
+        return sim.board().clock.now_us / 1000000
+
+    def _make_socket_transport(self, sock, *args, **kwargs):
+        transport = super()._make_socket_transport(sock, *args, **kwargs)
+        write = transport.write
+        fd = sock.fileno()
+
+        def write_request(data):
+            self._selector.awaiting.add(fd)
+            write(data)
+        transport.write = write_request
+        return transport
+
+
+class VirtualLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    def new_event_loop(self):
+        return VirtualLoop()
@@ -0,0 +1,212 @@
+# Ersatz für das MicroPython-Modul machine (Pin, ADC, SPI, Timer, RTC, ...)
+import calendar
+import sim
+from sim.board import UNIX_2000
+
+PWRON_RESET = 1
+HARD_RESET = 2
+WDT_RESET = 3
+DEEPSLEEP_RESET = 4
+SOFT_RESET = 5
+
+
+class DeepSleep(BaseException):
+    """Raised by deepsleep() - the harness catches it and wakes the board later"""
+    def __init__(self, ms):
+        super().__init__(ms)
+        self.ms = ms
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None, **kwargs):
+        self.id = id
+        self.init(mode, pull, value, **kwargs)
+
+    def init(self, mode=-1, pull=-1, value=None, hold=None, **kwargs):
+        state = sim.board().pin(self.id)
+        if mode != -1:
+            state.mode = mode
+        if hold is not None:
+            state.hold = hold
+        if value is not None:
+            sim.board().write_pin(self.id, value)
+
+    def value(self, value=None):
+        if value is None:
+            return sim.board().pin(self.id).value
+        sim.board().write_pin(self.id, value)
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_RISING | IRQ_FALLING, **kwargs):
+        state = sim.board().pin(self.id)
+        state.irq_handler = handler
+        state.irq_trigger = trigger
+        state.pin = self
+
+    def __repr__(self):
+        return f"Pin({self.id})"
+
+
+class ADC:
+    ATTN_0DB = 0
+    ATTN_2_5DB = 1
+    ATTN_6DB = 2
+    ATTN_11DB = 3
+    WIDTH_12BIT = 3
+
+    def __init__(self, pin, atten=None):
+        self.pin = pin
+
+    def atten(self, atten):
+        pass
+
+    def width(self, width):
+        pass
+
+    def read_uv(self):
+        return sim.board().adc_mv(self.pin.id) * 1000
+
+    def read(self):
+        return min(4095, sim.board().adc_mv(self.pin.id) * 4095 // 3100)
+
+    def read_u16(self):
+        return self.read() * 65535 // 4095
+
+
+class SPI:
+    def __init__(self, id, baudrate=1000000, **kwargs):
+        self.id = id
+        self.baudrate = baudrate
+
+    def init(self, baudrate=None, **kwargs):
+        if baudrate:
+            self.baudrate = baudrate
+
+    def write(self, buf):
+        board = sim.board()
+        board.spi_write(bytes(buf))
+        board.clock.advance(len(buf) * 8 * 1000000 // self.baudrate)
+
+    def deinit(self):
+        pass
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self.id = id
+        self.entry = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=None):
+        self.deinit()
+        if freq:
+            period = 1000 // freq
+        clock = sim.board().clock
+
+        def fire():
+            if mode == Timer.PERIODIC:
+                self.entry = clock.call_at(clock.now_us + period * 1000, fire)
+            else:
+                self.entry = None
+            if callback:
+                callback(self)
+
+        self.entry = clock.call_at(clock.now_us + period * 1000, fire)
+
+    def deinit(self):
+        if self.entry is not None:
+            sim.board().clock.cancel(self.entry)
+            self.entry = None
+
+
+class RTC:
+    def datetime(self, datetimetuple=None):
+        """(year, month, day, weekday, hours, minutes, seconds, subseconds)"""
+        board = sim.board()
+        if datetimetuple is None:
+            tm = sim.device_gmtime(board.device_time())
+            return (tm[0], tm[1], tm[2], tm[6], tm[3], tm[4], tm[5], 0)
+        year, month, day, _, hours, minutes, seconds = datetimetuple[:7]
+        board.set_device_time(calendar.timegm((year, month, day, hours, minutes, seconds, 0, 0, 0)) - UNIX_2000)
+
+    def memory(self, data=None):
+        board = sim.board()
+        if data is None:
+            return board.rtc_memory
+        if len(data) > 2048:
+            raise ValueError("buffer too long")
+        board.rtc_memory = bytes(data)
+
+
+class WDT:
+    def __init__(self, id=0, timeout=5000):
+        self.timeout = timeout
+
+    def feed(self):
+        pass
+
+
+def time_pulse_us(pin, pulse_level, timeout_us=1000000):
+    """Echo width from the board's tank model; -2 / -1 on timeout like the C version"""
+    board = sim.board()
+    width = board.echo_pulse_us()
+    if width is None:
+        board.clock.advance(timeout_us)
+        return -2
+    board.clock.advance(min(width, timeout_us) + 150)  # Trigger to echo start
+    return width if width <= timeout_us else -1
+
+
+def deepsleep(ms=0):
+    raise DeepSleep(ms)
+
+
+def lightsleep(ms=0):
+    sim.board().clock.sleep_us(ms * 1000)
+
+
+def reset_cause():
+    return sim.board().reset_cause
+
+
+def reset():
+    raise DeepSleep(0)
+
+
+def freq(hz=None):
+    return 240000000
+
+
+def unique_id():
+    return b"\x5e\x1a\x00\x00\x00\x01"
+
+
+def idle():
+    sim.board().clock.sleep_us(1000)
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
@@ -0,0 +1,30 @@
+# Ersatz für das Modul micropython (const, schedule, ...)
+
+
+def const(value):
+    return value
+
+
+def schedule(func, arg):
+    # On the device this runs soon after the IRQ; here right away
+    func(arg)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def mem_info(verbose=False):
+    import gc
+    print(f"mem: total={gc.mem_alloc() + gc.mem_free()}, current={gc.mem_alloc()}, peak={gc.mem_alloc()}")
+
+
+def opt_level(level=None):
+    return 0
+
+
+def native(func):
+    return func
+
+
+viper = native
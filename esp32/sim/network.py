@@ -0,0 +1,55 @@
+# Ersatz für das MicroPython-Modul network (nur WLAN im Station-Modus)
+import sim
+
+STA_IF = 0
+AP_IF = 1
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+STAT_NO_AP_FOUND = 201
+
+
+class WLAN:
+    def __init__(self, interface_id=STA_IF):
+        self.interface_id = interface_id
+        self._active = False
+        self.ssid = None
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        if not self._active:
+            sim.board().wlan_connected = False
+
+    def connect(self, ssid=None, key=None, **kwargs):
+        board = sim.board()
+        self.ssid = ssid
+        board.clock.advance(1500000)  # Association + DHCP
+        board.wlan_connected = self._active and board.wifi_up()
+
+    def disconnect(self):
+        sim.board().wlan_connected = False
+
+    def isconnected(self):
+        return sim.board().network_up()
+
+    def status(self, param=None):
+        if param == "rssi":
+            return -60
+        return STAT_GOT_IP if self.isconnected() else STAT_NO_AP_FOUND
+
+    def ifconfig(self, config=None):
+        if self.isconnected():
+            return ("192.168.1.50", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+        return ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+
+    def config(self, *args, **kwargs):
+        if args == ("mac",):
+            return b"\x5e\x1a\x00\x00\x00\x01"
+        if args == ("essid",):
+            return self.ssid
+        return None
+
+    def scan(self):
+        return [(b"SimAP", b"\x00" * 6, 6, -60, 3, False)] if sim.board().wifi_up() else []
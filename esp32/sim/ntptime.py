@@ -0,0 +1,20 @@
+# Ersatz für ntptime: stellt die RTC auf die Uhrzeit der simulierten Welt
+import sim
+from sim.board import UNIX_2000
+
+host = "pool.ntp.org"
+timeout = 1
+
+
+def time():
+    """NTP time in seconds since 2000 (MicroPython epoch)"""
+    board = sim.board()
+    board.clock.advance(30000)  # One UDP round trip
+    if not board.ntp_up():
+        board.clock.advance(timeout * 1000000)
+        raise OSError(116, "ETIMEDOUT")
+    return int(board.unix_time()) - UNIX_2000
+
+
+def settime():
+    sim.board().set_device_time(time())
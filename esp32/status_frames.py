@@ -0,0 +1,61 @@
+# Status-Bilder für das E-Ink Display: einmal rendern, als Rohdaten im Flash ablegen
+#
+# The display only ever shows one of a few fixed frames. Each is rendered
+# once, stored in panel format (see EPD.write_frame_file) and afterwards
+# streamed from flash straight into the SPI upload - a status change
+# needs no drawing and no 10 KB frame buffers.
+import os
+from epaper1in54b import FRAME_FILE_SIZE, RED_BLANK, WHITE
+
+# Bump when the drawing below changes - old files are then re-rendered
+FRAME_VERSION = 2
+STATUSES = ("blank", "ok", "warning", "error")
+
+
+class StatusFrames:
+    def __init__(self, eink, directory="/frames"):
+        self.eink = eink
+        self.directory = directory
+        self.renders = 0  # Frames rendered (cache misses)
+
+    def path(self, status):
+        return f"{self.directory}/status_{status}_v{FRAME_VERSION}.bin"
+
+    def is_cached(self, status):
+        try:
+            return os.stat(self.path(status))[6] == FRAME_FILE_SIZE
+        except OSError:
+            return False
+
+    def render(self, status):
+        """Draw a status frame -> (black plane, red plane)"""
+        frame_black = bytearray([WHITE]) * 5000
+        frame_red = bytearray([RED_BLANK]) * 5000
+
+        # Draw circle (center: 100,100, radius: 40)
+        if status == "ok":
+            self.eink.draw_filled_circle(frame_black, 100, 100, 40, 1)  # Black
+        elif status != "blank":
+            self.eink.draw_filled_circle(frame_red, 100, 100, 40, 1)  # Red
+        return frame_black, frame_red
+
+    def _store(self, status, frame_black, frame_red):
+        try:
+            os.mkdir(self.directory)
+        except OSError:
+            pass  # Already exists
+        self.eink.write_frame_file(self.path(status), frame_black, frame_red)
+
+    def show(self, status, wait=True):
+        """Display a status frame (rendered on first use only)"""
+        if self.is_cached(status):
+            self.eink.display_frame_file(self.path(status), wait)
+            return
+        frame_black, frame_red = self.render(status)
+        self.renders += 1
+        try:
+            self._store(status, frame_black, frame_red)
+            print(f"✓ Status frame cached: {status}")
+        except OSError as e:
+            print(f"⚠ Status frame not cached: {e}")
+        self.eink.display_frame(frame_black, frame_red, wait)
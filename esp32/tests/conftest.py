@@ -0,0 +1,7 @@
+# Host-Tests (CPython + sim/): im Ordner esp32/ mit "python -m pytest tests" starten
+import os
+import sys
+
+ESP32_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ESP32_DIR not in sys.path:
+    sys.path.insert(0, ESP32_DIR)
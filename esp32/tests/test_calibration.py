@@ -0,0 +1,102 @@
+# Kalibrierkurven: Lookup-Tabelle gegen lineare Interpolation, Prüfung, Erfassen (calibration.py)
+import os
+import shutil
+import tempfile
+import unittest
+
+from calibration import STEP_SHIFT, TABLE_SIZE, MoistureCalibration, compile_curve, validate_curve
+
+
+def interpolate(points, mv):
+    """Reference: float piecewise-linear interpolation, ends held"""
+    points = sorted(points)
+    if mv <= points[0][0]:
+        return points[0][1]
+    if mv >= points[-1][0]:
+        return points[-1][1]
+    for (mv0, p0), (mv1, p1) in zip(points, points[1:]):
+        if mv <= mv1:
+            return p0 + (p1 - p0) * (mv - mv0) / (mv1 - mv0)
+
+
+class CompileCurveTest(unittest.TestCase):
+    def assert_matches(self, points):
+        table = compile_curve(points)
+        self.assertEqual(len(table), TABLE_SIZE)
+        half = 1 << (STEP_SHIFT - 1)
+        for i in range(TABLE_SIZE):
+            expected = interpolate(points, (i << STEP_SHIFT) + half)
+            self.assertLessEqual(abs(table[i] - expected), 0.5 + 1e-9, f"bucket {i}")
+
+    def test_two_point_curve(self):
+        self.assert_matches([[3100, 0], [910, 100]])
+
+    def test_piecewise_curve(self):
+        self.assert_matches([[3000, 0], [2200, 35], [1500, 80], [1000, 100]])
+
+    def test_rising_curve(self):
+        self.assert_matches([[500, 10], [2500, 90]])
+
+    def test_ends_held(self):
+        table = compile_curve([[2500, 20], [1500, 70]])
+        self.assertEqual(table[0], 70)
+        self.assertEqual(table[-1], 20)
+
+
+class ValidateCurveTest(unittest.TestCase):
+    def test_rejected(self):
+        for points in ([], [[1000, 50]], [[1000, 0], [1000, 100]],
+                       [[5000, 0], [1000, 100]], [[3000, 0], [1000, 101]]):
+            with self.assertRaises(ValueError, msg=points):
+                validate_curve(points)
+
+    def test_accepted(self):
+        validate_curve([[0, 0], [4095, 100]])
+
+
+class MoistureCalibrationTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.calibration = MoistureCalibration(4, path=os.path.join(self.dir, "calibration.json"))
+
+    def test_default_line(self):
+        self.assertEqual(self.calibration.percent(0, 3100), 0)
+        self.assertEqual(self.calibration.percent(0, 910), 100)
+        self.assertEqual(self.calibration.percent(3, 2005), 50)
+        self.assertEqual(self.calibration.percent(0, 4095), 0)
+
+    def test_set_curve_only_changes_its_channel(self):
+        self.calibration.set_curve(1, [[1000, 100], [2800, 0]])
+        self.assertEqual(self.calibration.percent(1, 1900), 50)
+        self.assertEqual(self.calibration.percent(0, 1900), 55)
+        self.assertEqual(self.calibration.spans[1], 1800)
+
+    def test_apply_skips_invalid_curves(self):
+        self.calibration.apply([None, [[1000, 0]], [[2600, 0], [1200, 100]], "x"])
+        self.assertEqual(self.calibration.curves[1], self.calibration.default)
+        self.assertEqual(self.calibration.curves[2], [[1200, 100], [2600, 0]])
+        self.assertEqual(self.calibration.curves[3], self.calibration.default)
+
+    def test_capture(self):
+        self.calibration.capture(0, 2900, 0)  # Dry air
+        self.assertEqual(self.calibration.curves[0], [[910, 100], [2900, 0]])
+        self.calibration.capture(0, 1100, 100)  # Glass of water
+        self.calibration.capture(0, 1800, 60)  # Reference in between
+        self.assertEqual(self.calibration.curves[0], [[1100, 100], [1800, 60], [2900, 0]])
+        self.assertEqual(self.calibration.percent(0, 1800), 60)
+
+    def test_save_load(self):
+        self.calibration.set_curve(2, [[2700, 0], [1600, 70], [1000, 100]])
+        self.assertTrue(self.calibration.save())
+        loaded = MoistureCalibration(4, path=self.calibration.path)
+        self.assertTrue(loaded.load())
+        self.assertEqual(loaded.curves[2], [[1000, 100], [1600, 70], [2700, 0]])
+        self.assertEqual(loaded.tables, self.calibration.tables)
+
+    def test_load_without_file(self):
+        self.assertFalse(self.calibration.load())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# DHT11-Cache: kein Warten auf die Mindestpause, Fehlversuche mit dem letzten Wert überbrückt (hardware.py)
+import unittest
+
+from sim import Board
+from sim.harness import Simulation
+
+
+class DHTReadTest(unittest.TestCase):
+    def setUp(self):
+        simulation = Simulation(Board(), display=False)
+        simulation.start()
+        self.addCleanup(simulation.stop)
+        self.board = simulation.board
+        self.hw = simulation.system.hw
+
+    def later(self, ms):
+        self.board.clock.sleep_us(ms * 1000)
+
+    def test_too_soon_returns_cache_without_waiting(self):
+        first = self.hw.read_dht11(max_age_ms=0)
+        reads = self.board.dht_reads
+        start = self.board.clock.now_us
+        self.assertEqual(self.hw.read_dht11(max_age_ms=0), first)
+        self.assertLess(self.board.clock.now_us - start, 1000)  # No sleep
+        self.assertEqual(self.board.dht_reads, reads)  # No measure inside the 1 s period
+
+        self.later(1000)
+        self.hw.read_dht11(max_age_ms=0)
+        self.assertEqual(self.board.dht_reads, reads + 1)
+
+    def test_failures_bridged_up_to_retries(self):
+        good = self.hw.read_dht11()
+        self.board.dht_fail_rate = lambda t: 1.0
+        for _ in range(self.hw.dht_retries):
+            self.later(10000)
+            self.assertEqual(self.hw.read_dht11(), good)
+        self.later(10000)
+        with self.assertRaises(Exception):
+            self.hw.read_dht11()
+
+        self.board.dht_fail_rate = lambda t: 0.0
+        self.later(10000)
+        self.hw.read_dht11()
+        self.assertEqual(self.hw.dht_failures, 0)
+
+    def test_not_ready_without_reading(self):
+        self.board.dht_fail_rate = lambda t: 1.0
+        with self.assertRaises(Exception):
+            self.hw.read_dht11()
+        start = self.board.clock.now_us
+        with self.assertRaises(Exception):
+            self.hw.read_dht11()  # Within the period: fails at once, no sleep
+        self.assertLess(self.board.clock.now_us - start, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
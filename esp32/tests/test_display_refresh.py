@@ -0,0 +1,30 @@
+# Hintergrund-Refresh des E-Paper: Panel aus, bevor die Schleife bzw. die CPU schläft
+import unittest
+
+from sim import Board
+from sim.harness import Simulation
+
+
+def panel_state(simulation):
+    eink = simulation.system.eink
+    return eink.refreshing, eink.powering_down, eink.asleep
+
+
+class DisplayRefreshTest(unittest.TestCase):
+    def test_sequential_sleep_finishes_refresh(self):
+        with Simulation(Board(), config={'USE_ASYNCIO': False}) as simulation:
+            states = []
+            simulation.at(60, lambda simulation: states.append(panel_state(simulation)))
+            simulation.run(seconds=90)  # First cycle, then a minute into the sleep
+            self.assertGreaterEqual(simulation.board.refreshes, 1)
+            self.assertEqual(states, [(False, False, True)])  # Not left for the next cycle
+
+    def test_deep_sleep_waits_for_refresh(self):
+        with Simulation(Board(), config={'DEEP_SLEEP': True}) as simulation:
+            simulation.wake()
+            self.assertGreaterEqual(simulation.board.refreshes, 1)
+            self.assertEqual(panel_state(simulation), (False, False, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# Fehler-Deduplizierung: Zählen, Backoff beim erneuten Senden, Auflösen (error_reporter.py)
+import unittest
+
+from error_reporter import ErrorReporter
+
+
+class FakeSystem:
+    def __init__(self):
+        self.now_ms = 1780000000000
+
+    def get_timestamp(self):
+        return self.now_ms
+
+
+class FakeFirebase:
+    """Records write_error() calls instead of sending them"""
+    def __init__(self):
+        self.system = FakeSystem()
+        self.sent = []  # (key, body)
+        self.ids = 0
+
+    def push_id(self, now_ms):
+        self.ids += 1
+        return f"-Id{self.ids}"
+
+    def write_error(self, key, body):
+        self.sent.append((key, body))
+
+
+class ErrorReporterTest(unittest.TestCase):
+    def setUp(self):
+        self.fb = FakeFirebase()
+        self.reporter = ErrorReporter(self.fb, min_interval=600, max_interval=2400)
+
+    def at(self, seconds, message="no reading"):
+        """Report the DHT fault seconds after the start"""
+        self.fb.system.now_ms = 1780000000000 + seconds * 1000
+        self.reporter.report("sensor", "DHT11", message)
+
+    def test_repeats_counted_not_sent(self):
+        for seconds in range(0, 600, 60):
+            self.at(seconds)
+        self.assertEqual(len(self.fb.sent), 1)
+        self.assertEqual(self.reporter.suppressed, 9)
+        self.assertEqual(self.reporter.faults[("DHT11", "sensor")]["count"], 10)
+
+    def test_resend_interval_doubles_up_to_max(self):
+        sent_at = []
+        for seconds in range(0, 9000, 60):
+            before = len(self.fb.sent)
+            self.at(seconds)
+            if len(self.fb.sent) > before:
+                sent_at.append(seconds)
+        self.assertEqual(sent_at, [0, 600, 1800, 4200, 6600])  # +600, +1200, then max 2400
+        keys = {key for key, body in self.fb.sent}
+        self.assertEqual(keys, {"-Id1"})  # One entry per fault state, updated in place
+        self.assertEqual(self.fb.sent[-1][1]["count"], 6600 // 60 + 1)
+
+    def test_changed_message_sent_at_once(self):
+        self.at(0)
+        self.at(60, "timeout")
+        self.assertEqual(len(self.fb.sent), 2)
+        self.assertEqual(self.fb.sent[-1][1]["message"], "timeout")
+        self.assertEqual(self.reporter.faults[("DHT11", "sensor")]["interval"], 600)  # No backoff
+
+    def test_faults_kept_apart(self):
+        self.at(0)
+        self.reporter.report("sensor", "Moisture Sensor 1", "out of range")
+        self.reporter.report("timeout", "DHT11", "slow")
+        self.assertEqual([key for key, body in self.fb.sent], ["-Id1", "-Id2", "-Id3"])
+
+    def test_resolve(self):
+        self.at(0)
+        self.at(60)
+        self.reporter.resolve("sensor", "DHT11")
+        key, body = self.fb.sent[-1]
+        self.assertEqual(key, "-Id1")
+        self.assertTrue(body["resolved"])
+        self.assertEqual(body["count"], 2)
+        self.assertFalse(self.reporter.is_active("sensor", "DHT11"))
+
+        self.reporter.resolve("sensor", "DHT11")  # Already resolved: nothing sent
+        self.assertEqual(len(self.fb.sent), 2)
+        self.at(120)  # Comes back: new fault state, new entry
+        self.assertEqual(self.fb.sent[-1][0], "-Id2")
+
+    def test_state_round_trip(self):
+        self.at(0)
+        self.at(600)
+        restored = ErrorReporter(self.fb, min_interval=600, max_interval=2400)
+        restored.restore_state(self.reporter.get_state())
+        self.assertEqual(restored.faults, self.reporter.faults)
+        self.reporter = restored
+        self.at(1200)  # Backoff carried over deep sleep: next resend at 1800
+        self.assertEqual(len(self.fb.sent), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
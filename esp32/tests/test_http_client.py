@@ -0,0 +1,128 @@
+# Keep-Alive/Pipelining: HTTPClient gegen einen lokalen Stand-in-Server
+import socket
+import threading
+import unittest
+
+from http_client import HTTPClient
+
+
+class PipelineServer:
+    """
+    Answers each request with its path as body. plan[n] = (answers, close_header)
+    for the n-th connection: after that many responses the server closes it,
+    announced with Connection: close or not. Later connections stay open.
+    """
+    def __init__(self, plan=()):
+        self.plan = list(plan)
+        self.requests = []  # (connection index, method, path)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(4)
+        self.port = self.sock.getsockname()[1]
+        self.connections = 0
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def stop(self):
+        self.sock.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            n = self.connections
+            self.connections += 1
+            answers, close_header = self.plan[n] if n < len(self.plan) else (None, False)
+            threading.Thread(target=self._handle, args=(conn, n, answers, close_header),
+                             daemon=True).start()
+
+    def _handle(self, conn, n, answers, close_header):
+        conn.settimeout(5)
+        stream = conn.makefile("rwb")
+        answered = 0
+        try:
+            while answers is None or answered < answers:
+                request = stream.readline()
+                if not request:
+                    return
+                length = 0
+                while True:
+                    line = stream.readline()
+                    if not line or line == b"\r\n":
+                        break
+                    name, _, value = line.decode().partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                stream.read(length)
+                method, path, _ = request.decode().split(" ")
+                self.requests.append((n, method, path))
+                answered += 1
+                last = answers is not None and answered == answers
+                headers = b"Connection: close\r\n" if last and close_header else b""
+                stream.write(b"HTTP/1.1 200 OK\r\n" + headers
+                             + b"Content-Length: %d\r\n\r\n" % len(path) + path.encode())
+                stream.flush()
+            # Lingering close: drain the rest so the client gets a FIN, not a reset
+            conn.shutdown(socket.SHUT_WR)
+            while stream.read(1024):
+                pass
+        except OSError:
+            pass
+        finally:
+            stream.close()
+            conn.close()
+
+
+class HTTPClientTest(unittest.TestCase):
+    def client(self, plan=()):
+        server = PipelineServer(plan)
+        self.addCleanup(server.stop)
+        client = HTTPClient("127.0.0.1", server.port, use_ssl=False, timeout=5)
+        self.addCleanup(client.close)
+        return server, client
+
+    def paths(self, responses):
+        return [body.decode() for status, body in responses]
+
+    def test_keep_alive_and_pipeline(self):
+        server, client = self.client()
+        self.assertEqual(client.request("GET", "/a"), (200, b"/a"))
+        responses = client.pipeline([("GET", "/b", None, None), ("PUT", "/c", "{}", None),
+                                     ("GET", "/d", None, None)])
+        self.assertEqual(self.paths(responses), ["/b", "/c", "/d"])
+        self.assertEqual(client.connects, 1)
+        self.assertEqual([r[1:] for r in server.requests],
+                         [("GET", "/a"), ("GET", "/b"), ("PUT", "/c"), ("GET", "/d")])
+
+    def pipeline_closed_after_first(self, close_header):
+        server, client = self.client([(1, close_header)])
+        responses = client.pipeline([("GET", path, None, None) for path in ("/a", "/b", "/c")])
+        self.assertEqual(self.paths(responses), ["/a", "/b", "/c"])
+        self.assertEqual(client.connects, 2)
+        # Answered request not sent again, only the unanswered ones
+        self.assertEqual([(n, path) for n, _, path in server.requests],
+                         [(0, "/a"), (1, "/b"), (1, "/c")])
+
+    def test_connection_close_mid_pipeline(self):
+        self.pipeline_closed_after_first(True)
+
+    def test_dropped_mid_pipeline(self):
+        self.pipeline_closed_after_first(False)
+
+    def test_stale_keep_alive_reconnects_once(self):
+        server, client = self.client([(1, False)])
+        client.request("GET", "/a")
+        self.assertEqual(client.request("GET", "/b"), (200, b"/b"))
+        self.assertEqual(client.connects, 2)
+
+    def test_fresh_connection_without_response_raises(self):
+        server, client = self.client([(0, False)])
+        with self.assertRaises(OSError):
+            client.request("GET", "/a")
+        self.assertEqual(client.connects, 1)
+        self.assertIsNone(client.sock)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+# Offline-Queue auf dem Flash: CRC, abgerissenes Ende, Resync und Lesezeiger (offline_queue.py)
+import os
+import shutil
+import tempfile
+import unittest
+
+from offline_queue import (HEADER_SIZE, CRC_SIZE, KEY_SIZE, KIND_ERROR, KIND_HISTORY,
+                           KIND_TEST, OfflineQueue)
+
+HISTORY = {"timestamp": 1780000000000, "plantMoisture": [41.2, 55.0, 0.0, 100.0],
+           "temperature": -3.5, "humidity": 45.1, "waterLevel": 66.7}
+
+
+def key(n):
+    return f"-Key{n:016d}"
+
+
+class OfflineQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "offline.q")
+
+    def queue(self, records=0, **kwargs):
+        queue = OfflineQueue(self.path, **kwargs)
+        for n in range(records):
+            self.assertTrue(queue.append(KIND_HISTORY, key(n), dict(HISTORY, timestamp=n)))
+        return queue
+
+    def record_size(self):
+        return os.path.getsize(self.path) // len(OfflineQueue(self.path))
+
+    def patch_file(self, offset, data):
+        with open(self.path, "r+b") as f:
+            f.seek(offset)
+            f.write(data)
+
+    def test_round_trip(self):
+        queue = self.queue()
+        queue.append(KIND_HISTORY, key(0), HISTORY)
+        queue.append(KIND_ERROR, key(1), {"errorType": "sensor", "count": 3})
+        queue.append(KIND_TEST, key(2), {"overall": True})
+        updates, end = queue.read_batch()
+        self.assertEqual(updates, {
+            "historicalData/" + key(0): HISTORY,
+            "systemErrors/" + key(1): {"errorType": "sensor", "count": 3},
+            "lastTest": {"overall": True},
+        })
+        queue.commit(end)
+        self.assertTrue(queue.is_empty())
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_commit_survives_reboot(self):
+        queue = self.queue(5)
+        updates, end = queue.read_batch(max_records=2)
+        self.assertEqual(len(updates), 2)
+        queue.commit(end)
+
+        queue = OfflineQueue(self.path)  # Reboot
+        self.assertEqual(len(queue), 3)
+        updates, end = queue.read_batch()
+        self.assertEqual(sorted(updates), ["historicalData/" + key(n) for n in (2, 3, 4)])
+
+    def test_torn_tail_dropped_at_boot(self):
+        self.queue(3)
+        size = os.path.getsize(self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(size - 5)  # Power loss during the third append
+
+        queue = OfflineQueue(self.path)
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(os.path.getsize(self.path), size // 3 * 2)
+        queue.append(KIND_HISTORY, key(9), HISTORY)  # Appends after the valid records
+        updates, end = queue.read_batch()
+        self.assertEqual(sorted(updates), ["historicalData/" + key(n) for n in (0, 1, 9)])
+
+    def test_crc_mismatch_dropped_at_boot(self):
+        self.queue(3)
+        record = self.record_size()
+        self.patch_file(2 * record + HEADER_SIZE + KEY_SIZE, b"\xff")
+        self.assertEqual(len(OfflineQueue(self.path)), 2)
+
+    def test_corrupt_record_at_read_position_skipped(self):
+        queue = self.queue(3)
+        record = self.record_size()
+        # Flash error in the first record after boot: recover() does not run again
+        self.patch_file(HEADER_SIZE + KEY_SIZE, b"\xff\xff")
+        updates, end = queue.read_batch()
+        self.assertEqual(updates, {})
+        self.assertEqual(end, record)  # Resync to the next valid record
+        queue.commit(end)
+        updates, end = queue.read_batch()
+        self.assertEqual(sorted(updates), ["historicalData/" + key(n) for n in (1, 2)])
+
+    def test_resync_skips_stray_magic_bytes(self):
+        queue = self.queue(2)
+        record = self.record_size()
+        self.patch_file(0, b"\x00" + b"\xa5" * (record - 1))  # Whole first record garbage
+        self.assertEqual(queue._resync(1), record)
+        self.patch_file(record, b"\x00")
+        self.assertEqual(queue._resync(1), os.path.getsize(self.path))  # None left
+
+    def test_full_queue_drops_records(self):
+        record = HEADER_SIZE + KEY_SIZE + 22 + CRC_SIZE
+        queue = self.queue(2, max_bytes=2 * record)
+        self.assertFalse(queue.append(KIND_HISTORY, key(2), HISTORY))
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual(len(queue), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+# Pumpen-Scheduler: Timer-Callback nach dem Pumpenwechsel (hardware.py)
+import unittest
+
+from sim import Board
+from sim.harness import Simulation
+
+
+class PumpTimerTest(unittest.TestCase):
+    def test_late_callback_leaves_next_pump_on(self):
+        with Simulation(Board(), display=False) as simulation:
+            hw = simulation.system.hw
+            callbacks = []
+            init = hw.pump_timer.init
+
+            def record(**kwargs):
+                callbacks.append(kwargs["callback"])
+                init(**kwargs)
+            hw.pump_timer.init = record
+
+            hw.activate_pump(0, 1)
+            simulation.board.clock.sleep_us(1000000)
+            self.assertEqual(hw.relays[0].value(), 1)  # Timer switched pump 1 off
+
+            hw.activate_pump(1, 5)  # Bookkeeping for pump 1, pump 2 starts
+            self.assertEqual(hw.active_pump, 1)
+            callbacks[0](hw.pump_timer)  # Callback of the first run delivered late
+            self.assertEqual(hw.relays[1].value(), 0)
+
+            callbacks[1](hw.pump_timer)
+            self.assertEqual(hw.relays[1].value(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+# Requests pro Messzyklus: gesunder Lauf der asyncio-Laufzeit mit Streams im Simulator
+import unittest
+
+from sim import Board
+from sim.harness import Simulation
+
+CYCLES = 3
+
+
+class RequestBudgetTest(unittest.TestCase):
+    def test_requests_per_cycle(self):
+        with Simulation(Board(), display=False) as simulation:
+            marks = []
+
+            def mark(simulation):
+                marks.append(len(simulation.server.requests))
+            # Boot (settings, first upload, streams) is over after 30 s
+            simulation.at(30, mark)
+            simulation.run(seconds=30 + CYCLES * simulation.system.get_interval())
+            first = marks[0]
+            records = simulation.server.requests[first:]
+
+            commands = simulation.firmware.COMMAND_PATHS
+            polled = [r["path"] for r in records if r["path"] in commands and not r["stream"]]
+            self.assertEqual(polled, [])  # Commands arrive by stream, no poll fallback
+            # One batched PATCH plus the settingsVersion check per cycle
+            self.assertLessEqual(simulation.server.stats(first)["requests"], 3 * CYCLES)
+
+
+if __name__ == "__main__":
+    unittest.main()
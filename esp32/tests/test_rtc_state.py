@@ -0,0 +1,135 @@
+# Deep-Sleep-Zustand: RTC-Speicher speichern/laden (rtc_state.py + main.get_state/restore_state)
+import json
+import unittest
+
+import rtc_state
+from rtc_state import HEADER_SIZE, RTC_MEMORY_SIZE, decode_state, encode_state
+from sim import Board
+from sim.harness import Simulation
+
+STATE = None
+
+
+def setUpModule():
+    """State as WateringSystem.get_state() builds it: NTP synced, DHT11 fault open"""
+    global STATE
+    with Simulation(Board(dht_fail_rate=1.0), display=False) as simulation:
+        simulation.run(cycles=1)
+        STATE = json.loads(json.dumps(simulation.system.get_state()))
+    assert STATE["faults"] and STATE["ntp"][0]
+
+
+class EncodeDecodeTest(unittest.TestCase):
+    def test_round_trip(self):
+        data = encode_state(STATE)
+        self.assertLessEqual(len(data), RTC_MEMORY_SIZE)
+        self.assertEqual(decode_state(data), STATE)
+
+    def test_oversized_state_drops_faults(self):
+        state = dict(STATE, faults={f"sensor|Moisture Sensor {i}": ["x" * 40, i] for i in range(60)})
+        self.assertGreater(len(json.dumps(state)), RTC_MEMORY_SIZE)
+        decoded = decode_state(encode_state(state))
+        self.assertNotIn("faults", decoded)
+        self.assertEqual(decoded["lastWatered"], STATE["lastWatered"])
+
+    def test_too_large_without_optional_keys(self):
+        with self.assertRaises(ValueError):
+            encode_state({"lastWatered": "x" * RTC_MEMORY_SIZE})
+
+    def test_crc_mismatch(self):
+        data = bytearray(encode_state(STATE))
+        data[HEADER_SIZE + 5] ^= 0x01  # One flipped bit in the payload
+        self.assertIsNone(decode_state(bytes(data)))
+
+    def test_truncated(self):
+        data = encode_state(STATE)
+        self.assertIsNone(decode_state(data[:-1]))
+        self.assertIsNone(decode_state(data[:HEADER_SIZE - 1]))
+
+    def test_empty_or_uninitialised_memory(self):
+        self.assertIsNone(decode_state(None))
+        self.assertIsNone(decode_state(b""))
+        self.assertIsNone(decode_state(bytes(RTC_MEMORY_SIZE)))  # Zeroed after power-on
+        self.assertIsNone(decode_state(b"\xff" * RTC_MEMORY_SIZE))
+
+    def test_wrong_magic(self):
+        data = encode_state(STATE)
+        self.assertIsNone(decode_state(b"XXXX" + data[4:]))
+
+
+class MemoryRTC:
+    def __init__(self, data=b""):
+        self.data = data
+
+    def memory(self, data=None):
+        if data is None:
+            return self.data
+        self.data = bytes(data)
+
+
+class RTCStateTest(unittest.TestCase):
+    def test_save_load_clear(self):
+        rtc = MemoryRTC()
+        state = rtc_state.RTCState(rtc)
+        self.assertIsNone(state.load())
+        self.assertTrue(state.save(STATE))
+        self.assertEqual(state.load(), STATE)
+        state.clear()
+        self.assertIsNone(state.load())
+
+    def test_save_failure_keeps_running(self):
+        state = rtc_state.RTCState(MemoryRTC())
+        self.assertFalse(state.save({"lastWatered": "x" * RTC_MEMORY_SIZE}))
+
+
+class DeepSleepWakeTest(unittest.TestCase):
+    """get_state() -> RTC memory -> restore_state() across simulated wake cycles"""
+
+    def setUp(self):
+        # Plant 1 dry: the first wake waters it, the timestamp must survive the sleep
+        self.board = Board(moisture_mv=(2900, 2000, 2000, 2000))
+        self.simulation = Simulation(self.board, config={'DEEP_SLEEP': True}, display=False).start()
+
+    def tearDown(self):
+        self.simulation.stop()
+
+    def test_cold_start_then_restore(self):
+        self.assertEqual(self.board.rtc_memory, b"")
+        self.assertIsNotNone(self.simulation.wake())
+        self.assertIn("Cold start", self.simulation.output.getvalue())
+
+        saved = decode_state(self.board.rtc_memory)
+        self.assertIsNotNone(saved)
+        self.assertGreater(saved["lastWatered"][0], 0)
+        self.assertGreater(saved["lastHistoricalSave"], 0)
+
+        self.simulation.wake()
+        self.assertIn("State restored from RTC memory", self.simulation.output.getvalue())
+        system = self.simulation.system
+        self.assertEqual(system.last_historical_save, saved["lastHistoricalSave"])
+        self.assertEqual(system.get_state()["lastErrorTrim"], saved["lastErrorTrim"])
+
+    def test_one_settings_sync_per_wake(self):
+        self.simulation.wake()
+        first = len(self.simulation.server.requests)
+        self.simulation.wake()
+        paths = [r["path"] for r in self.simulation.server.requests[first:]]
+        self.assertEqual(paths.count("settingsVersion"), 1)
+
+    def test_metrics_window_spans_wakes(self):
+        self.simulation.wake()
+        self.assertTrue(decode_state(self.board.rtc_memory)["metrics"][0])  # Span counts saved
+        self.simulation.wake()
+        metrics = self.simulation.system.metrics
+        cycle = metrics.index["cycle"]
+        self.assertEqual(metrics.count[cycle], 2)  # Not reset by the wake
+
+    def test_corrupt_memory_is_a_cold_start(self):
+        self.board.rtc_memory = b"\x00" * 64
+        self.simulation.wake()
+        self.assertIn("Cold start", self.simulation.output.getvalue())
+        self.assertIsNotNone(decode_state(self.board.rtc_memory))
+
+
+if __name__ == "__main__":
+    unittest.main()
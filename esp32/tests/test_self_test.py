@@ -0,0 +1,68 @@
+# Selbsttest ohne Blockieren: asyncio, Schleife und Deep-Sleep-Modus im Simulator
+import unittest
+
+from rtc_state import decode_state
+from sim import Board
+from sim.harness import DEFAULT_SETTINGS, Simulation
+
+
+def trigger(simulation):
+    stamp = simulation.board.unix_time() * 1000
+    simulation.server.set("manualTest", {"trigger": True, "timestamp": stamp})
+
+
+class LoopSelfTest:
+    """The running loop keeps its cycles going while the test soaks"""
+    config = {}
+
+    def test_cycle_does_not_wait_for_the_test(self):
+        data = {"settings": dict(DEFAULT_SETTINGS, measurementInterval=20), "settingsVersion": 1}
+        with Simulation(Board(), data=data, config=self.config) as simulation:
+            uploads = []  # Batch PATCHes sent while the test was running
+
+            def poll(simulation):
+                if simulation.system.self_test is not None:
+                    uploads.append(sum(1 for r in simulation.server.requests if r["method"] == "PATCH"))
+                simulation.at(1, poll)
+
+            trigger(simulation)
+            simulation.at(1, poll)
+            simulation.run(seconds=150)
+
+            self.assertGreater(len(uploads), 50)  # Test ran for its ~70 s soak window
+            self.assertGreaterEqual(uploads[-1] - uploads[0], 2)  # Cycles went on meanwhile
+            self.assertIsNone(simulation.system.self_test)
+            result = simulation.server.get("lastTest")
+            self.assertFalse(result["running"])
+            self.assertTrue(result["overall"])
+            self.assertEqual(len(result["moistureSensors"]), 4)
+
+
+class AsyncioSelfTest(LoopSelfTest, unittest.TestCase):
+    pass
+
+
+class SequentialSelfTest(LoopSelfTest, unittest.TestCase):
+    config = {'USE_ASYNCIO': False}
+
+
+class DeepSleepSelfTest(unittest.TestCase):
+    def test_finished_on_a_later_wake(self):
+        with Simulation(Board(), config={'DEEP_SLEEP': True}, display=False) as simulation:
+            simulation.wake()
+            trigger(simulation)
+            slept_ms = simulation.wake()  # Starts the test, sleeps through the soak window
+            saved = decode_state(simulation.board.rtc_memory)["selfTest"]
+            self.assertEqual(saved["phase"], "soak")
+            self.assertTrue(saved["result"]["dht11"]["passed"])
+            self.assertLessEqual(slept_ms, 51000)  # Woken for the end of the soak, not the interval
+
+            simulation.wake()
+            self.assertIsNone(decode_state(simulation.board.rtc_memory)["selfTest"])
+            result = simulation.server.get("lastTest")
+            self.assertFalse(result["running"])
+            self.assertTrue(result["overall"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+# Firebase-Stream (SSE): FirebaseClient.stream gegen einen lokalen Stand-in-Server
+import asyncio
+import copy
+import json
+import sys
+import unittest
+
+sys.modules.setdefault("ujson", json)  # Only the host needs this (sim.install does the same)
+
+from firebase_client import FirebaseClient, SSEParser, apply_stream_event
+
+
+def chunk(data):
+    """One chunk of a chunked transfer-encoding body"""
+    return b"%x\r\n" % len(data) + data + b"\r\n"
+
+
+def event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class StreamServer:
+    """
+    Scripted text/event-stream server: the n-th connection is answered
+    by script[n](server, writer), later ones are held open until stop().
+    """
+    def __init__(self, script):
+        self.script = script
+        self.requests = []  # (request line, headers) per connection
+        self.finished = asyncio.Event()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.url = "http://127.0.0.1:%d" % self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.finished.set()
+        self.server.close()
+
+    async def _handle(self, reader, writer):
+        request = (await reader.readline()).decode().strip()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if not line or line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+        n = len(self.requests)
+        self.requests.append((request, headers))
+        try:
+            if n < len(self.script):
+                await self.script[n](self, writer)
+            else:
+                await self.finished.wait()
+        finally:
+            writer.close()
+
+    async def send(self, writer, data):
+        writer.write(data)
+        await writer.drain()
+        await asyncio.sleep(0.01)  # Separate TCP segments: the client sees real boundaries
+
+
+async def redirect(server, writer):
+    writer.write(b"HTTP/1.1 307 Temporary Redirect\r\n"
+                 b"Location: " + server.url.encode() + b"/redirected/settings.json\r\n"
+                 b"Content-Length: 0\r\n\r\n")
+    await writer.drain()
+
+
+async def chunked_then_cancel(server, writer):
+    await server.send(writer, b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                              b"Transfer-Encoding: chunked\r\n\r\n")
+    first = event("put", {"path": "/", "data": {"a": 1, "b": {"c": 2}}})
+    # Event split inside the data line and again between \n and \n
+    await server.send(writer, chunk(first[:20]))
+    await server.send(writer, chunk(first[20:-1]))
+    await server.send(writer, b"%x;name=value\r\n" % 1 + first[-1:] + b"\r\n")
+    await server.send(writer, chunk(event("keep-alive", None)))
+    # Two events in one chunk
+    await server.send(writer, chunk(event("patch", {"path": "/b", "data": {"d": 3}})
+                                    + event("put", {"path": "/a", "data": None})))
+    await server.send(writer, chunk(event("cancel", None)))
+    await server.finished.wait()
+
+
+async def unauthorized(server, writer):
+    await server.send(writer, b"HTTP/1.1 401 Unauthorized\r\nContent-Length: 0\r\n\r\n")
+
+
+async def plain_then_auth_revoked(server, writer):
+    await server.send(writer, b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n\r\n")
+    await server.send(writer, event("put", {"path": "/", "data": {"fresh": True}}))
+    await server.send(writer, event("auth_revoked", "credential is no longer valid"))
+    await server.finished.wait()
+
+
+async def plain_then_idle(server, writer):
+    await server.send(writer, b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n\r\n")
+    await server.send(writer, event("put", {"path": "/", "data": {"x": 1}}))
+    await server.finished.wait()
+
+
+class StreamTest(unittest.TestCase):
+    def run_stream(self, script, expected, idle_timeout=5):
+        """Run client.stream until expected callbacks arrived - returns (values, server, client)"""
+        async def run():
+            server = await StreamServer(script).start()
+            client = FirebaseClient(server.url)
+            values = []
+            done = asyncio.Event()
+
+            def callback(path, value):
+                self.assertEqual(path, "settings")
+                self.assertTrue(client.streams[path])
+                values.append(copy.deepcopy(value))
+                if len(values) == expected:
+                    done.set()
+
+            task = asyncio.create_task(client.stream("settings", callback, retry_delay=0.01,
+                                                     idle_timeout=idle_timeout))
+            try:
+                await asyncio.wait_for(done.wait(), 10)
+            finally:
+                task.cancel()
+                await server.stop()
+            return values, server, client
+        return asyncio.run(run())
+
+    def test_redirect_chunked_and_reconnect(self):
+        values, server, client = self.run_stream(
+            [redirect, chunked_then_cancel, unauthorized, plain_then_auth_revoked, plain_then_idle], 5)
+        self.assertEqual(values, [
+            {"a": 1, "b": {"c": 2}},
+            {"a": 1, "b": {"c": 2, "d": 3}},  # patch
+            {"b": {"c": 2, "d": 3}},  # put null = delete
+            {"fresh": True},  # After cancel + 401: reconnected with a fresh value
+            {"x": 1},  # After auth_revoked
+        ])
+        paths = [request.split(" ")[1] for request, _ in server.requests]
+        self.assertEqual(paths, ["/settings.json", "/redirected/settings.json",
+                                 "/settings.json", "/settings.json", "/settings.json"])
+        for request, headers in server.requests:
+            self.assertTrue(request.endswith("HTTP/1.1"))
+            self.assertEqual(headers["accept"], "text/event-stream")
+
+    def test_idle_timeout_reconnects(self):
+        async def silent(server, writer):
+            await server.send(writer, b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n\r\n")
+            await server.finished.wait()  # No keep-alive: the client must give up
+
+        values, server, _ = self.run_stream([silent, plain_then_idle], 1, idle_timeout=0.2)
+        self.assertEqual(values, [{"x": 1}])
+        self.assertEqual(len(server.requests), 2)
+
+    def test_too_many_redirects(self):
+        async def run():
+            server = await StreamServer([redirect, redirect, redirect]).start()
+            client = FirebaseClient(server.url)
+            try:
+                with self.assertRaisesRegex(Exception, "too many redirects"):
+                    await client._stream_once("settings", lambda path, value: None, 5)
+            finally:
+                await server.stop()
+            self.assertFalse(client.is_streaming("settings"))
+        asyncio.run(run())
+
+
+class SSEParserTest(unittest.TestCase):
+    def test_byte_by_byte(self):
+        parser = SSEParser()
+        data = b": comment\r\nevent: put\r\ndata: {\"path\": \"/\",\r\ndata:\"data\": 1}\r\n\r\n"
+        events = []
+        for i in range(len(data)):
+            events += parser.feed(data[i:i + 1])
+        self.assertEqual(events, [("put", '{"path": "/",\n"data": 1}')])
+        self.assertEqual(parser.buffer, b"")
+
+    def test_default_event_and_keep_alive(self):
+        parser = SSEParser()
+        self.assertEqual(parser.feed(b"data: hello\n\nevent: keep-alive\ndata: null\n\n\n"),
+                         [("message", "hello"), ("keep-alive", "null")])
+
+    def test_incomplete_event_is_kept(self):
+        parser = SSEParser()
+        self.assertEqual(parser.feed(b"event: put\ndata: {}\n"), [])
+        self.assertEqual(parser.feed(b"\n"), [("put", "{}")])
+
+
+class ApplyStreamEventTest(unittest.TestCase):
+    def test_put_patch_delete(self):
+        value = apply_stream_event(None, "put", {"path": "/", "data": {"a": {"b": 1}}})
+        value = apply_stream_event(value, "put", {"path": "/a/c/d", "data": 2})
+        self.assertEqual(value, {"a": {"b": 1, "c": {"d": 2}}})
+        value = apply_stream_event(value, "patch", {"path": "/a", "data": {"b": None, "e": 3}})
+        self.assertEqual(value, {"a": {"c": {"d": 2}, "e": 3}})
+        self.assertIsNone(apply_stream_event(value, "put", {"path": "/", "data": None}))
+
+
+if __name__ == "__main__":
+    unittest.main()
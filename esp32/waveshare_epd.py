@@ -8,6 +8,12 @@ Based on Waveshare documentation for 1.54inch e-Paper Module (B)
 
 import time
 from machine import Pin, SPI
+import micropython
+import shapes
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 
 # Display resolution
 EPD_WIDTH = 200
@@ -64,6 +70,14 @@ class WaveshareEPD:
         self.width = EPD_WIDTH
         self.height = EPD_HEIGHT
         
+        # Non-blocking refresh: BUSY IRQ (falling edge = idle) finishes it,
+        # then the display goes to deep sleep until the next frame
+        self.auto_sleep = True
+        self.asleep = False
+        self.refreshing = False
+        self.powering_down = False  # POWER_OFF sent, DEEP_SLEEP still to send
+        self.busy.irq(trigger=Pin.IRQ_FALLING, handler=self._busy_irq)
+        
         print("✓ E-Ink display initialized")
     
     def _send_command(self, command):
@@ -89,6 +103,61 @@ class WaveshareEPD:
                 raise TimeoutError("E-Ink display BUSY timeout")
             time.sleep_ms(10)
     
+    def is_busy(self):
+        return self.busy.value() == 1
+    
+    def _busy_irq(self, pin):
+        """BUSY went idle - finish the refresh on the main thread"""
+        if self.refreshing:
+            try:
+                micropython.schedule(self._refresh_irq_done, 0)
+            except RuntimeError:
+                pass  # Queue full - poll() picks it up
+    
+    def _refresh_irq_done(self, _):
+        # Scheduled callback: no busy-waiting here, poll() / wait_refresh()
+        # finish the power-down on the main thread
+        if self.refreshing and not self.is_busy():
+            self._refresh_done(wait=False)
+    
+    def _refresh_done(self, wait=True):
+        if not self.refreshing:
+            return
+        self.refreshing = False
+        if self.auto_sleep:
+            self.sleep(wait)
+    
+    def poll(self):
+        """Finish a background refresh / power-down if BUSY is idle - True until done"""
+        if self.refreshing and not self.is_busy():
+            self._refresh_done(wait=False)
+        if self.powering_down and not self.is_busy():
+            self._deep_sleep()
+        return self.refreshing or self.powering_down
+    
+    def wait_refresh(self, timeout_ms=20000):
+        """Block until a running refresh (and the power-down after it) has finished"""
+        if self.refreshing:
+            self._wait_until_idle(timeout_ms)
+            self._refresh_done()
+        if self.powering_down:
+            self._wait_until_idle(timeout_ms)
+            self._deep_sleep()
+    
+    async def wait_refresh_async(self, timeout_ms=20000, poll_ms=50):
+        """Await the end of a refresh without blocking other tasks"""
+        start = time.ticks_ms()
+        while self.poll():
+            if time.ticks_diff(time.ticks_ms(), start) > timeout_ms:
+                raise TimeoutError("E-Ink display BUSY timeout")
+            await asyncio.sleep(poll_ms / 1000)
+    
+    def _wake(self):
+        """Previous refresh finished and display out of deep sleep"""
+        self.wait_refresh()
+        if self.asleep:
+            self.init()  # Deep sleep is only left through a hardware reset
+    
     def reset(self):
         """Hardware reset"""
         self.rst.value(1)
@@ -131,16 +200,20 @@ class WaveshareEPD:
         self._send_command(PLL_CONTROL)
         self._send_data(0x3C)
         
+        self.asleep = False
         print("✓ E-Ink display configured")
     
-    def display_frame(self, frame_black, frame_red):
+    def display_frame(self, frame_black, frame_red, wait=True):
         """
         Display frame on E-Ink
         
         Args:
             frame_black: bytearray for black pixels (1 = black, 0 = white)
             frame_red: bytearray for red pixels (1 = red, 0 = no red)
+            wait: False = return right after starting the refresh
+                  (finished by the BUSY IRQ, poll() or wait_refresh_async())
         """
+        self._wake()
         if frame_black:
             self._send_command(DATA_START_TRANSMISSION_1)
             for i in range(0, int(self.width * self.height / 8)):
@@ -152,7 +225,9 @@ class WaveshareEPD:
                 self._send_data(frame_red[i])
         
         self._send_command(DISPLAY_REFRESH)
-        self._wait_until_idle()
+        self.refreshing = True
+        if wait:
+            self.wait_refresh()
     
     def clear(self):
         """Clear display (all white)"""
@@ -161,46 +236,40 @@ class WaveshareEPD:
         frame_red = bytearray([0x00] * frame_size)    # No red
         self.display_frame(frame_black, frame_red)
     
-    def sleep(self):
-        """Put display in deep sleep mode"""
+    def sleep(self, wait=True):
+        """Put display in deep sleep mode (wait=False: poll() finishes it)"""
         self._send_command(POWER_OFF)
-        self._wait_until_idle()
+        self.powering_down = True
+        if wait:
+            self._wait_until_idle()
+            self._deep_sleep()
+    
+    def _deep_sleep(self):
         self._send_command(DEEP_SLEEP)
         self._send_data(0xA5)
+        self.powering_down = False
+        self.asleep = True
     
-    def draw_status_icon(self, status="ok"):
+    def draw_status_icon(self, status="ok", wait=True):
         """
         Draw simple status icon in center of display
         
         Args:
             status: "ok", "warning", or "error"
+            wait: see display_frame()
         """
         frame_size = int(self.width * self.height / 8)
-        frame_black = bytearray([0x00] * frame_size)
-        frame_red = bytearray([0x00] * frame_size)
-        
-        # Draw a simple circle (40x40 pixels) in center
-        center_x = 100
-        center_y = 100
-        radius = 20
-        
-        for y in range(center_y - radius, center_y + radius):
-            for x in range(center_x - radius, center_x + radius):
-                # Check if inside circle
-                if (x - center_x)**2 + (y - center_y)**2 <= radius**2:
-                    byte_index = (y * self.width + x) // 8
-                    bit_index = 7 - ((y * self.width + x) % 8)
-                    
-                    if status == "ok":
-                        # Black circle for OK
-                        frame_black[byte_index] |= (1 << bit_index)
-                    elif status == "warning":
-                        # Yellow (black + red) circle for warning
-                        frame_black[byte_index] |= (1 << bit_index)
-                        frame_red[byte_index] |= (1 << bit_index)
-                    elif status == "error":
-                        # Red circle for error
-                        frame_red[byte_index] |= (1 << bit_index)
+        frame_black = bytearray(frame_size)
+        frame_red = bytearray(frame_size)
         
-        self.display_frame(frame_black, frame_red)
+        # Filled circle (40x40 pixels) in center - one span per row
+        spans = shapes.circle(20)
+        if status in ("ok", "warning"):
+            # Black plane: OK, and warning (black + red = yellow)
+            shapes.fill(frame_black, self.width, self.height, 100, 100, spans)
+        if status in ("warning", "error"):
+            # Red plane: error, and warning
+            shapes.fill(frame_red, self.width, self.height, 100, 100, spans)
+        
+        self.display_frame(frame_black, frame_red, wait)
         print(f"✓ E-Ink display updated: {status}")
@@ -1,6 +1,10 @@
 # WiFi Manager mit Auto-Reconnect
 import network
 import time
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 
 class WiFiManager:
     def __init__(self, ssid, password):
@@ -18,18 +22,39 @@ class WiFiManager:
     
     def connect(self, timeout=20):
         """Connect to WiFi with timeout"""
-        if self.wlan.isconnected():
-            print(f"✓ WiFi already connected: {self.wlan.ifconfig()[0]}")
+        if self._start_connect():
             return True
         
-        print(f"→ Connecting to WiFi: {self.ssid}")
-        self.wlan.connect(self.ssid, self.password)
-        
         start_time = time.time()
         while not self.wlan.isconnected() and (time.time() - start_time) < timeout:
             time.sleep(1)
             print(".", end="")
         
+        return self._connect_result()
+    
+    async def connect_async(self, timeout=20):
+        """Like connect(), but waits with await - other tasks keep running"""
+        if self._start_connect():
+            return True
+        
+        start_time = time.time()
+        while not self.wlan.isconnected() and (time.time() - start_time) < timeout:
+            await asyncio.sleep(1)
+            print(".", end="")
+        
+        return self._connect_result()
+    
+    def _start_connect(self):
+        """Start connecting - returns True if already connected"""
+        if self.wlan.isconnected():
+            print(f"✓ WiFi already connected: {self.wlan.ifconfig()[0]}")
+            return True
+        
+        print(f"→ Connecting to WiFi: {self.ssid}")
+        self.wlan.connect(self.ssid, self.password)
+        return False
+    
+    def _connect_result(self):
         if self.wlan.isconnected():
             print(f"\n✓ WiFi connected: {self.wlan.ifconfig()[0]}")
             return True
@@ -37,24 +62,35 @@ class WiFiManager:
             print("\n✗ WiFi connection timeout")
             return False
     
-    def ensure_connection(self):
-        """
-        Ensure WiFi is connected - auto-reconnect if needed
-        Returns True if connected, False otherwise
-        """
+    def _reconnect_due(self):
+        """True if disconnected and the last check is reconnect_interval ago"""
         current_time = time.time()
         
         # Only check every reconnect_interval seconds to avoid spam
         if current_time - self.last_check < self.reconnect_interval:
-            return self.is_connected()
+            return False
         
         self.last_check = current_time
+        return not self.is_connected()
+    
+    def ensure_connection(self):
+        """
+        Ensure WiFi is connected - auto-reconnect if needed
+        Returns True if connected, False otherwise
+        """
+        if not self._reconnect_due():
+            return self.is_connected()
         
-        if not self.is_connected():
-            print("\n⚠ WiFi disconnected - attempting reconnect...")
-            return self.connect()
+        print("\n⚠ WiFi disconnected - attempting reconnect...")
+        return self.connect()
+    
+    async def ensure_connection_async(self):
+        """ensure_connection() for the task runtime (reconnect polls with await)"""
+        if not self._reconnect_due():
+            return self.is_connected()
         
-        return True
+        print("\n⚠ WiFi disconnected - attempting reconnect...")
+        return await self.connect_async()
     
     def disconnect(self):
         """Disconnect from WiFi"""
@@ -6,10 +6,11 @@ import ujson as json
 import urequests as requests
 import network
 import machine
-from machine import Pin, ADC, I2C, RTC, SPI
+from machine import Pin, ADC, I2C, RTC, SPI, Timer
 import dht
 import ntptime
-from epaper1in54b import EPD
+import os
+from epaper1in54b import EPD, FRAME_FILE_SIZE, RED_BLANK, WHITE
 
 # =============================================================================
 # CONFIGURATION - UPDATE THESE VALUES
@@ -52,6 +53,9 @@ EINK_CS = 21     # CS (Chip Select)
 EINK_DC = 18     # DC (Data/Command)
 EINK_RST = 14   # RST (Reset)
 EINK_BUSY = 46  # BUSY (Busy Signal)
+# Pre-rendered status frames on flash (rendered once, then streamed to the display)
+EINK_FRAME_DIR = "/frames"
+EINK_FRAME_VERSION = 2  # Erhöhen wenn sich das Icon ändert
 # VCC = 3.3V, GND = Ground (nicht konfigurierbar)
 
 # Water Tank Configuration (in cm)
@@ -96,6 +100,13 @@ class HardwareController:
         self.last_watered = [0, 0, 0, 0]
         self.last_pump4_run = 0
         
+        # Pump scheduler: relay ON + deadline, OFF via timer / ticks check
+        self.pump_queue = []  # [(pump_id, duration_s), ...]
+        self.active_pump = None
+        self.pump_deadline = 0  # ticks_ms
+        self.pump_timer = Timer(0)
+        self.pump_run = 0  # Counts pump starts: a late timer callback of an earlier run is ignored
+        
         print("✓ Hardware initialized")
     
     def read_moisture(self, sensor_id):
@@ -139,21 +150,76 @@ class HardwareController:
         return distance
     
     def activate_pump(self, pump_id, duration=WATERING_DURATION):
-        """Activate pump for specified duration"""
-        try:
-            print(f"→ Activating pump {pump_id + 1} for {duration}s")
-            self.relays[pump_id].value(0)  # Active LOW
-            time.sleep(duration)
+        """Queue pump for specified duration (non-blocking)"""
+        self.pump_queue.append((pump_id, duration))
+        print(f"→ Pump {pump_id + 1} queued for {duration}s")
+        self.update_pumps()
+    
+    def update_pumps(self):
+        """Stop finished pump, start next queued one - returns True while busy"""
+        if self.active_pump is not None and time.ticks_diff(time.ticks_ms(), self.pump_deadline) >= 0:
+            pump_id = self.active_pump
             self.relays[pump_id].value(1)  # OFF
+            self.active_pump = None
 
             # Store last watering time in correct UNIX UTC ms
-            unix_offset = 946684800  # seconds between 1970 and 2000
             self.last_watered[pump_id] = self.system.get_timestamp()
 
             print(f"✓ Pump {pump_id + 1} deactivated at {self.last_watered[pump_id]}")
-        except Exception as e:
-            print(f"✗ Error activating pump {pump_id}: {e}")
-            self.relays[pump_id].value(1)  # Ensure OFF on error
+        
+        if self.active_pump is None and self.pump_queue:
+            pump_id, duration = self.pump_queue.pop(0)
+            try:
+                print(f"→ Activating pump {pump_id + 1} for {duration}s")
+                self.active_pump = pump_id
+                self.pump_run += 1
+                run = self.pump_run
+                self.pump_deadline = time.ticks_add(time.ticks_ms(), int(duration * 1000))
+                self.relays[pump_id].value(0)  # Active LOW
+                self.pump_timer.init(mode=Timer.ONE_SHOT, period=max(1, int(duration * 1000)),
+                                     callback=lambda timer: self._on_pump_timer(run))
+            except Exception as e:
+                print(f"✗ Error activating pump {pump_id}: {e}")
+                self.relays[pump_id].value(1)  # Ensure OFF on error
+                self.active_pump = None
+        
+        return self.active_pump is not None or len(self.pump_queue) > 0
+    
+    def _on_pump_timer(self, run):
+        """
+        Timer callback - relay OFF only, bookkeeping happens in update_pumps().
+        A late callback after update_pumps() started the next pump has an old run: ignored.
+        """
+        if self.active_pump is not None and run == self.pump_run:
+            self.relays[self.active_pump].value(1)
+    
+    def wait_for_pumps(self, timeout=300):
+        """Block until all queued pump jobs are finished (seconds timeout)"""
+        start = time.ticks_ms()
+        while self.update_pumps():
+            if time.ticks_diff(time.ticks_ms(), start) > timeout * 1000:
+                print("⚠ Pump wait timeout - stopping all pumps")
+                self.pump_queue = []
+                try:
+                    self.pump_timer.deinit()
+                except:
+                    pass
+                for relay in self.relays:
+                    relay.value(1)  # OFF
+                self.active_pump = None
+                return False
+            time.sleep_ms(50)
+        return True
+    
+    def sleep(self, seconds):
+        """Sleep while still switching pumps off on time"""
+        end = time.ticks_add(time.ticks_ms(), int(seconds * 1000))
+        while True:
+            self.update_pumps()
+            remaining = time.ticks_diff(end, time.ticks_ms())
+            if remaining <= 0:
+                return
+            time.sleep_ms(min(remaining, 100 if self.active_pump is not None else 1000))
 
 
 # =============================================================================
@@ -631,14 +697,22 @@ class WateringSystem:
         """Draw status icon on E-Ink display (200x200 pixels)"""
         print(f"[EINK DEBUG] Starting draw for status: {status}")
         
-        # Create frame buffers (200x200 = 5000 bytes)
-        frame_black = bytearray(5000)
-        frame_red = bytearray(5000)
+        # Cached frame on flash: stream it straight to the display
+        path = f"{EINK_FRAME_DIR}/status_{status}_v{EINK_FRAME_VERSION}.bin"
+        try:
+            cached = os.stat(path)[6] == FRAME_FILE_SIZE
+        except OSError:
+            cached = False
+        if cached:
+            print(f"[EINK DEBUG] Using cached frame {path}")
+            self.eink.display_frame_file(path)
+            print(f"[EINK DEBUG] Display update complete!")
+            return
         
-        # Fill with white (0xFF = white, 0x00 = black/red depending on buffer)
-        for i in range(5000):
-            frame_black[i] = 0xFF  # Start with all white
-            frame_red[i] = 0x00    # No red initially
+        # Create frame buffers (200x200 = 5000 bytes), all white / no red
+        # (set bits are blank, colored pixels are cleared bits)
+        frame_black = bytearray([WHITE]) * 5000
+        frame_red = bytearray([RED_BLANK]) * 5000
         
         print(f"[EINK DEBUG] Buffers created and filled")
         
@@ -651,15 +725,26 @@ class WateringSystem:
         
         if status == "ok":
             # Draw black filled circle for OK status
-            # colored=0 means black (inverted logic in epaper1in54b)
+            # colored=1 clears bits in the black plane = black pixels
             print(f"[EINK DEBUG] Drawing BLACK circle (OK status)")
-            self.eink.draw_filled_circle(frame_black, center_x, center_y, radius, 0)
+            self.eink.draw_filled_circle(frame_black, center_x, center_y, radius, 1)
         else:  # warning or error
             # Draw red filled circle for warning/error
             # colored=1 means red (set pixel in red buffer)
             print(f"[EINK DEBUG] Drawing RED circle (Warning/Error status)")
             self.eink.draw_filled_circle(frame_red, center_x, center_y, radius, 1)
         
+        # Store for the next change to this status
+        try:
+            try:
+                os.mkdir(EINK_FRAME_DIR)
+            except OSError:
+                pass
+            self.eink.write_frame_file(path, frame_black, frame_red)
+            print(f"[EINK DEBUG] Frame cached: {path}")
+        except OSError as e:
+            print(f"[EINK DEBUG] Frame not cached: {e}")
+        
         print(f"[EINK DEBUG] Circle drawn, sending to display...")
         
         # Display the frame
@@ -721,6 +806,7 @@ class WateringSystem:
         for i in range(4):
             try:
                 self.hw.activate_pump(i, 1)
+                self.hw.wait_for_pumps()
                 result["pumpTests"].append(True)
                 print(f"Pump {i+1}: ✓ PASS")
             except:
@@ -852,11 +938,11 @@ class WateringSystem:
                 
                 # Sleep until next measurement
                 print(f"→ Sleeping for {interval} seconds...")
-                time.sleep(interval)
+                self.hw.sleep(interval)
                 
             except Exception as e:
                 print(f"✗ Error in main loop: {e}")
-                time.sleep(60)  # Wait 1 minute before retry
+                self.hw.sleep(60)  # Wait 1 minute before retry
 
 # =============================================================================
 # ENTRY POINT
@@ -905,12 +991,8 @@ def main():
             
             print("→ Step 5: Clearing display...")
             # Create empty frame buffers (200x200 = 5000 bytes)
-            frame_black = bytearray(5000)
-            frame_red = bytearray(5000)
-            # Fill with white (0xFF = white)
-            for i in range(5000):
-                frame_black[i] = 0xFF
-                frame_red[i] = 0x00
+            frame_black = bytearray([WHITE]) * 5000
+            frame_red = bytearray([RED_BLANK]) * 5000
             eink.display_frame(frame_black, frame_red)
             print("  ✓ Display cleared")
             
@@ -5,6 +5,7 @@ import { z } from "zod";
 export const sensorDataSchema = z.object({
   timestamp: z.number(),
   plantMoisture: z.array(z.number().min(0).max(100)).length(4), // 4 moisture sensors (0-100%)
+  moistureNoise: z.array(z.number().min(0)).length(4).optional(), // Noise estimate per sensor (% points)
   temperature: z.number(), // DHT11 temperature in Celsius
   humidity: z.number().min(0).max(100), // DHT11 humidity (0-100%)
   waterLevel: z.number().min(0).max(100), // Water tank level (0-100%)
@@ -56,6 +57,9 @@ export const notificationSettingsSchema = z.object({
 
 export type NotificationSettings = z.infer<typeof notificationSettingsSchema>;
 
+// Calibration point: sensor voltage (mV) -> moisture (%)
+export const calibrationCurveSchema = z.array(z.tuple([z.number().min(0).max(4095), z.number().min(0).max(100)])).min(2);
+
 export const systemSettingsSchema = z.object({
   pin: z.string().length(4).regex(/^\d{4}$/), // 4-digit PIN
   measurementInterval: z.number().min(60).max(86400), // seconds (1 min to 24 hours)
@@ -68,6 +72,8 @@ export const systemSettingsSchema = z.object({
     notifyOnTestFailure: true,
     notifyOnSensorError: true,
   }),
+  // Per-sensor calibration curve [[mV, %], ...] (null = curve captured on the device)
+  moistureCalibration: z.array(calibrationCurveSchema.nullable()).length(4).optional(),
 });
 
 export type SystemSettings = z.infer<typeof systemSettingsSchema>;
@@ -79,6 +85,8 @@ export type WaterTank = z.infer<typeof waterTankSchema>;
 export const systemTestResultSchema = z.object({
   timestamp: z.number(),
   overall: z.boolean(),
+  running: z.boolean().optional(), // true while the test is still in progress (partial result)
+  phase: z.enum(["pumping", "soak", "done"]).optional(),
   moistureSensors: z.array(z.object({
     passed: z.boolean(),
     moistureBefore: z.number().optional(),
@@ -126,6 +134,21 @@ export const manualTestTriggerSchema = z.object({
 
 export type ManualTestTrigger = z.infer<typeof manualTestTriggerSchema>;
 
+// ===== Manual Calibration Command Schema =====
+
+// Website: probe in known state -> { sensorId, percent }; ESP32 answers with done + curve
+export const manualCalibrationSchema = z.object({
+  sensorId: z.number().min(1).max(4),
+  percent: z.number().min(0).max(100), // 0 = dry air, 100 = water
+  timestamp: z.number().optional(),
+  done: z.boolean().optional(),
+  mv: z.number().optional(), // Measured sensor voltage
+  curve: calibrationCurveSchema.optional(),
+  error: z.string().optional(),
+});
+
+export type ManualCalibration = z.infer<typeof manualCalibrationSchema>;
+
 // ===== System Status Schema =====
 
 export const systemStatusSchema = z.object({
@@ -136,6 +159,35 @@ export const systemStatusSchema = z.object({
 
 export type SystemStatus = z.infer<typeof systemStatusSchema>;
 
+// ===== Device Metrics Schema (ESP32 instrumentation, one window every 15 min) =====
+
+export const metricsSpanSchema = z.object({
+  n: z.number(),
+  avgMs: z.number(),
+  maxMs: z.number(),
+});
+
+export const deviceMetricsSchema = z.object({
+  timestamp: z.number(),
+  windowS: z.number(), // Length of the window these numbers cover
+  uptimeS: z.number(),
+  // Main-loop steps / tasks (cycle, sensors, upload, ...) and "http" round trips
+  spans: z.record(z.string(), metricsSpanSchema),
+  httpHistogram: z.array(z.number()), // Request counts < 50, 100, 200, 500, 1000, 2000, 5000 ms, slower
+  heap: z.object({
+    free: z.number(),
+    alloc: z.number(),
+    minFree: z.number(), // Lowest free heap seen in the window
+    largestFree: z.number(), // Largest allocatable block
+    fragmentation: z.number(), // % of free heap not in the largest block
+  }),
+  retries: z.number(),
+  failures: z.number(), // Requests that failed after all retries
+  overruns: z.number(), // Steps that took longer than their interval
+});
+
+export type DeviceMetrics = z.infer<typeof deviceMetricsSchema>;
+
 // ===== System Error Schema =====
 
 export const systemErrorSchema = z.object({
@@ -145,6 +197,9 @@ export const systemErrorSchema = z.object({
   message: z.string(),
   severity: z.enum(["info", "warning", "error"]),
   resolved: z.boolean().default(false),
+  count: z.number().optional(), // Occurrences of this fault state (ESP32 deduplication)
+  firstSeen: z.number().optional(),
+  lastSeen: z.number().optional(),
 });
 
 export type SystemError = z.infer<typeof systemErrorSchema>;